@@ -0,0 +1,159 @@
+"""
+In-memory curriculum graph for MathEd Romania.
+
+The unlock rules (apps.progress.unlock) only need the shape of the
+curriculum: which published unit precedes a unit, which published topic
+precedes a topic, the first/last published topic of a unit, and which of
+them have a published test. That shape changes only when content is
+edited, so it is built once into an immutable CurriculumGraph and every
+unlock decision becomes a dict lookup.
+
+Caching:
+  - per process, keyed by the content version token
+  - in the default cache (Redis in production), so a new process doesn't
+    rebuild what another one already built
+  - content post_save / post_delete signals (apps.content.signals) bump the
+    version; every process picks the new graph up on its next lookup
+
+The same version token keys every other content-derived cache (see
+apps.content.tree).
+
+Public API:
+    content_version() -> str
+    bump_content_version()
+    get_curriculum_graph() -> CurriculumGraph
+"""
+import threading
+import uuid
+from dataclasses import dataclass
+
+from django.core.cache import cache
+
+from .models import Test, Topic, Unit
+
+_VERSION_KEY = "mathed:content:version"
+_GRAPH_KEY = "mathed:curriculum:graph:{version}"
+# The version key lives until the next content edit; the pickled graph can be
+# rebuilt from the DB at any time, so it may expire.
+GRAPH_CACHE_TIMEOUT = 24 * 3600
+
+
+@dataclass(frozen=True)
+class CurriculumGraph:
+    """
+    Ordered grade → unit → topic → test structure, published items only.
+    Units and topics that aren't published still get an entry in the
+    prev/first maps, pointing at their published neighbours.
+    """
+    version: str
+    # unit_id → previous published unit in the same grade (None if first)
+    prev_unit: dict[int, int | None]
+    # topic_id → previous published topic in the same unit (None if first)
+    prev_topic: dict[int, int | None]
+    # topic_id → unit_id
+    topic_unit: dict[int, int]
+    # unit_id → first / last published topic (absent if the unit has none)
+    first_topic: dict[int, int]
+    last_topic: dict[int, int]
+    # Published tests only
+    unit_test: dict[int, int]
+    topic_test: dict[int, int]
+
+    def unit_test_passed(self, unit_id: int | None, passed_test_ids: set[int]) -> bool:
+        """True if there is no unit, the unit has no published test, or it is passed."""
+        if unit_id is None:
+            return True
+        test_id = self.unit_test.get(unit_id)
+        return test_id is None or test_id in passed_test_ids
+
+    def topic_test_passed(self, topic_id: int | None, passed_test_ids: set[int]) -> bool:
+        """True if there is no topic, the topic has no published test, or it is passed."""
+        if topic_id is None:
+            return True
+        test_id = self.topic_test.get(topic_id)
+        return test_id is None or test_id in passed_test_ids
+
+
+def _build_graph(version: str) -> CurriculumGraph:
+    units = list(Unit.objects.order_by("grade_id", "order").values_list(
+        "id", "grade_id", "order", "is_published",
+    ))
+    topics = list(Topic.objects.order_by("unit_id", "order").values_list(
+        "id", "unit_id", "order", "is_published",
+    ))
+    tests = list(Test.objects.filter(is_published=True).values_list("id", "unit_id", "topic_id"))
+
+    # Items are sorted by (parent, order), so "previous published sibling"
+    # is the last published item seen in the same parent with a lower order.
+    prev_unit: dict[int, int | None] = {}
+    last_seen: dict[int, tuple[int, int]] = {}  # grade_id → (order, unit_id)
+    for unit_id, grade_id, order, published in units:
+        seen = last_seen.get(grade_id)
+        prev_unit[unit_id] = seen[1] if seen and seen[0] < order else None
+        if published:
+            last_seen[grade_id] = (order, unit_id)
+
+    prev_topic: dict[int, int | None] = {}
+    topic_unit: dict[int, int] = {}
+    first_topic: dict[int, int] = {}
+    last_topic: dict[int, int] = {}
+    for topic_id, unit_id, _order, published in topics:
+        topic_unit[topic_id] = unit_id
+        prev_id = last_topic.get(unit_id)
+        prev_topic[topic_id] = prev_id
+        if published:
+            first_topic.setdefault(unit_id, topic_id)
+            last_topic[unit_id] = topic_id
+
+    return CurriculumGraph(
+        version=version,
+        prev_unit=prev_unit,
+        prev_topic=prev_topic,
+        topic_unit=topic_unit,
+        first_topic=first_topic,
+        last_topic=last_topic,
+        unit_test={unit_id: test_id for test_id, unit_id, _ in tests if unit_id is not None},
+        topic_test={topic_id: test_id for test_id, _, topic_id in tests if topic_id is not None},
+    )
+
+
+_local_graph: CurriculumGraph | None = None
+_local_lock = threading.Lock()
+
+
+def content_version() -> str:
+    """Token that changes whenever published content changes."""
+    version = cache.get(_VERSION_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        # add() so concurrent first callers agree on one version
+        if not cache.add(_VERSION_KEY, version, timeout=None):
+            version = cache.get(_VERSION_KEY) or version
+    return version
+
+
+def bump_content_version() -> None:
+    """Start a new version; every process rebuilds (or fetches) on next use."""
+    global _local_graph
+    cache.set(_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+    _local_graph = None
+
+
+def get_curriculum_graph() -> CurriculumGraph:
+    """Return the current graph: per-process copy, else shared cache, else the DB."""
+    global _local_graph
+    version = content_version()
+
+    graph = _local_graph
+    if graph is not None and graph.version == version:
+        return graph
+
+    with _local_lock:
+        if _local_graph is not None and _local_graph.version == version:
+            return _local_graph
+        graph = cache.get(_GRAPH_KEY.format(version=version))
+        if graph is None:
+            graph = _build_graph(version)
+            cache.set(_GRAPH_KEY.format(version=version), graph, timeout=GRAPH_CACHE_TIMEOUT)
+        _local_graph = graph
+        return graph
@@ -11,15 +11,13 @@ Usage:
 Data files live in backend/exercises/ and export an EXERCISES list.
 Each entry specifies the template, difficulty, category, and topic lookup.
 """
-import builtins
 import importlib
 
 from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 
 from apps.content.models import Exercise, Topic
-
-# Parameter names that collide with Python builtins and cause eval() issues.
-_RESERVED_NAMES = frozenset(dir(builtins))
+from apps.progress.exercise_engine import compile_template
 
 # All known exercise data modules (used by --all flag)
 ALL_MODULES = [
@@ -140,75 +138,78 @@ class Command(BaseCommand):
 
             self.stdout.write(f"  Topic: {topic}")
 
-            # ── Flush if requested ───────────────────────────────────────
-            if options["flush"]:
-                categories = {ex["category"] for ex in exercises_data}
-                for cat in categories:
-                    qs = Exercise.objects.filter(topic=topic, category=cat)
-                    count = qs.count()
-                    if count and not options["dry_run"]:
-                        qs.delete()
-                    total_flushed += count
-                    if count:
-                        self.stdout.write(
-                            self.style.WARNING(f"  Flushed {count} existing '{cat}' exercises")
-                        )
-
-            # ── Create exercises ─────────────────────────────────────────
-            for i, ex_data in enumerate(exercises_data, 1):
-                name = ex_data.get("name", f"Exercise {i}")
-                category = ex_data["category"]
-                difficulty = ex_data["difficulty"]
-                exercise_type = ex_data["exercise_type"]
-                template = ex_data["template"]
-
-                # ── Validate param names against Python builtins ─────────
-                bad_params = self._check_reserved_params(name, template)
-                if bad_params:
-                    for msg in bad_params:
-                        self.stderr.write(self.style.ERROR(msg))
-                    total_skipped += 1
-                    continue
-
-                # Check for duplicates using the template title (unique per exercise).
-                # Falls back to question string if no title is set.
-                title = template.get("title", "")
-                if title:
-                    exists = Exercise.objects.filter(
-                        topic=topic,
-                        category=category,
-                        template__title=title,
-                    ).exists()
-                else:
-                    question_tpl = template.get("question", "")
-                    exists = Exercise.objects.filter(
+            # One transaction per module: the content signals then recompute
+            # the topic's mastery tiers once, on commit, instead of per exercise.
+            with transaction.atomic():
+                # ── Flush if requested ───────────────────────────────────────
+                if options["flush"]:
+                    categories = {ex["category"] for ex in exercises_data}
+                    for cat in categories:
+                        qs = Exercise.objects.filter(topic=topic, category=cat)
+                        count = qs.count()
+                        if count and not options["dry_run"]:
+                            qs.delete()
+                        total_flushed += count
+                        if count:
+                            self.stdout.write(
+                                self.style.WARNING(f"  Flushed {count} existing '{cat}' exercises")
+                            )
+
+                # ── Create exercises ─────────────────────────────────────────
+                for i, ex_data in enumerate(exercises_data, 1):
+                    name = ex_data.get("name", f"Exercise {i}")
+                    category = ex_data["category"]
+                    difficulty = ex_data["difficulty"]
+                    exercise_type = ex_data["exercise_type"]
+                    template = ex_data["template"]
+
+                    # ── Validate params and expressions ─────────────────────
+                    bad_params = self._check_params(name, template)
+                    if bad_params:
+                        for msg in bad_params:
+                            self.stderr.write(self.style.ERROR(msg))
+                        total_skipped += 1
+                        continue
+
+                    # Check for duplicates using the template title (unique per exercise).
+                    # Falls back to question string if no title is set.
+                    title = template.get("title", "")
+                    if title:
+                        exists = Exercise.objects.filter(
+                            topic=topic,
+                            category=category,
+                            template__title=title,
+                        ).exists()
+                    else:
+                        question_tpl = template.get("question", "")
+                        exists = Exercise.objects.filter(
+                            topic=topic,
+                            category=category,
+                            difficulty=difficulty,
+                            exercise_type=exercise_type,
+                            template__question=question_tpl,
+                        ).exists()
+
+                    if exists and not options["flush"]:
+                        self.stdout.write(f"  ⏭  {name} [{difficulty}] — already exists, skipping")
+                        total_skipped += 1
+                        continue
+
+                    if options["dry_run"]:
+                        self.stdout.write(f"  🔍 {name} [{difficulty}] — would create")
+                        total_created += 1
+                        continue
+
+                    Exercise.objects.create(
                         topic=topic,
-                        category=category,
-                        difficulty=difficulty,
                         exercise_type=exercise_type,
-                        template__question=question_tpl,
-                    ).exists()
-
-                if exists and not options["flush"]:
-                    self.stdout.write(f"  ⏭  {name} [{difficulty}] — already exists, skipping")
-                    total_skipped += 1
-                    continue
-
-                if options["dry_run"]:
-                    self.stdout.write(f"  🔍 {name} [{difficulty}] — would create")
+                        difficulty=difficulty,
+                        category=category,
+                        template=template,
+                        is_active=True,
+                    )
+                    self.stdout.write(self.style.SUCCESS(f"  ✅ {name} [{difficulty}]"))
                     total_created += 1
-                    continue
-
-                Exercise.objects.create(
-                    topic=topic,
-                    exercise_type=exercise_type,
-                    difficulty=difficulty,
-                    category=category,
-                    template=template,
-                    is_active=True,
-                )
-                self.stdout.write(self.style.SUCCESS(f"  ✅ {name} [{difficulty}]"))
-                total_created += 1
 
         # ── Summary ──────────────────────────────────────────────────────
         self.stdout.write(f"\n{'═' * 60}")
@@ -264,19 +265,22 @@ class Command(BaseCommand):
             return None
 
     @staticmethod
-    def _check_reserved_params(name: str, template: dict) -> list[str]:
-        """Return error messages for any param keys that shadow Python builtins."""
+    def _check_params(name: str, template: dict) -> list[str]:
+        """
+        Return error messages for param names that can't be used as
+        {placeholders} and for expressions the template evaluator rejects.
+        """
         errors = []
-        for key in template.get("params", {}):
-            if key in _RESERVED_NAMES:
-                errors.append(
-                    f"  ✗ Exercise '{name}' uses reserved param name '{key}'"
-                    f" — rename it to avoid eval() collisions"
-                )
-        for key in template.get("distractor_params", {}):
-            if key in _RESERVED_NAMES:
-                errors.append(
-                    f"  ✗ Exercise '{name}' uses reserved distractor_params name '{key}'"
-                    f" — rename it to avoid eval() collisions"
-                )
-        return errors
\ No newline at end of file
+        for section in ("params", "distractor_params"):
+            for key in template.get(section, {}):
+                if not key.isidentifier():
+                    errors.append(
+                        f"  ✗ Exercise '{name}' has invalid {section} name '{key}'"
+                        f" — use letters, digits and underscores"
+                    )
+        if not errors:
+            try:
+                compile_template(template)
+            except (ValueError, KeyError) as exc:
+                errors.append(f"  ✗ Exercise '{name}' has an invalid template: {exc}")
+        return errors
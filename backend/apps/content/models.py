@@ -158,6 +158,9 @@ class Exercise(models.Model):
     )
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Versions the compiled template plans and the instance pools built from
+    # the template (see apps.progress.exercise_engine / instance_pool).
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         db_table = "exercises"
@@ -0,0 +1,23 @@
+"""
+Signal receivers for the content app.
+
+Any edit to content that ends up in the curriculum graph or the cached
+grade/unit trees bumps the content version once the transaction commits,
+so no process can rebuild those caches from uncommitted rows.
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from .curriculum import bump_content_version
+from .models import Exercise, Grade, Lesson, Test, Topic, Unit
+
+_CONTENT_MODELS = (Grade, Unit, Topic, Lesson, Test, Exercise)
+
+
+def _bump_on_commit(sender, instance, **kwargs):
+    transaction.on_commit(bump_content_version)
+
+
+for _model in _CONTENT_MODELS:
+    post_save.connect(_bump_on_commit, sender=_model, dispatch_uid=f"content_version_save_{_model.__name__}")
+    post_delete.connect(_bump_on_commit, sender=_model, dispatch_uid=f"content_version_delete_{_model.__name__}")
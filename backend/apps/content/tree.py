@@ -0,0 +1,176 @@
+"""
+Cached curriculum trees for GradeDetailView and UnitDetailView, and the
+lesson outline behind the progress dashboard.
+
+The grade → units → topics → lessons/tests payload is the same for every
+student except for a handful of progress fields. The student-independent
+part is serialized once per content version (see
+apps.content.curriculum.content_version) and kept in the default cache and
+in process memory; each request copies it and fills in the student's
+fields from the maps built by _build_progress_context.
+
+Student-dependent fields, filled in by overlay_grade() / overlay_unit():
+  lessons: is_locked, progress_status, mastery_tier
+  topics:  has_practiced, mastery_tier
+  tests:   is_locked, best_score, passed, attempts_count
+
+Public API:
+    get_grade_tree(grade_number) -> dict | None
+    get_unit_tree(unit_id) -> dict | None
+    get_lesson_outline() -> dict
+    overlay_grade(tree, ctx) -> dict
+    overlay_unit(tree, ctx) -> dict
+"""
+import json
+import threading
+
+from django.core.cache import cache
+
+from .curriculum import content_version
+from .models import Grade, Lesson, Unit
+from .serializers import GradeDetailSerializer, UnitListSerializer
+
+_TREE_KEY = "mathed:content:tree:{version}:{kind}:{pk}"
+TREE_CACHE_TIMEOUT = 24 * 3600
+
+# Cached for missing / unpublished grades and units so 404s stay cheap too.
+_MISSING = "missing"
+
+_local_trees: dict[tuple[str, int], object] = {}
+_local_version: str | None = None
+_local_lock = threading.Lock()
+
+
+# ─── Building ─────────────────────────────────────────────────────────────────
+# Runs once per content version, so the serializers' per-node queries are fine.
+
+def _plain(data) -> dict:
+    # Serializer output holds ReturnDict/ReturnList; store plain JSON types.
+    return json.loads(json.dumps(data))
+
+
+def _build_grade_tree(grade_number: int):
+    grade = Grade.objects.filter(number=grade_number, is_active=True).first()
+    if grade is None:
+        return _MISSING
+    return _plain(GradeDetailSerializer(grade, context={}).data)
+
+
+def _build_unit_tree(unit_id: int):
+    unit = Unit.objects.filter(id=unit_id, is_published=True).first()
+    if unit is None:
+        return _MISSING
+    return _plain(UnitListSerializer(unit, context={}).data)
+
+
+def _build_lesson_outline(_pk: int) -> dict:
+    units = Unit.objects.filter(is_published=True).select_related("grade").order_by("grade", "order")
+    unit_lessons: dict[int, list[int]] = {}
+    lesson_ids = []
+    for lesson_id, unit_id, topic_published in (
+        Lesson.objects.filter(is_published=True)
+        .order_by()
+        .values_list("id", "topic__unit_id", "topic__is_published")
+    ):
+        lesson_ids.append(lesson_id)
+        if topic_published:
+            unit_lessons.setdefault(unit_id, []).append(lesson_id)
+    return {
+        "lesson_ids": lesson_ids,
+        "units": [
+            {
+                "unit_id": unit.id,
+                "unit_title": unit.title,
+                "grade_number": unit.grade.number,
+                "lesson_ids": unit_lessons.get(unit.id, []),
+            }
+            for unit in units
+        ],
+    }
+
+
+def _get_tree(kind: str, pk: int, build) -> dict | None:
+    global _local_version
+    version = content_version()
+    with _local_lock:
+        if _local_version != version:
+            _local_trees.clear()
+            _local_version = version
+        tree = _local_trees.get((kind, pk))
+    if tree is None:
+        key = _TREE_KEY.format(version=version, kind=kind, pk=pk)
+        tree = cache.get(key)
+        if tree is None:
+            tree = build(pk)
+            cache.set(key, tree, timeout=TREE_CACHE_TIMEOUT)
+        with _local_lock:
+            if _local_version == version:
+                _local_trees[(kind, pk)] = tree
+    return None if tree == _MISSING else tree
+
+
+def get_grade_tree(grade_number: int) -> dict | None:
+    """Static tree of an active grade, or None if there is no such grade."""
+    return _get_tree("grade", grade_number, _build_grade_tree)
+
+
+def get_unit_tree(unit_id: int) -> dict | None:
+    """Static tree of a published unit, or None if there is no such unit."""
+    return _get_tree("unit", unit_id, _build_unit_tree)
+
+
+def get_lesson_outline() -> dict:
+    """
+    Published lesson ids overall and per published unit (lessons of
+    published topics only), units in curriculum order.
+    """
+    return _get_tree("outline", 0, _build_lesson_outline)
+
+
+# ─── Per-student overlay ──────────────────────────────────────────────────────
+# Defaults match the serializers' behaviour for ids missing from the maps.
+
+def _overlay_test(test: dict | None, ctx: dict) -> dict | None:
+    if test is None:
+        return None
+    info = ctx["test_attempt_map"].get(test["id"])
+    return {
+        **test,
+        "is_locked": not ctx["test_unlock_map"].get(test["id"], True),
+        "best_score": info["best_score"] if info else None,
+        "passed": info["passed"] if info else False,
+        "attempts_count": info["attempts_count"] if info else 0,
+    }
+
+
+def _overlay_topic(topic: dict, ctx: dict) -> dict:
+    mastery_map = ctx["topic_mastery_map"]
+    return {
+        **topic,
+        "has_practiced": topic["id"] in ctx["practiced_topic_ids"],
+        "mastery_tier": mastery_map.get(topic["id"], "none"),
+        "lessons": [
+            {
+                **lesson,
+                "is_locked": not ctx["unlock_map"].get(lesson["id"], True),
+                "progress_status": ctx["lesson_progress_map"].get(lesson["id"], "not_started"),
+                "mastery_tier": mastery_map.get(lesson["topic_id"], "none"),
+            }
+            for lesson in topic["lessons"]
+        ],
+        "test": _overlay_test(topic["test"], ctx),
+    }
+
+
+def overlay_unit(tree: dict, ctx: dict) -> dict:
+    """Copy of a static unit tree with the student's progress fields filled in."""
+    return {
+        **tree,
+        "topics": [_overlay_topic(topic, ctx) for topic in tree["topics"]],
+        "test": _overlay_test(tree["test"], ctx),
+    }
+
+
+def overlay_grade(tree: dict, ctx: dict) -> dict:
+    """Copy of a static grade tree with the student's progress fields filled in."""
+    return {**tree, "units": [overlay_unit(unit, ctx) for unit in tree["units"]]}
@@ -5,20 +5,15 @@ These endpoints serve curriculum content to authenticated students/teachers.
 All content is read-only via the API — creation/editing happens in Django admin.
 """
 import logging
-from collections import defaultdict
 
-from django.db.models import Count, Max, Q
+from django.db.models import Q
 
 from rest_framework import permissions, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from apps.progress.models import (
-    CategoryProgress,
-    ExerciseAttempt,
-    LessonProgress,
-    TestAttempt,
-)
+from apps.progress.mastery import get_mastery_map
+from apps.progress.progress_snapshot import get_snapshot
 from apps.progress.unlock import (
     get_passed_test_ids,
     get_test_unlock_map,
@@ -26,14 +21,13 @@ from apps.progress.unlock import (
     is_lesson_unlocked,
 )
 
-from .models import Exercise, GlossaryTerm, Grade, Lesson, Test, Topic, Unit
+from .models import GlossaryTerm, Grade, Lesson, Test, Topic
 from .serializers import (
     GlossaryTermSerializer,
-    GradeDetailSerializer,
     GradeListSerializer,
     LessonDetailSerializer,
-    UnitListSerializer,
 )
+from .tree import get_grade_tree, get_unit_tree, overlay_grade, overlay_unit
 
 logger = logging.getLogger(__name__)
 
@@ -41,59 +35,24 @@ logger = logging.getLogger(__name__)
 def _build_progress_context(request_user, all_lessons, all_tests, topic_ids):
     """
     Build the per-student context dicts the serializers need: lesson progress,
-    test unlock, best attempt stats, and whether each topic has been practiced.
+    test unlock, best attempt stats, whether each topic has been practiced,
+    and each topic's mastery tier (apps.progress.mastery).
 
     Takes pre-filtered querysets/iterables so callers can scope to a grade or
-    to a single unit. Returns a dict ready to merge into serializer context.
+    to a single unit. The student's side comes from their progress snapshot;
+    the maps may hold ids outside the scope, which lookups simply ignore.
     """
-    passed_test_ids = get_passed_test_ids(request_user)
+    snapshot = get_snapshot(request_user)
+    passed_test_ids = snapshot.passed_test_ids
 
     unlock_map = get_unlock_map(all_lessons, request_user, passed_test_ids=passed_test_ids)
     test_unlock_map = get_test_unlock_map(all_tests, request_user, passed_test_ids=passed_test_ids)
 
-    lesson_progress_map = dict(
-        LessonProgress.objects.filter(
-            student=request_user,
-            lesson__in=all_lessons,
-        ).values_list("lesson_id", "status")
-    )
-
-    test_attempt_map = {}
-    for row in (
-        TestAttempt.objects
-        .filter(
-            student=request_user,
-            test__in=all_tests,
-            status=TestAttempt.Status.COMPLETED,
-        )
-        .values("test_id")
-        .annotate(
-            best_score=Max("score"),
-            attempts_count=Count("id"),
-            passed_count=Count("id", filter=Q(passed=True)),
-        )
-    ):
-        test_attempt_map[row["test_id"]] = {
-            "best_score": float(row["best_score"]) if row["best_score"] is not None else None,
-            "passed": row["passed_count"] > 0,
-            "attempts_count": row["attempts_count"],
-        }
-
-    practiced_topic_ids = set(
-        ExerciseAttempt.objects
-        .filter(student=request_user, exercise__topic_id__in=topic_ids)
-        .values_list("exercise__topic_id", flat=True)
-        .distinct()
-    )
-
-    topic_mastery_map = _build_topic_mastery_map(
-        request_user=request_user,
-        topic_ids=topic_ids,
-        all_lessons=all_lessons,
-        all_tests=all_tests,
-        lesson_progress_map=lesson_progress_map,
-        test_attempt_map=test_attempt_map,
-    )
+    lesson_progress_map = snapshot.lesson_status_map
+    test_attempt_map = snapshot.test_stats
+    practiced_topic_ids = set(snapshot.attempts_by_topic)
+
+    topic_mastery_map = get_mastery_map(request_user, topic_ids)
 
     return {
         "unlock_map": unlock_map,
@@ -105,88 +64,6 @@ def _build_progress_context(request_user, all_lessons, all_tests, topic_ids):
     }
 
 
-def _build_topic_mastery_map(
-    *,
-    request_user,
-    topic_ids,
-    all_lessons,
-    all_tests,
-    lesson_progress_map,
-    test_attempt_map,
-):
-    """
-    Tier per topic (highest applicable wins):
-      none       — nothing opened
-      deschisa   — at least one lesson in the topic has progress
-      promovat   — topic test passed
-      stapanit   — promovat AND every active category is medium_cleared
-      perfect    — best score == 100 AND every active category is hard_cleared
-    """
-    topic_id_set = set(topic_ids)
-
-    # lesson_id -> topic_id for lessons in scope
-    lesson_to_topic = {
-        lesson.id: lesson.topic_id
-        for lesson in all_lessons
-        if lesson.topic_id in topic_id_set
-    }
-
-    opened_topic_ids = {
-        lesson_to_topic[lid]
-        for lid, status_value in lesson_progress_map.items()
-        if lid in lesson_to_topic and status_value != LessonProgress.Status.NOT_STARTED
-    }
-
-    # topic_id -> Test (topic-scoped, published)
-    topic_to_test = {
-        t.topic_id: t
-        for t in all_tests
-        if t.scope == Test.Scope.TOPIC and t.topic_id is not None
-    }
-
-    # topic_id -> set of active categories
-    topic_categories: dict[int, set[str]] = defaultdict(set)
-    for row in Exercise.objects.filter(
-        topic_id__in=topic_id_set, is_active=True
-    ).values("topic_id", "category"):
-        topic_categories[row["topic_id"]].add(row["category"])
-
-    # topic_id -> {"medium": set(categories), "hard": set(categories)}
-    cleared: dict[int, dict[str, set[str]]] = defaultdict(
-        lambda: {"medium": set(), "hard": set()}
-    )
-    for row in CategoryProgress.objects.filter(
-        student=request_user, topic_id__in=topic_id_set,
-    ).values("topic_id", "category", "medium_cleared", "hard_cleared"):
-        if row["medium_cleared"]:
-            cleared[row["topic_id"]]["medium"].add(row["category"])
-        if row["hard_cleared"]:
-            cleared[row["topic_id"]]["hard"].add(row["category"])
-
-    result: dict[int, str] = {}
-    for topic_id in topic_id_set:
-        tier = "none"
-        if topic_id in opened_topic_ids:
-            tier = "deschisa"
-
-        test = topic_to_test.get(topic_id)
-        attempt = test_attempt_map.get(test.id) if test else None
-        if attempt and attempt["passed"]:
-            tier = "promovat"
-            categories = topic_categories.get(topic_id, set())
-            if categories:
-                medium_cleared = cleared[topic_id]["medium"]
-                if categories.issubset(medium_cleared):
-                    tier = "stapanit"
-                    hard_cleared = cleared[topic_id]["hard"]
-                    best = attempt["best_score"]
-                    if best is not None and best >= 100 and categories.issubset(hard_cleared):
-                        tier = "perfect"
-
-        result[topic_id] = tier
-    return result
-
-
 class GradeListView(APIView):
     """
     GET /api/v1/content/grades/
@@ -206,43 +83,35 @@ class GradeDetailView(APIView):
     GET /api/v1/content/grades/<grade_number>/
 
     Full grade with all published units → topics → lessons.
-    Includes per-student unlock state for each lesson.
+    Includes per-student unlock state for each lesson. The content part is
+    served from the cached tree (apps.content.tree).
     """
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request, grade_number):
-        try:
-            grade = Grade.objects.prefetch_related(
-                "units__topics__lessons",
-                "units__topics__exercises",
-                "units__topics__test",
-                "units__test",
-            ).get(number=grade_number, is_active=True)
-        except Grade.DoesNotExist:
+        tree = get_grade_tree(grade_number)
+        if tree is None:
             return Response({"error": "Grade not found."}, status=status.HTTP_404_NOT_FOUND)
 
-        # Build unlock map for all published lessons in this grade
+        # Ids for the per-student maps; the content itself comes from the cached tree
         all_lessons = Lesson.objects.filter(
-            topic__unit__grade=grade,
+            topic__unit__grade__number=grade_number,
             is_published=True,
-        ).select_related("topic__unit__grade")
+        ).only("id", "topic_id")
 
         all_tests = Test.objects.filter(
-            Q(topic__unit__grade=grade, scope=Test.Scope.TOPIC) |
-            Q(unit__grade=grade, scope=Test.Scope.UNIT),
+            Q(topic__unit__grade__number=grade_number, scope=Test.Scope.TOPIC) |
+            Q(unit__grade__number=grade_number, scope=Test.Scope.UNIT),
             is_published=True,
-        )
+        ).only("id", "scope", "topic_id", "unit_id")
 
         topic_ids = list(
-            Topic.objects.filter(unit__grade=grade, is_published=True)
+            Topic.objects.filter(unit__grade__number=grade_number, is_published=True)
             .values_list("id", flat=True)
         )
 
         ctx = _build_progress_context(request.user, all_lessons, all_tests, topic_ids)
-        ctx["request"] = request
-
-        serializer = GradeDetailSerializer(grade, context=ctx)
-        return Response(serializer.data)
+        return Response(overlay_grade(tree, ctx))
 
 
 class UnitDetailView(APIView):
@@ -254,38 +123,28 @@ class UnitDetailView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request, unit_id):
-        try:
-            unit = Unit.objects.prefetch_related(
-                "topics__lessons",
-                "topics__exercises",
-                "topics__test",
-                "test",
-            ).get(id=unit_id, is_published=True)
-        except Unit.DoesNotExist:
+        tree = get_unit_tree(unit_id)
+        if tree is None:
             return Response({"error": "Unit not found."}, status=status.HTTP_404_NOT_FOUND)
 
-        # Build unlock map for lessons in this unit
         all_lessons = Lesson.objects.filter(
-            topic__unit=unit,
+            topic__unit_id=unit_id,
             is_published=True,
-        ).select_related("topic__unit__grade")
+        ).only("id", "topic_id")
 
         all_tests = Test.objects.filter(
-            Q(topic__unit=unit, scope=Test.Scope.TOPIC) |
-            Q(unit=unit, scope=Test.Scope.UNIT),
+            Q(topic__unit_id=unit_id, scope=Test.Scope.TOPIC) |
+            Q(unit_id=unit_id, scope=Test.Scope.UNIT),
             is_published=True,
-        )
+        ).only("id", "scope", "topic_id", "unit_id")
 
         topic_ids = list(
-            Topic.objects.filter(unit=unit, is_published=True)
+            Topic.objects.filter(unit_id=unit_id, is_published=True)
             .values_list("id", flat=True)
         )
 
         ctx = _build_progress_context(request.user, all_lessons, all_tests, topic_ids)
-        ctx["request"] = request
-
-        serializer = UnitListSerializer(unit, context=ctx)
-        return Response(serializer.data)
+        return Response(overlay_unit(tree, ctx))
 
 
 class LessonDetailView(APIView):
@@ -348,7 +207,7 @@ class GlossaryOpenedView(APIView):
 
     Idempotent ping the frontend fires whenever the glossary drawer opens.
     Awards the discovery "Bibliotecar" badge on first open and returns any
-    newly-earned badges so the client can pop a toast.
+    badges not delivered yet so the client can pop a toast.
     """
     permission_classes = [permissions.IsAuthenticated]
 
@@ -356,11 +215,11 @@ class GlossaryOpenedView(APIView):
         from apps.progress.badges.service import (
             evaluate_badges_for_event,
             serialize_badges,
+            take_new_badges,
         )
 
-        keys: list[str] = []
         try:
-            keys = evaluate_badges_for_event(request.user, "glossary_opened")
+            evaluate_badges_for_event(request.user, "glossary_opened")
         except Exception:
             logger.warning("Badge evaluation failed", exc_info=True)
-        return Response({"newly_earned_badges": serialize_badges(keys)})
+        return Response({"newly_earned_badges": serialize_badges(take_new_badges(request.user))})
@@ -7,9 +7,13 @@ from .models import (
     DailyTestSession,
     ExerciseAttempt,
     LessonProgress,
+    PracticeSession,
     Streak,
     StreakActivity,
+    StreakYearBitmap,
+    StudentProgressSnapshot,
     TestAttempt,
+    TopicMastery,
 )
 
 
@@ -31,12 +35,30 @@ class CategoryProgressAdmin(admin.ModelAdmin):
     list_filter = ("topic", "easy_cleared", "medium_cleared", "hard_cleared")
 
 
+@admin.register(PracticeSession)
+class PracticeSessionAdmin(admin.ModelAdmin):
+    list_display = ("student", "topic", "category", "difficulty", "total", "correct", "completed_at")
+    list_filter = ("topic", "difficulty")
+
+
 @admin.register(TestAttempt)
 class TestAttemptAdmin(admin.ModelAdmin):
     list_display = ("student", "test", "score", "passed", "started_at")
     list_filter = ("passed",)
 
 
+@admin.register(TopicMastery)
+class TopicMasteryAdmin(admin.ModelAdmin):
+    list_display = ("student", "topic", "tier", "updated_at")
+    list_filter = ("tier",)
+
+
+@admin.register(StudentProgressSnapshot)
+class StudentProgressSnapshotAdmin(admin.ModelAdmin):
+    list_display = ("student", "perfect_batches", "rebuilt_at", "updated_at")
+    readonly_fields = ("lessons", "topic_attempts", "categories", "tests", "rebuilt_at", "updated_at")
+
+
 @admin.register(ClassroomPace)
 class ClassroomPaceAdmin(admin.ModelAdmin):
     list_display = ("teacher", "unit", "unlock_date")
@@ -53,6 +75,12 @@ class StreakActivityAdmin(admin.ModelAdmin):
     list_filter = ("activity_type",)
 
 
+@admin.register(StreakYearBitmap)
+class StreakYearBitmapAdmin(admin.ModelAdmin):
+    list_display = ("student", "year")
+    list_filter = ("year",)
+
+
 @admin.register(DailyTestSession)
 class DailyTestSessionAdmin(admin.ModelAdmin):
     list_display = ("student", "date", "is_completed", "completed_at")
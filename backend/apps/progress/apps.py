@@ -5,3 +5,6 @@ class ProgressConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "apps.progress"
     verbose_name = "Student Progress"
+
+    def ready(self):
+        from apps.progress import event_handlers, signals  # noqa: F401
@@ -0,0 +1,354 @@
+"""
+Write-behind ingestion of practice attempts.
+
+With ATTEMPT_INGEST_MODE = "queue" the attempt endpoint grades, answers and
+pushes the attempt onto a Redis stream instead of inserting it;
+`manage.py drain_attempt_queue` later writes whole batches with one
+bulk_create plus one aggregated CategoryProgress increment per
+(student, topic, category), one PracticeSession merge per batch and one
+progress snapshot update per (student, topic).
+
+    mathed:attempts                 stream of attempt events, read by the
+                                    consumer group "drain"
+    mathed:attempts:failures        hash {entry id: failed drain passes}
+    mathed:attempts:dead            dead-letter stream (event, error, id)
+    mathed:attempts:batch:<session> hash of counters for one practice batch
+                                    (total, wrong, wrong:<category>)
+
+The per-batch counters are bumped in the same MULTI as the XADD, so the
+tier and hint logic in attempt_service reads the batch state through this
+buffer instead of counting ExerciseAttempt rows that may not exist yet.
+The CategoryProgress fields that logic needs (tier flags, failure counter)
+are still written synchronously — they change at most twice per batch.
+
+Delivery is at-least-once: an entry is acknowledged only after its batch
+commits, and entries a consumer read but never acknowledged are retried on
+its next pass. Each row keeps its stream entry id (unique), so an entry
+redelivered after its batch committed is skipped rather than inserted and
+counted twice. A batch that fails is retried entry by entry; an entry that
+fails MAX_DELIVERY_FAILURES passes is moved to the dead-letter stream so it
+stops blocking the ones behind it (`drain_attempt_queue --requeue-dead`
+puts dead letters back once the cause is fixed). Without Redis,
+enqueue_attempt returns None and the caller writes synchronously.
+
+Public API:
+    queue_mode() -> bool
+    enqueue_attempt(attempt) -> dict | None
+    drain(consumer, batch_size, block_ms) -> int
+    requeue_dead() -> int
+    queue_stats() -> dict
+"""
+import json
+import logging
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+
+from apps.content.models import Exercise
+from apps.progress.models import CategoryProgress, ExerciseAttempt
+from apps.progress.practice_sessions import merge_session_rows
+from apps.progress.progress_snapshot import note_attempts
+from apps.progress.redis_conn import get_redis
+
+logger = logging.getLogger(__name__)
+
+STREAM_KEY = "mathed:attempts"
+GROUP = "drain"
+_BATCH_KEY_PREFIX = "mathed:attempts:batch"
+_STATS_KEY = "mathed:attempts:stats"
+_FAILURES_KEY = "mathed:attempts:failures"
+DEAD_KEY = "mathed:attempts:dead"
+
+# Failed drain passes before an entry is dead-lettered. High enough that a
+# short database outage doesn't dead-letter everything pending.
+MAX_DELIVERY_FAILURES = 5
+
+# Practice tokens expire after an hour; a batch's counters only need to
+# outlive the batch itself.
+BATCH_COUNTER_TTL = 6 * 3600
+
+
+def queue_mode() -> bool:
+    return getattr(settings, "ATTEMPT_INGEST_MODE", "sync") == "queue"
+
+
+# ─── Producer ────────────────────────────────────────────────────────────────
+
+def enqueue_attempt(attempt: dict) -> dict | None:
+    """
+    Queue one attempt (student_id, exercise_id, topic_id, category,
+    difficulty, answer, is_correct, session_id, attempted_at) and return its batch counters
+    after the push: {"total", "wrong", "wrong_in_category"}, or {} when the
+    attempt has no session_id. Returns None if nothing was queued.
+    """
+    r = get_redis()
+    if r is None:
+        return None
+
+    session_id = attempt["session_id"]
+    event = {
+        **attempt,
+        "session_id": str(session_id) if session_id else None,
+        "attempted_at": attempt["attempted_at"].isoformat(),
+    }
+    try:
+        pipe = r.pipeline()  # MULTI/EXEC: counters and event land together
+        pipe.xadd(STREAM_KEY, {"e": json.dumps(event)})
+        if session_id:
+            key = f"{_BATCH_KEY_PREFIX}:{session_id}"
+            wrong = 0 if attempt["is_correct"] else 1
+            pipe.hincrby(key, "total", 1)
+            pipe.hincrby(key, "wrong", wrong)
+            pipe.hincrby(key, f"wrong:{attempt['category']}", wrong)
+            pipe.expire(key, BATCH_COUNTER_TTL)
+        results = pipe.execute()
+    except Exception:
+        logger.warning("Attempt enqueue failed; writing synchronously", exc_info=True)
+        return None
+
+    if not session_id:
+        return {}
+    return {"total": results[1], "wrong": results[2], "wrong_in_category": results[3]}
+
+
+# ─── Consumer ────────────────────────────────────────────────────────────────
+
+_INCREMENT_SQL = f"""
+INSERT INTO {CategoryProgress._meta.db_table} AS cp (
+    student_id, topic_id, category,
+    easy_cleared, medium_cleared, hard_cleared, category_failure_count,
+    total_attempts, correct_attempts, last_attempted_at
+)
+VALUES (%s, %s, %s, FALSE, FALSE, FALSE, 0, %s, %s, %s)
+ON CONFLICT (student_id, topic_id, category) DO UPDATE SET
+    total_attempts = cp.total_attempts + EXCLUDED.total_attempts,
+    correct_attempts = cp.correct_attempts + EXCLUDED.correct_attempts,
+    last_attempted_at = GREATEST(cp.last_attempted_at, EXCLUDED.last_attempted_at)
+"""
+
+
+def _ensure_group(r) -> None:
+    try:
+        r.xgroup_create(STREAM_KEY, GROUP, id="0", mkstream=True)
+    except Exception as exc:
+        if "BUSYGROUP" not in str(exc):
+            raise
+
+
+def _apply(events: list[tuple[str, dict]]) -> None:
+    """
+    Insert a batch of queued (entry id, event) pairs and fold them into
+    CategoryProgress / PracticeSession / snapshots. Entries whose row
+    already exists are skipped whole.
+    """
+    from django.contrib.auth import get_user_model
+
+    with transaction.atomic():
+        # Written by a drain that committed but died before acknowledging.
+        # The unique constraint backs this up: a racing insert fails the batch.
+        applied = set(
+            ExerciseAttempt.objects
+            .filter(stream_id__in=[entry_id for entry_id, _ in events])
+            .values_list("stream_id", flat=True)
+        )
+        events = [(entry_id, e) for entry_id, e in events if entry_id not in applied]
+
+        exercise_ids = {e["exercise_id"] for _, e in events}
+        student_ids = {e["student_id"] for _, e in events}
+        live_exercises = set(Exercise.objects.filter(id__in=exercise_ids).values_list("id", flat=True))
+        live_students = set(
+            get_user_model().objects.filter(id__in=student_ids).values_list("id", flat=True)
+        )
+
+        rows = []
+        totals: dict[tuple, list] = defaultdict(lambda: [0, 0, None])
+        topic_counts: dict[tuple, int] = defaultdict(int)
+        sessions: dict[str, dict] = {}
+        for entry_id, e in events:
+            # Deleted between submit and drain — the FK would reject the whole batch.
+            if e["exercise_id"] not in live_exercises or e["student_id"] not in live_students:
+                continue
+            attempted_at = parse_datetime(e["attempted_at"])
+            rows.append(ExerciseAttempt(
+                student_id=e["student_id"],
+                exercise_id=e["exercise_id"],
+                topic_id=e["topic_id"],
+                category=e["category"],
+                answer=e["answer"],
+                is_correct=e["is_correct"],
+                session_id=e["session_id"],
+                attempted_at=attempted_at,
+                stream_id=entry_id,
+            ))
+            topic_counts[(e["student_id"], e["topic_id"])] += 1
+            if e["category"]:
+                agg = totals[(e["student_id"], e["topic_id"], e["category"])]
+                agg[0] += 1
+                agg[1] += 1 if e["is_correct"] else 0
+                agg[2] = attempted_at if agg[2] is None else max(agg[2], attempted_at)
+            if e["session_id"]:
+                _fold_session(sessions, e, attempted_at)
+
+        ExerciseAttempt.objects.bulk_create(rows, batch_size=500)
+        if totals:
+            # Sorted so concurrent drainers lock rows in the same order.
+            params = [(*key, *agg) for key, agg in sorted(totals.items())]
+            with connection.cursor() as cursor:
+                cursor.executemany(_INCREMENT_SQL, params)
+        perfect = merge_session_rows(sessions.values())
+        snapshot_rows = []
+        for (student_id, topic_id), count in sorted(topic_counts.items()):
+            snapshot_rows.append({
+                "student_id": student_id,
+                "topic_id": topic_id,
+                "attempts": count,
+                # Each student's perfect-batch change rides on their first row.
+                "perfect_batches": perfect.pop(student_id, 0),
+            })
+        note_attempts(snapshot_rows)
+
+
+def _fold_session(sessions: dict, event: dict, attempted_at) -> None:
+    """Accumulate one event into its batch's chunk for merge_session_rows."""
+    row = sessions.get(event["session_id"])
+    if row is None:
+        row = sessions[event["session_id"]] = {
+            "session_id": event["session_id"],
+            "student_id": event["student_id"],
+            "topic_id": event["topic_id"],
+            "category": event["category"],
+            "difficulty": event.get("difficulty"),
+            "total": 0,
+            "correct": 0,
+            "failed_categories": set(),
+            "at": attempted_at,
+        }
+    if row["category"] != event["category"]:
+        row["category"] = None
+    if row["difficulty"] != event.get("difficulty"):
+        row["difficulty"] = None
+    row["total"] += 1
+    if event["is_correct"]:
+        row["correct"] += 1
+    else:
+        row["failed_categories"].add(event["category"])
+    row["at"] = max(row["at"], attempted_at)
+
+
+def drain(consumer: str, batch_size: int = 500, block_ms: int | None = None) -> int:
+    """
+    Write one batch of queued attempts and acknowledge it. Entries this
+    consumer read earlier but never acknowledged go first. Returns the
+    number of stream entries written or dead-lettered (0 when the queue is
+    empty or every entry failed).
+    """
+    r = get_redis()
+    if r is None:
+        return 0
+    _ensure_group(r)
+
+    entries = []
+    for start, block in (("0", None), (">", block_ms)):
+        response = r.xreadgroup(GROUP, consumer, {STREAM_KEY: start}, count=batch_size, block=block)
+        entries = response[0][1] if response else []
+        if entries:
+            break
+    if not entries:
+        return 0
+
+    started = time.perf_counter()
+    events = []
+    dead: list[tuple] = []
+    for entry_id, fields in entries:
+        try:
+            events.append((entry_id.decode(), json.loads(fields[b"e"])))
+        except (KeyError, ValueError):
+            logger.error("Dead-lettering malformed attempt event %s", entry_id)
+            dead.append((entry_id.decode(), fields, "malformed event"))
+
+    done = [entry_id for entry_id, _ in events]
+    try:
+        _apply(events)
+    except Exception:
+        logger.warning("Attempt batch failed; retrying entry by entry", exc_info=True)
+        done = []
+        worst = 0
+        for entry_id, event in events:
+            try:
+                _apply([(entry_id, event)])
+            except Exception as exc:
+                failures = r.hincrby(_FAILURES_KEY, entry_id, 1)
+                worst = max(worst, failures)
+                if failures < MAX_DELIVERY_FAILURES:
+                    logger.warning("Attempt event %s failed (%d)", entry_id, failures, exc_info=True)
+                    continue
+                logger.error("Dead-lettering attempt event %s after %d failures", entry_id, failures, exc_info=True)
+                dead.append((entry_id, {"e": json.dumps(event)}, repr(exc)))
+            else:
+                done.append(entry_id)
+
+        if not done and not dead:
+            # Everything failed (database down?): back off so a looping
+            # drainer doesn't spend the retries within a second.
+            time.sleep(min(2 ** worst, 30))
+
+    ids = done + [entry_id for entry_id, _, _ in dead]
+    if not ids:
+        return 0
+    pipe = r.pipeline()
+    for entry_id, fields, error in dead:
+        pipe.xadd(DEAD_KEY, {**fields, "error": error[:500], "id": entry_id})
+    pipe.xack(STREAM_KEY, GROUP, *ids)
+    pipe.xdel(STREAM_KEY, *ids)
+    pipe.hdel(_FAILURES_KEY, *ids)
+    pipe.hincrby(_STATS_KEY, "drained_total", len(done))
+    if dead:
+        pipe.hincrby(_STATS_KEY, "dead_lettered_total", len(dead))
+    pipe.hset(_STATS_KEY, mapping={
+        "last_drain_at": int(time.time()),
+        "last_batch_size": len(ids),
+        "last_batch_seconds": round(time.perf_counter() - started, 3),
+    })
+    pipe.execute()
+    return len(ids)
+
+
+def requeue_dead() -> int:
+    """Move every dead-lettered event back onto the stream. Returns how many."""
+    r = get_redis()
+    if r is None:
+        return 0
+    moved = 0
+    while True:
+        entries = r.xrange(DEAD_KEY, count=500)
+        if not entries:
+            return moved
+        pipe = r.pipeline()
+        for _, fields in entries:
+            pipe.xadd(STREAM_KEY, {"e": fields[b"e"]} if b"e" in fields else fields)
+        pipe.xdel(DEAD_KEY, *[entry_id for entry_id, _ in entries])
+        pipe.execute()
+        moved += len(entries)
+
+
+# ─── Metrics ──────────────────────────────────────────────────────────────────
+
+def queue_stats() -> dict:
+    """Backlog and drain throughput for the metrics endpoint."""
+    stats = {"mode": getattr(settings, "ATTEMPT_INGEST_MODE", "sync")}
+    r = get_redis()
+    if r is None:
+        stats["redis"] = False
+        return stats
+
+    stats["redis"] = True
+    try:
+        stats["backlog"] = r.xlen(STREAM_KEY)
+        stats["dead_letters"] = r.xlen(DEAD_KEY)
+        stats["drain"] = {k.decode(): v.decode() for k, v in r.hgetall(_STATS_KEY).items()}
+    except Exception:
+        logger.warning("Attempt queue stats unavailable", exc_info=True)
+    return stats
@@ -0,0 +1,259 @@
+"""
+Attempt recording for MathEd Romania.
+
+Public API:
+    record_attempt(user, exercise, answer, is_correct, session_id) -> AttemptOutcome
+
+Everything a practice answer changes is written in one transaction with a
+fixed number of statements, independent of how many attempts the student
+has logged:
+
+  1. INSERT the ExerciseAttempt
+  2. one PracticeSession upsert that folds the attempt into its batch and
+     returns the batch size and score — only when the attempt has a
+     session_id (see practice_sessions)
+  3. one CategoryProgress upsert (INSERT ... ON CONFLICT DO UPDATE) that
+     bumps the stats, the hint counter and the tier flags, and RETURNs the
+     new hint counter together with the tier flags as they were before
+
+A medium/hard tier clear also recomputes the topic's mastery tier (see
+mastery). The student's progress snapshot gets one upsert with the attempt count,
+any tier clear and the perfect-batch change (see progress_snapshot); it
+returns the snapshot's cleared-tier counters for the badge evaluators.
+
+Streak and badge updates are handlers of the attempt_recorded event (see
+events), dispatched once the attempt commits, so a failure there never
+loses the attempt. Badges are only evaluated for a medium/hard clear, so
+most attempts run no badge queries at all.
+
+In queue mode (ATTEMPT_INGEST_MODE = "queue", see attempt_queue) steps 1–2
+become one Redis round trip, and the upsert only runs when the attempt
+changes the hint counter or clears a tier; otherwise the hint state is a
+single indexed read. Stats increments, PracticeSession rows and the
+snapshot's attempt counts are applied by the queue drain.
+"""
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from apps.progress.attempt_queue import enqueue_attempt, queue_mode
+from apps.progress.events import publish
+from apps.progress.mastery import recompute_topic_mastery
+from apps.progress.models import (
+    CategoryProgress,
+    ExerciseAttempt,
+    PracticeSession,
+    StudentProgressSnapshot,
+)
+from apps.progress.practice_sessions import perfect_delta, record_session_attempt
+from apps.progress.progress_snapshot import note_attempt
+
+HINT_THRESHOLD = 2
+FAILURE_WINDOW = timedelta(days=7)
+
+
+@dataclass
+class AttemptOutcome:
+    """What the attempt endpoint reports back besides the grade."""
+    tier_cleared: dict | None = None
+    hint_active_for_category: str | None = None
+
+
+# `prev` reads the statement snapshot, i.e. the tier flags before this
+# upsert; the upsert's row lock serialises concurrent writers. (A FOR UPDATE
+# on `prev` would skip the row, since the same statement modifies it.)
+_CATEGORY_UPSERT_SQL = f"""
+WITH prev AS (
+    SELECT easy_cleared, medium_cleared, hard_cleared
+    FROM {CategoryProgress._meta.db_table}
+    WHERE student_id = %(student_id)s AND topic_id = %(topic_id)s AND category = %(category)s
+), up AS (
+    INSERT INTO {CategoryProgress._meta.db_table} AS cp (
+        student_id, topic_id, category,
+        easy_cleared, medium_cleared, hard_cleared,
+        category_failure_count, last_failure_at,
+        total_attempts, correct_attempts, last_attempted_at
+    )
+    VALUES (
+        %(student_id)s, %(topic_id)s, %(category)s,
+        %(clear_easy)s, %(clear_medium)s OR %(clear_hard)s, %(clear_hard)s,
+        CASE WHEN %(first_wrong)s THEN 1 ELSE 0 END,
+        CASE WHEN %(first_wrong)s THEN %(now)s END,
+        %(inc_total)s, %(inc_correct)s,
+        CASE WHEN %(inc_total)s > 0 THEN %(now)s END
+    )
+    ON CONFLICT (student_id, topic_id, category) DO UPDATE SET
+        easy_cleared = cp.easy_cleared OR %(clear_easy)s,
+        -- clearing hard also clears medium, but only on the clear itself
+        medium_cleared = cp.medium_cleared OR %(clear_medium)s
+            OR (%(clear_hard)s AND NOT cp.hard_cleared),
+        hard_cleared = cp.hard_cleared OR %(clear_hard)s,
+        category_failure_count = CASE
+            WHEN NOT %(first_wrong)s THEN cp.category_failure_count
+            WHEN cp.last_failure_at IS NULL OR cp.last_failure_at < %(window_start)s THEN 1
+            ELSE cp.category_failure_count + 1
+        END,
+        last_failure_at = CASE
+            WHEN %(first_wrong)s THEN %(now)s ELSE cp.last_failure_at
+        END,
+        total_attempts = cp.total_attempts + %(inc_total)s,
+        correct_attempts = cp.correct_attempts + %(inc_correct)s,
+        last_attempted_at = CASE
+            WHEN %(inc_total)s > 0 THEN %(now)s ELSE cp.last_attempted_at
+        END
+    RETURNING cp.category_failure_count
+)
+SELECT up.category_failure_count,
+       COALESCE(prev.easy_cleared, FALSE),
+       COALESCE(prev.medium_cleared, FALSE),
+       COALESCE(prev.hard_cleared, FALSE)
+FROM up LEFT JOIN prev ON TRUE
+"""
+
+
+def _tier_cleared(difficulty: str, was: tuple[bool, bool, bool]) -> dict | None:
+    """Same outcome as the old per-field checks, decided from the pre-update flags."""
+    easy, medium, hard = was
+    if difficulty == "easy" and not easy:
+        return {"tier": "easy", "also_cleared": []}
+    if difficulty == "medium" and not medium:
+        return {"tier": "medium", "also_cleared": []}
+    if difficulty == "hard" and not hard:
+        return {"tier": "hard", "also_cleared": [] if medium else ["medium"]}
+    return None
+
+
+def _cleared_bits(difficulty: str, was: tuple[bool, bool, bool]) -> int:
+    """Snapshot bits for a category after a perfect batch, mirroring the upsert."""
+    _, medium, hard = was
+    bits = 0
+    if medium or difficulty == "medium" or (difficulty == "hard" and not hard):
+        bits |= StudentProgressSnapshot.CLEARED_MEDIUM
+    if hard or difficulty == "hard":
+        bits |= StudentProgressSnapshot.CLEARED_HARD
+    return bits
+
+
+def _changed_counters(tier_cleared: dict | None) -> set[str]:
+    """Badge inputs (see badges.evaluators) bumped by a tier clear."""
+    if tier_cleared is None:
+        return set()
+    changed = set()
+    if tier_cleared["tier"] == "medium" or "medium" in tier_cleared["also_cleared"]:
+        changed.add("medium_cleared_count")
+    if tier_cleared["tier"] == "hard":
+        changed.add("hard_cleared_count")
+    return changed
+
+
+def record_attempt(user, exercise, answer, is_correct: bool, session_id) -> AttemptOutcome:
+    """Persist one practice attempt and everything derived from it."""
+    outcome = AttemptOutcome()
+    category = exercise.category or ""
+    now = timezone.now()
+
+    batch = None
+    if queue_mode():
+        batch = enqueue_attempt({
+            "student_id": user.pk,
+            "exercise_id": exercise.pk,
+            "topic_id": exercise.topic_id,
+            "category": category,
+            "difficulty": exercise.difficulty,
+            "answer": answer,
+            "is_correct": is_correct,
+            "session_id": session_id,
+            "attempted_at": now,
+        })
+    queued = batch is not None
+
+    with transaction.atomic():
+        if not queued:
+            ExerciseAttempt.objects.create(
+                student=user,
+                exercise=exercise,
+                topic_id=exercise.topic_id,
+                category=category,
+                answer=answer,
+                is_correct=is_correct,
+                session_id=session_id,
+                attempted_at=now,
+            )
+
+        perfect_batch = False
+        perfect_change = 0
+        first_wrong = False
+        if session_id and queued:
+            # Counters include this attempt: "first wrong" means exactly
+            # one wrong attempt for this batch + category.
+            perfect_batch = batch["total"] == PracticeSession.BATCH_SIZE and batch["wrong"] == 0
+            first_wrong = not is_correct and batch["wrong_in_category"] == 1
+        elif session_id:
+            state = record_session_attempt(user, exercise, is_correct, session_id, now)
+            if state is not None:
+                perfect_batch = state.is_perfect
+                perfect_change = perfect_delta(state.total, state.correct, 1, int(is_correct))
+                first_wrong = not is_correct and not state.category_failed_before
+        first_wrong = first_wrong and bool(category)
+
+        # Queued stats increments are applied by the drain, so a queued
+        # attempt only needs the upsert when it moves the hint or tier state.
+        # Uncategorised attempts only touch CategoryProgress to record a tier clear.
+        needs_upsert = (first_wrong if queued else bool(category)) or perfect_batch
+
+        failure_count = 0
+        cleared = 0
+        if needs_upsert:
+            difficulty = exercise.difficulty
+            params = {
+                "student_id": user.pk,
+                "topic_id": exercise.topic_id,
+                "category": category,
+                "clear_easy": perfect_batch and difficulty == "easy",
+                "clear_medium": perfect_batch and difficulty == "medium",
+                "clear_hard": perfect_batch and difficulty == "hard",
+                "first_wrong": first_wrong,
+                "now": now,
+                "window_start": now - FAILURE_WINDOW,
+                "inc_total": 1 if category and not queued else 0,
+                "inc_correct": 1 if category and is_correct and not queued else 0,
+            }
+            with connection.cursor() as cursor:
+                cursor.execute(_CATEGORY_UPSERT_SQL, params)
+                failure_count, *was_cleared = cursor.fetchone()
+            if perfect_batch:
+                outcome.tier_cleared = _tier_cleared(difficulty, tuple(was_cleared))
+                cleared = _cleared_bits(difficulty, tuple(was_cleared))
+        elif category:
+            failure_count = CategoryProgress.objects.filter(
+                student=user, topic_id=exercise.topic_id, category=category,
+            ).values_list("category_failure_count", flat=True).first() or 0
+
+        if category and failure_count >= HINT_THRESHOLD:
+            outcome.hint_active_for_category = category
+
+        # Mastery depends on the medium/hard flags only.
+        if outcome.tier_cleared is not None and outcome.tier_cleared["tier"] != "easy":
+            recompute_topic_mastery(exercise.topic_id, [user.pk])
+
+        badge_counters = None
+        if not queued or cleared:
+            badge_counters = note_attempt(
+                student_id=user.pk,
+                topic_id=exercise.topic_id,
+                attempts=0 if queued else 1,
+                perfect_batches=perfect_change,
+                category=category,
+                cleared=cleared,
+            )
+
+        publish(
+            "attempt_recorded",
+            user=user,
+            changed=_changed_counters(outcome.tier_cleared),
+            badge_counters=badge_counters,
+        )
+
+    return outcome
@@ -0,0 +1,95 @@
+"""
+Per-student earned-badge cache for MathEd Romania.
+
+    mathed:badges:earned:<student_id>   Redis hash {badge_key: earned_at ISO}
+                                        plus "_loaded" once it holds every
+                                        Achievement row of the student
+
+A student earns at most one row per catalog badge, so the hash stays tiny.
+It is filled from the table on first read and kept in step by the
+Achievement signals (apps.progress.signals): a committed award adds its
+field, deletes and edits drop the hash. Fields are only ever added, so an
+award landing while the hash is being loaded can't be lost. A hash written
+by an award before any load lacks "_loaded" and is reloaded on next read.
+
+Without Redis every read goes to the table.
+
+Public API:
+    get_earned(student_id) -> dict[str, str]
+    note_earned(achievement)
+    forget_earned(student_id)
+"""
+import logging
+
+from apps.progress.models import Achievement
+from apps.progress.redis_conn import get_redis
+
+logger = logging.getLogger(__name__)
+
+_KEY = "mathed:badges:earned:{student_id}"
+_LOADED = "_loaded"
+EARNED_TTL = 30 * 24 * 3600
+
+
+def _load(student_id: int) -> dict[str, str]:
+    return {
+        badge_key: earned_at.isoformat()
+        for badge_key, earned_at in Achievement.objects
+        .filter(student_id=student_id)
+        .values_list("badge_key", "earned_at")
+    }
+
+
+def get_earned(student_id: int) -> dict[str, str]:
+    """{badge_key: earned_at ISO string} for every badge the student has."""
+    r = get_redis()
+    if r is None:
+        return _load(student_id)
+    key = _KEY.format(student_id=student_id)
+    try:
+        cached = r.hgetall(key)
+    except Exception:
+        logger.warning("Earned-badge cache read failed", exc_info=True)
+        return _load(student_id)
+    if _LOADED.encode() in cached:
+        return {
+            field.decode(): value.decode()
+            for field, value in cached.items()
+            if field != _LOADED.encode()
+        }
+
+    earned = _load(student_id)
+    try:
+        pipe = r.pipeline()
+        pipe.hset(key, mapping={**earned, _LOADED: "1"})
+        pipe.expire(key, EARNED_TTL)
+        pipe.execute()
+    except Exception:
+        logger.warning("Earned-badge cache fill failed", exc_info=True)
+    return earned
+
+
+def note_earned(achievement: Achievement) -> None:
+    """Add a committed Achievement to its student's hash."""
+    r = get_redis()
+    if r is None:
+        return
+    key = _KEY.format(student_id=achievement.student_id)
+    try:
+        pipe = r.pipeline()
+        pipe.hset(key, achievement.badge_key, achievement.earned_at.isoformat())
+        pipe.expire(key, EARNED_TTL)
+        pipe.execute()
+    except Exception:
+        logger.warning("Earned-badge cache update failed", exc_info=True)
+
+
+def forget_earned(student_id: int) -> None:
+    """Drop the student's hash; the next read reloads it from the table."""
+    r = get_redis()
+    if r is None:
+        return
+    try:
+        r.delete(_KEY.format(student_id=student_id))
+    except Exception:
+        logger.warning("Earned-badge cache delete failed", exc_info=True)
@@ -1,15 +1,44 @@
 """
-Badge evaluation service — entry point called from views after a triggering
-action (lesson opened, test submitted, streak updated, etc.).
+Badge evaluation service — entry point called from the event handlers
+(apps.progress.event_handlers) and views after a triggering action (lesson
+opened, test submitted, streak updated, etc.).
 
 Views are expected to wrap the call in try/except (matching the
 record_activity convention in apps.progress.streak_service); this module
 intentionally does not swallow exceptions.
+
+Callers pass `changed`, the evaluator inputs (see evaluators.depends_on)
+their write actually changed. Only badges depending on one of them are
+evaluated, and when none do the call returns without touching the DB —
+the common case for a practice attempt or a lesson re-open. Badges the
+student already has are skipped before any evaluator runs, using the
+earned-badge cache (see earned), so once every badge an event can award
+is earned the event costs one Redis read.
+
+New achievements are stored undelivered. Responses that can carry badges
+call take_new_badges(), which returns them once; a cache flag set on award
+keeps that to a single cache read while there is nothing new. The poll
+endpoint (AchievementNewView) reads the table directly, so badges still
+arrive if the flag is lost.
 """
+from django.core.cache import cache
+from django.db import connection
+
 from apps.progress.models import Achievement
 
 from . import evaluators
 from .catalog import CATALOG
+from .earned import forget_earned, get_earned
+
+_NEW_FLAG_KEY = "mathed:badges:new:{student_id}"
+NEW_FLAG_TIMEOUT = 7 * 24 * 3600
+
+_TAKE_NEW_SQL = f"""
+UPDATE {Achievement._meta.db_table}
+SET delivered = TRUE
+WHERE student_id = %(student_id)s AND NOT delivered
+RETURNING badge_key
+"""
 
 EVENT_EVALUATORS: dict[str, list[tuple[str, callable]]] = {
     "lesson_opened": [
@@ -38,17 +67,22 @@ EVENT_EVALUATORS: dict[str, list[tuple[str, callable]]] = {
 }
 
 
-def evaluate_badges_for_event(user, event_name, context=None) -> list[str]:
+def evaluate_badges_for_event(user, event_name, context=None, changed=None) -> list[str]:
     """Called from views after a triggering action. Returns the list of
     newly-earned badge keys so the caller can include them in its
-    response payload (frontend pops a toast per key)."""
-    evaluator_list = EVENT_EVALUATORS.get(event_name)
+    response payload (frontend pops a toast per key).
+
+    `changed` limits evaluation to badges depending on those inputs;
+    None evaluates every badge of the event."""
+    evaluator_list = [
+        (badge_key, fn)
+        for badge_key, fn in EVENT_EVALUATORS.get(event_name, [])
+        if changed is None or fn.depends_on & set(changed)
+    ]
     if not evaluator_list:
         return []
 
-    already_earned = set(
-        Achievement.objects.filter(student=user).values_list("badge_key", flat=True)
-    )
+    already_earned = get_earned(user.pk)
     ctx = context or {}
     newly_earned: list[str] = []
 
@@ -62,10 +96,28 @@ def evaluate_badges_for_event(user, event_name, context=None) -> list[str]:
         )
         if created:
             newly_earned.append(badge_key)
+        else:
+            # The cache missed a row it should have had.
+            forget_earned(user.pk)
 
+    if newly_earned:
+        cache.set(_NEW_FLAG_KEY.format(student_id=user.pk), 1, timeout=NEW_FLAG_TIMEOUT)
     return newly_earned
 
 
+def take_new_badges(user, check_db: bool = False) -> list[str]:
+    """Undelivered badge keys, marked delivered. Without check_db, only
+    looks at the table when the new-badge flag is set."""
+    key = _NEW_FLAG_KEY.format(student_id=user.pk)
+    if not check_db and not cache.get(key):
+        return []
+    # Cleared first: a badge awarded after the UPDATE sets it again.
+    cache.delete(key)
+    with connection.cursor() as cursor:
+        cursor.execute(_TAKE_NEW_SQL, {"student_id": user.pk})
+        return [row[0] for row in cursor.fetchall()]
+
+
 def serialize_badges(keys: list[str]) -> list[dict]:
     """Enrich newly-earned keys into full dicts for the API response.
     Returns: [{key, name, description, icon_name, family, secret}, ...]
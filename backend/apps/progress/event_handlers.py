@@ -0,0 +1,65 @@
+"""
+Streak and badge side effects, run by the event bus (apps.progress.events).
+
+Imported from ProgressConfig.ready() so the handlers are registered before
+the first event is published.
+"""
+from apps.content.models import Test
+
+from .badges.service import evaluate_badges_for_event
+from .events import subscribe
+from .streak_service import record_activity
+
+# ─── attempt_recorded ─────────────────────────────────────────────────────────
+# payload: user, changed (badge inputs bumped), badge_counters (dict | None)
+
+@subscribe("attempt_recorded")
+def attempt_streak(user, **payload) -> None:
+    record_activity(user, "exercise")
+
+
+@subscribe("attempt_recorded")
+def attempt_badges(user, changed, badge_counters, **payload) -> None:
+    if changed:
+        evaluate_badges_for_event(user, "exercise_attempted", badge_counters or {}, changed=changed)
+
+
+# ─── lesson_opened ────────────────────────────────────────────────────────────
+# payload: user, lesson, created (first progress row), changed (now opened)
+
+@subscribe("lesson_opened")
+def lesson_streak(user, created, **payload) -> None:
+    if created:
+        record_activity(user, "lesson")
+
+
+@subscribe("lesson_opened")
+def lesson_badges(user, lesson, changed, **payload) -> None:
+    evaluate_badges_for_event(
+        user, "lesson_opened", {"lesson": lesson},
+        changed={"lessons_opened"} if changed else set(),
+    )
+
+
+# ─── test_finished ────────────────────────────────────────────────────────────
+# payload: user, attempt (completed TestAttempt, with .test)
+
+@subscribe("test_finished")
+def test_streak(user, attempt, **payload) -> None:
+    record_activity(user, "topic_test" if attempt.test.scope == Test.Scope.TOPIC else "unit_test")
+
+
+@subscribe("test_finished")
+def test_badges(user, attempt, **payload) -> None:
+    changed = {"test_result"}
+    if attempt.test.scope == Test.Scope.TOPIC:
+        changed.add("topic_mastery")
+    evaluate_badges_for_event(user, "test_finished", {"test_attempt": attempt}, changed=changed)
+
+
+# ─── daily_test_completed ─────────────────────────────────────────────────────
+# payload: user
+
+@subscribe("daily_test_completed")
+def daily_test_streak(user, **payload) -> None:
+    record_activity(user, "daily_test")
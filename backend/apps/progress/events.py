@@ -0,0 +1,168 @@
+"""
+In-process domain event bus for MathEd Romania.
+
+Write paths publish what happened; the streak and badge side effects
+subscribe to it (apps.progress.event_handlers) instead of running inside
+the request:
+
+  attempt_recorded      record_attempt
+  lesson_opened         LessonOpenView
+  test_finished         TestFinishView
+  daily_test_completed  DailyTestSubmitView
+
+Events are dispatched after the publishing transaction commits, so
+handlers always see the committed write. EVENT_BUS_MODE decides where
+the handlers run:
+
+  "sync"   in the publishing thread, before the request responds (default;
+           shells and tests)
+  "async"  on a per-process daemon thread fed by a bounded local queue,
+           which takes streak locking and badge scans off the request path.
+           A full queue falls back to running the handlers inline. Events
+           still queued at interpreter exit are handled then; a killed
+           process loses them (the streak misses that activity, a badge is
+           awarded on its next qualifying event).
+
+Handlers receive the payload as keyword arguments. A failing handler is
+logged and affects neither the publisher nor the other handlers.
+
+Badges awarded by handlers are stored undelivered and reach the client on
+its next response or through the poll endpoint (see
+badges.service.take_new_badges).
+
+Public API:
+    subscribe(event_name) -> decorator
+    publish(event_name, **payload)
+    bus_stats() -> dict
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_SIZE = 10000
+
+_handlers: dict[str, list] = defaultdict(list)
+_counts: Counter = Counter()
+_counts_lock = threading.Lock()
+
+
+def _count(key: str) -> None:
+    with _counts_lock:
+        _counts[key] += 1
+
+
+def _async_mode() -> bool:
+    return getattr(settings, "EVENT_BUS_MODE", "sync") == "async"
+
+
+# ─── Registration / publishing ────────────────────────────────────────────────
+
+def subscribe(event_name: str):
+    """Register the decorated function as a handler for `event_name`."""
+    def register(fn):
+        _handlers[event_name].append(fn)
+        return fn
+    return register
+
+
+def publish(event_name: str, **payload) -> None:
+    """Dispatch the event once the current transaction (if any) commits."""
+    transaction.on_commit(lambda: _dispatch(event_name, payload))
+
+
+def _dispatch(event_name: str, payload: dict) -> None:
+    _count("published")
+    if _async_mode():
+        try:
+            _get_worker().queue.put_nowait((event_name, payload))
+            return
+        except queue.Full:
+            _count("inline_fallbacks")
+    _handle(event_name, payload)
+
+
+def _handle(event_name: str, payload: dict) -> None:
+    for fn in _handlers.get(event_name, ()):
+        try:
+            fn(**payload)
+        except Exception:
+            _count("failed")
+            logger.warning("Handler %s for %s failed", fn.__name__, event_name, exc_info=True)
+    _count("handled")
+
+
+# ─── Async worker ─────────────────────────────────────────────────────────────
+
+class _Worker:
+    """One daemon thread draining this process's event queue."""
+
+    def __init__(self, maxsize: int):
+        self.pid = os.getpid()
+        self.queue: queue.Queue = queue.Queue(maxsize=maxsize)
+        self.thread = threading.Thread(target=self._run, name="mathed-events", daemon=True)
+        self.thread.start()
+
+    def _run(self) -> None:
+        while True:
+            event_name, payload = self.queue.get()
+            try:
+                _handle(event_name, payload)
+            finally:
+                # The thread outlives requests, so nothing else recycles its connection.
+                close_old_connections()
+                self.queue.task_done()
+
+    def drain(self) -> None:
+        """Handle whatever is still queued in the calling thread."""
+        while True:
+            try:
+                event_name, payload = self.queue.get_nowait()
+            except queue.Empty:
+                return
+            _handle(event_name, payload)
+            self.queue.task_done()
+
+
+_worker: _Worker | None = None
+_worker_lock = threading.Lock()
+
+
+def _get_worker() -> _Worker:
+    """This process's worker, started on first use (after a fork, never in the master)."""
+    global _worker
+    worker = _worker
+    if worker is not None and worker.pid == os.getpid():
+        return worker
+    with _worker_lock:
+        if _worker is None or _worker.pid != os.getpid():
+            _worker = _Worker(getattr(settings, "EVENT_QUEUE_SIZE", DEFAULT_QUEUE_SIZE))
+        return _worker
+
+
+@atexit.register
+def _drain_at_exit() -> None:
+    worker = _worker
+    if worker is not None and worker.pid == os.getpid():
+        worker.drain()
+
+
+def bus_stats() -> dict:
+    """Per-process counters for MetricsView."""
+    worker = _worker
+    with _counts_lock:
+        return {
+            "mode": "async" if _async_mode() else "sync",
+            "queue_depth": worker.queue.qsize() if worker is not None else 0,
+            "published": _counts["published"],
+            "handled": _counts["handled"],
+            "failed": _counts["failed"],
+            "inline_fallbacks": _counts["inline_fallbacks"],
+        }
@@ -80,24 +80,166 @@ drag_order
   "order_direction": "ascending"    // "ascending" | "descending"
 }
 """
+import logging
 import random
-from typing import Any
-from math import factorial
+from collections.abc import Callable
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, NamedTuple
 import re
 
 from django.core import signing
+import numpy as np
+
+from apps.progress.expressions import (
+    PLACEHOLDER_RE,
+    Expression,
+    ExpressionError,
+    compile_expression,
+)
+from apps.progress.grading import canonical_value, comparison_relation
+from apps.progress.instance_store import handle_mode, is_handle, load_payload, store_payload
+
+logger = logging.getLogger(__name__)
 
 # Salt used when signing instance tokens — change to invalidate all tokens.
 _TOKEN_SALT = "mathed-exercise-instance-v1"
 
+# Distinct format strings kept pre-split. Templates share many of them
+# ("{a} + {b}"), so this comfortably covers the whole catalogue.
+FORMAT_CACHE_SIZE = 4096
 
-# ─── Parameter generators ─────────────────────────────────────────────────────
 
-def _generate_params(params_spec: dict) -> dict:
+def _compile_expr(expr) -> Expression:
+    return compile_expression(str(expr))
+
+
+# ─── Parameter plans ──────────────────────────────────────────────────────────
+
+class ParamStep(NamedTuple):
+    """
+    A compiled param. `resolve(values)` returns one value; `resolve_columns`
+    (cols, n, rng) returns a NumPy object array of n values drawn at once.
+    """
+    name: str
+    resolve: Callable[[dict], Any]
+    resolve_columns: Callable[[dict, int, Any], Any]
+
+
+def _object_column(values) -> "np.ndarray":
+    column = np.empty(len(values), dtype=object)
+    for i, value in enumerate(values):
+        column[i] = value
+    return column
+
+
+def _eval_columns(expr: Expression, cols: dict, n: int) -> "np.ndarray":
+    """Evaluate an expression for n rows: element-wise when possible, else row by row."""
+    if expr.vectorizable:
+        result = expr(cols)
+        if isinstance(result, np.ndarray):
+            return result.astype(object)
+        column = np.empty(n, dtype=object)
+        column.fill(result)
+        return column
+    dep_columns = [(name, cols[name].tolist()) for name in expr.params]
+    return _object_column([
+        expr({name: values[i] for name, values in dep_columns}) for i in range(n)
+    ])
+
+
+_to_int_columns = None
+
+
+def _int_columns(column: "np.ndarray") -> "np.ndarray":
+    global _to_int_columns
+    if _to_int_columns is None:
+        _to_int_columns = np.frompyfunc(int, 1, 1)
+    return _to_int_columns(column).astype(object)
+
+
+def _param_resolver(name: str, spec: dict) -> tuple[Callable, Callable, tuple[str, ...]]:
+    """Return (resolve, resolve_columns, deps) for one param spec."""
+    t = spec["type"]
+    if t in ("randint", "randint_nonzero"):
+        lo = _compile_expr(spec["min"])
+        hi = _compile_expr(spec["max"])
+        deps = tuple(dict.fromkeys(lo.params + hi.params))
+        nonzero = t == "randint_nonzero"
+
+        def _draw_columns(cols, n, rng):
+            low = np.broadcast_to(_eval_columns(lo, cols, n).astype(np.int64), (n,))
+            high = np.broadcast_to(_eval_columns(hi, cols, n).astype(np.int64), (n,))
+            values = rng.integers(low, high, endpoint=True)
+            if nonzero:
+                zeros = values == 0
+                while zeros.any():
+                    values[zeros] = rng.integers(low[zeros], high[zeros], endpoint=True)
+                    zeros = values == 0
+            return values.astype(object)
+
+        if not nonzero:
+            return (lambda v: random.randint(int(lo(v)), int(hi(v)))), _draw_columns, deps
+
+        def _nonzero(v):
+            low, high = int(lo(v)), int(hi(v))
+            value = 0
+            while value == 0:
+                value = random.randint(low, high)
+            return value
+        return _nonzero, _draw_columns, deps
+    if t == "choice":
+        options = spec["options"]
+
+        def _choice_columns(cols, n, rng):
+            return _object_column(options)[rng.integers(0, len(options), size=n)]
+        return (lambda v: random.choice(options)), _choice_columns, ()
+    if t == "fixed":
+        value = spec["value"]
+
+        def _fixed_columns(cols, n, rng):
+            column = np.empty(n, dtype=object)
+            column.fill(value)
+            return column
+        return (lambda v: value), _fixed_columns, ()
+    if t == "computed":
+        expr = _compile_expr(spec["expr"])
+        return (
+            lambda v: int(expr(v)),
+            lambda cols, n, rng: _int_columns(_eval_columns(expr, cols, n)),
+            expr.params,
+        )
+    raise ValueError(f"Param '{name}': unknown type '{t}'")
+
+
+def _order_steps(nodes: dict, available: set, message: str) -> list[ParamStep]:
+    """
+    Topologically order {name: (resolve, resolve_columns, deps)} by sweeping the params in
+    spec order until every one has its deps resolved — the same order the
+    old retry loop evaluated them in. Deps may point at `available`
+    (already-ordered earlier phases) or at other nodes.
+    """
+    ordered: list[ParamStep] = []
+    resolved = set(available)
+    pending = dict(nodes)
+    while pending:
+        made_progress = False
+        for name, (resolve, resolve_columns, deps) in list(pending.items()):
+            if all(d in resolved for d in deps):
+                ordered.append(ParamStep(name, resolve, resolve_columns))
+                resolved.add(name)
+                del pending[name]
+                made_progress = True
+        if not made_progress:
+            raise ValueError(f"{message}: {list(pending)}")
+    return ordered
+
+
+def _compile_params(params_spec: dict) -> tuple[ParamStep, ...]:
     """
-    Resolve all param specs into concrete values.
+    Compile param specs into an ordered list of resolvers.
 
-    Supports four types:
+    Supports these types:
       randint       — random integer between min and max (both can be expressions)
       randint_nonzero — same but never zero
       choice        — random element from a list
@@ -105,100 +247,144 @@ def _generate_params(params_spec: dict) -> dict:
       computed      — Python expression evaluated after all others are resolved
       label         — maps a resolved param's value to a display string
 
-    Dependency resolution:
-      - Passes 1 & 2 retry until all non-computed/non-label params resolve,
-        so a randint whose bounds reference another randint works correctly.
-      - Pass 3 retries computed params until all chain dependencies resolve,
-        so computed params can depend on other computed params (e.g. x → a, b).
-      - Pass 4 resolves labels last, after everything else is settled.
+    Dependency resolution happens once, here:
+      - randint / choice / fixed params are ordered among themselves, so a
+        randint whose bounds reference another randint works correctly.
+      - computed params come next, ordered so they can depend on other
+        computed params (e.g. x → a, b).
+      - labels run last, after everything else is settled.
     """
-    result: dict[str, Any] = {}
-
-    def _eval_expr(expr, current: dict) -> int:
-        """Substitute resolved params into an expression string and eval it."""
-        s = str(expr)
-        for k, v in current.items():
-            s = s.replace(f"{{{k}}}", str(v))
-        return int(eval(s))  # safe: only math ops on integers
-
-    # ── Passes 1 & 2: resolve randint / choice / fixed (with retry) ──────────
     simple_types = {"randint", "randint_nonzero", "choice", "fixed"}
-    pending = {n: s for n, s in params_spec.items() if s["type"] in simple_types}
+    simple = {
+        n: _param_resolver(n, s) for n, s in params_spec.items() if s["type"] in simple_types
+    }
+    steps = _order_steps(
+        simple, set(), "Cannot resolve params (circular or missing dependency)",
+    )
 
-    max_iterations = len(pending) + 1
-    for _ in range(max_iterations):
-        if not pending:
-            break
-        made_progress = False
-        for name, spec in list(pending.items()):
-            if name in result:
-                del pending[name]
-                continue
-            t = spec["type"]
-            try:
-                if t == "randint":
-                    lo = _eval_expr(spec["min"], result)
-                    hi = _eval_expr(spec["max"], result)
-                    result[name] = random.randint(lo, hi)
-                elif t == "randint_nonzero":
-                    lo = _eval_expr(spec["min"], result)
-                    hi = _eval_expr(spec["max"], result)
-                    v = 0
-                    while v == 0:
-                        v = random.randint(lo, hi)
-                    result[name] = v
-                elif t == "choice":
-                    result[name] = random.choice(spec["options"])
-                elif t == "fixed":
-                    result[name] = spec["value"]
-                del pending[name]
-                made_progress = True
-            except (KeyError, NameError, ValueError):
-                # A bound references a param not yet resolved — retry next round
-                continue
-        if not made_progress:
-            # Remaining params have unresolvable dependencies
-            unresolved = list(pending.keys())
-            raise ValueError(f"Cannot resolve params (circular or missing dependency): {unresolved}")
-
-    # ── Pass 3: computed params (retry until all chain dependencies resolve) ──
-    computed = {n: s for n, s in params_spec.items() if s["type"] == "computed"}
-    max_iterations = len(computed) + 1
-    for _ in range(max_iterations):
-        if all(n in result for n in computed):
-            break
-        made_progress = False
-        for name, spec in computed.items():
-            if name in result:
-                continue
-            try:
-                result[name] = _eval_expr(spec["expr"], result)
-                made_progress = True
-            except (KeyError, NameError, ValueError):
-                continue  # dependency not yet resolved — retry
-        if not made_progress:
-            unresolved = [n for n in computed if n not in result]
-            raise ValueError(f"Cannot resolve computed params (circular or missing dependency): {unresolved}")
+    computed = {
+        n: _param_resolver(n, s) for n, s in params_spec.items() if s["type"] == "computed"
+    }
+    steps += _order_steps(
+        computed, set(simple),
+        "Cannot resolve computed params (circular or missing dependency)",
+    )
 
-    # ── Pass 4: label params (always last — source must already be resolved) ──
     for name, spec in params_spec.items():
         if spec["type"] != "label":
             continue
-        source_val = str(result[spec["source"]])
-        mapping = spec["map"]
-        if source_val not in mapping:
-            raise ValueError(f"Label param '{name}': no mapping for value '{source_val}'")
-        result[name] = mapping[source_val]
+        source, mapping = spec["source"], spec["map"]
+
+        def _label(v, name=name, source=source, mapping=mapping):
+            source_val = str(v[source])
+            if source_val not in mapping:
+                raise ValueError(f"Label param '{name}': no mapping for value '{source_val}'")
+            return mapping[source_val]
+
+        def _label_columns(cols, n, rng, source=source, label=_label):
+            return _object_column([label({source: value}) for value in cols[source].tolist()])
+        steps.append(ParamStep(name, _label, _label_columns))
 
+    return tuple(steps)
+
+
+def _run_params(steps: tuple[ParamStep, ...]) -> dict:
+    """Resolve a compiled param plan into concrete values."""
+    result: dict[str, Any] = {}
+    for name, resolve, _ in steps:
+        result[name] = resolve(result)
     return result
 
 
+def _run_params_columns(steps: tuple[ParamStep, ...], n: int) -> list[dict]:
+    """Resolve a compiled param plan for n instances at once; one dict per instance."""
+    rng = np.random.default_rng()
+    cols: dict[str, Any] = {}
+    for name, _, resolve_columns in steps:
+        cols[name] = resolve_columns(cols, n, rng)
+    names = list(cols)
+    rows = zip(*(cols[name].tolist() for name in names), strict=True)
+    return [dict(zip(names, row, strict=True)) for row in rows] if names else [{} for _ in range(n)]
+
+
+def _generate_params(params_spec: dict) -> dict:
+    """Resolve all param specs into concrete values (uncached compile + run)."""
+    return _run_params(_compile_params(params_spec))
+
+
+# ─── Template plans ───────────────────────────────────────────────────────────
+
+@dataclass(frozen=True)
+class TemplatePlan:
+    """Everything about an Exercise template that doesn't change between instances."""
+    params: tuple[ParamStep, ...]
+    distractor_params: tuple[ParamStep, ...]
+    valid_set: Expression | None
+
+
+def compile_template(template: dict) -> TemplatePlan:
+    valid_set = template.get("valid_set_expr")
+    return TemplatePlan(
+        params=_compile_params(template.get("params", {})),
+        distractor_params=_compile_params(template.get("distractor_params", {})),
+        valid_set=_compile_expr(valid_set) if valid_set is not None else None,
+    )
+
+
+# exercise_id → (template version, plan). The version makes edits saved by
+# another process visible here; local saves also drop the entry (signals.py).
+_plan_cache: dict[int, tuple[str, TemplatePlan]] = {}
+
+
+def template_version(exercise) -> str:
+    """
+    Changes whenever the exercise is saved (Exercise.updated_at). Edits made
+    with QuerySet.update() bypass it and need the pools flushed by hand.
+    """
+    return format(exercise.updated_at.timestamp(), ".6f") if exercise.updated_at else "0"
+
+
+def get_template_plan(exercise) -> TemplatePlan:
+    """Compiled plan for an Exercise, cached by (exercise.id, template version)."""
+    if exercise.pk is None:
+        return compile_template(exercise.template)
+
+    version = template_version(exercise)
+    cached = _plan_cache.get(exercise.pk)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    plan = compile_template(exercise.template)
+    _plan_cache[exercise.pk] = (version, plan)
+    return plan
+
+
+def invalidate_template_plan(exercise_id: int) -> None:
+    _plan_cache.pop(exercise_id, None)
+
+
+# ─── Format strings ───────────────────────────────────────────────────────────
+
+@lru_cache(maxsize=FORMAT_CACHE_SIZE)
+def _split_format(template_str: str) -> tuple[tuple[tuple[str, str], ...], str]:
+    """Split "a {x} b" into ((literal, placeholder), ...) plus the trailing literal."""
+    pieces = []
+    pos = 0
+    for match in PLACEHOLDER_RE.finditer(template_str):
+        pieces.append((template_str[pos:match.start()], match.group(1)))
+        pos = match.end()
+    return tuple(pieces), template_str[pos:]
+
+
 def _fill(template_str: str, params: dict) -> str:
-    """Replace {param_name} placeholders with concrete values."""
-    result = template_str
-    for key, value in params.items():
-        result = result.replace(f"{{{key}}}", str(value))
-    return result
+    """Replace {param_name} placeholders with concrete values; unknown ones are kept."""
+    pieces, tail = _split_format(template_str)
+    out = []
+    for literal, name in pieces:
+        out.append(literal)
+        out.append(str(params[name]) if name in params else f"{{{name}}}")
+    out.append(tail)
+    return "".join(out)
 
 
 def _to_katex(expr: str) -> str:
@@ -233,7 +419,7 @@ def _to_katex(expr: str) -> str:
 
 # ─── Per-type instance builders ───────────────────────────────────────────────
 
-def _build_fill_blank(template: dict, params: dict) -> tuple[dict, dict]:
+def _build_fill_blank(template: dict, params: dict, plan: TemplatePlan) -> tuple[dict, dict]:
     frontend = {
         "question": _fill(template["question"], params),
         "answer_input": template.get("answer_input", "expression"),
@@ -243,31 +429,38 @@ def _build_fill_blank(template: dict, params: dict) -> tuple[dict, dict]:
 
     # ── Set-membership grading ────────────────────────────────────────────
     if "valid_set_expr" in template:
-        expr = _fill(template["valid_set_expr"], params)
-        valid_set = list(eval(expr, {"__builtins__": {}}, {"range": range}))
+        valid_set = list(plan.valid_set(params))
         grading = {
             "valid_set": valid_set,
             "answer_display": template.get("answer_display", ""),
         }
     else:
-        grading = {
-            "correct_expr": _fill(template["answer_expr"], params),
-        }
+        correct_expr = _fill(template["answer_expr"], params)
+        grading = {"correct_expr": correct_expr}
+        # Evaluated once here so grading and the answer display never
+        # re-parse the expression; omitted when only SymPy can decide.
+        correct_value = canonical_value(correct_expr)
+        if correct_value is not None:
+            grading["correct_value"] = correct_value
 
     # ── Follow-up mode: two valid answers ────────────────────────────────
     if "alt_answer_expr" in template:
         alt_expr = _fill(template["alt_answer_expr"], params)
+        correct_exprs = [_fill(template["answer_expr"], params), alt_expr]
         grading = {
-            "correct_exprs": [_fill(template["answer_expr"], params), alt_expr],
+            "correct_exprs": correct_exprs,
             "follow_up_question": _fill(template.get("follow_up_question", ""), params),
         }
+        correct_values = [canonical_value(expr) for expr in correct_exprs]
+        if None not in correct_values:
+            grading["correct_values"] = correct_values
         frontend["display_mode"] = "follow_up"
         frontend["follow_up_question"] = _fill(template.get("follow_up_question", ""), params)
 
     return frontend, grading
 
 
-def _build_multi_fill_blank(template: dict, params: dict) -> tuple[dict, dict]:
+def _build_multi_fill_blank(template: dict, params: dict, plan: TemplatePlan) -> tuple[dict, dict]:
     """
     Multi-field fill-in-the-blank. Student fills in one input per field.
     All fields must be correct for the attempt to count as correct.
@@ -287,6 +480,7 @@ def _build_multi_fill_blank(template: dict, params: dict) -> tuple[dict, dict]:
     """
     fields_out = []
     correct_map = {}
+    correct_value_map = {}
 
     for field in template["fields"]:
         key = field["key"]
@@ -294,6 +488,9 @@ def _build_multi_fill_blank(template: dict, params: dict) -> tuple[dict, dict]:
         correct_expr = _fill(field["answer_expr"], params)
         fields_out.append({"key": key, "label": label})
         correct_map[key] = correct_expr
+        correct_value = canonical_value(correct_expr)
+        if correct_value is not None:
+            correct_value_map[key] = correct_value
 
     frontend = {
         "question": _fill(template["question"], params),
@@ -310,10 +507,12 @@ def _build_multi_fill_blank(template: dict, params: dict) -> tuple[dict, dict]:
     grading = {
         "correct_map": correct_map,
     }
+    if correct_value_map:
+        grading["correct_value_map"] = correct_value_map
     return frontend, grading
 
 
-def _build_multiple_choice(template: dict, params: dict) -> tuple[dict, dict]:
+def _build_multiple_choice(template: dict, params: dict, plan: TemplatePlan) -> tuple[dict, dict]:
     # ── Digit click: number IS the UI, no option boxes ──────────────────────
     if template.get("display_mode") == "digit_click":
         n = str(params["n"])
@@ -335,9 +534,7 @@ def _build_multiple_choice(template: dict, params: dict) -> tuple[dict, dict]:
 
     # ── Standard multiple choice ─────────────────────────────────────────────
     all_params = {**params}
-    dist_spec = template.get("distractor_params", {})
-    dist_params = _generate_params(dist_spec)
-    all_params.update(dist_params)
+    all_params.update(_run_params(plan.distractor_params))
 
     options_out = []
     correct_id = None
@@ -367,7 +564,7 @@ def _build_multiple_choice(template: dict, params: dict) -> tuple[dict, dict]:
     return frontend, grading
 
 
-def _build_comparison(template: dict, params: dict) -> tuple[dict, dict]:
+def _build_comparison(template: dict, params: dict, plan: TemplatePlan) -> tuple[dict, dict]:
     """Build comparison (<, =, >) instance."""
     left = _fill(template["left"], params)
     right = _fill(template["right"], params)
@@ -386,27 +583,34 @@ def _build_comparison(template: dict, params: dict) -> tuple[dict, dict]:
         "left_expr": left,  # ← keep Python syntax for SymPy
         "right_expr": right,
     }
+    relation = comparison_relation(left, right)
+    if relation is not None:
+        grading["correct_relation"] = relation
     return frontend, grading
 
 
-def _build_drag_order(template: dict, params: dict) -> tuple[dict, dict]:
+def _build_drag_order(template: dict, params: dict, plan: TemplatePlan) -> tuple[dict, dict]:
     """Build drag-to-order instance."""
     items_filled = [_fill(item, params) for item in template["items"]]
     direction = template.get("order_direction", "ascending")
 
-    # Determine correct order using Python-evaluable form (so 2**40 sorts correctly).
-    def sort_key(x: str):
+    # Determine correct order by evaluating each item (so 2**40 sorts correctly).
+    def sort_key(item_template: str, filled: str):
         try:
-            return (0, eval(x, {"__builtins__": {}}))
-        except Exception:
+            return (0, compile_expression(item_template)(params))
+        except (ExpressionError, KeyError, ArithmeticError, ValueError, TypeError):
             try:
-                return (0, int(x))
+                return (0, int(filled))
             except ValueError:
-                return (1, x)
+                return (1, filled)
 
+    keys = {
+        filled: sort_key(item, filled)
+        for item, filled in zip(template["items"], items_filled, strict=True)
+    }
     correct_order = sorted(
         items_filled,
-        key=sort_key,
+        key=keys.__getitem__,
         reverse=(direction == "descending"),
     )
 
@@ -432,53 +636,41 @@ def _build_drag_order(template: dict, params: dict) -> tuple[dict, dict]:
 
 # ─── Public API ───────────────────────────────────────────────────────────────
 
-def generate_instance(exercise) -> dict:
-    """
-    Generate a concrete, randomized exercise instance from an Exercise model.
+_BUILDERS = {
+    "fill_blank": _build_fill_blank,
+    "multi_fill_blank": _build_multi_fill_blank,
+    "multiple_choice": _build_multiple_choice,
 
-    Returns a dict safe to send to the frontend. The `instance_token` field
-    is a signed blob containing everything needed to grade the submission
-    later — the frontend must echo it back in the attempt request.
+    "comparison": _build_comparison,
+    "drag_order": _build_drag_order,
+}
 
-    Raises ValueError if the template is malformed.
+
+def _draft_instance(exercise, plan: TemplatePlan, params: dict) -> dict:
+    """
+    Turn resolved params into an unsigned draft: {"instance", "payload"}.
+    The instance's token is filled in by seal_instance.
     """
     template = exercise.template
     exercise_type = exercise.exercise_type
 
-    params_spec = template.get("params", {})
-    params = _generate_params(params_spec)
+    if exercise_type not in _BUILDERS:
+        raise ValueError(f"Unsupported exercise type: {exercise_type}")
 
-    builders = {
-        "fill_blank": _build_fill_blank,
-        "multi_fill_blank": _build_multi_fill_blank,
-        "multiple_choice": _build_multiple_choice,
+    frontend_data, grading_data = _BUILDERS[exercise_type](template, params, plan)
 
-        "comparison": _build_comparison,
-        "drag_order": _build_drag_order,
+    payload = {
+        "exercise_id": exercise.id,
+        "exercise_type": exercise_type,
+        "grading_data": grading_data,
     }
 
-    if exercise_type not in builders:
-        raise ValueError(f"Unsupported exercise type: {exercise_type}")
-
-    frontend_data, grading_data = builders[exercise_type](template, params)
-
-    # Sign the grading data so it cannot be tampered with.
-    instance_token = signing.dumps(
-        {
-            "exercise_id": exercise.id,
-            "exercise_type": exercise_type,
-            "grading_data": grading_data,
-            "nonce": random.randint(0, 999999),
-        },
-        salt=_TOKEN_SALT,
-    )
-
     instance = {
         "exercise_id": exercise.id,
         "exercise_type": exercise_type,
         "difficulty": exercise.difficulty,
         "category": exercise.category,
-        "instance_token": instance_token,
+        "instance_token": None,
         **frontend_data,
     }
 
@@ -486,18 +678,88 @@ def generate_instance(exercise) -> dict:
     if "display_mode" in template:
         instance["display_mode"] = template["display_mode"]
 
-    return instance
+    return {"instance": instance, "payload": payload}
+
+
+def seal_instance(draft: dict, durable: bool = False) -> dict:
+    """
+    Sign a draft (or store it behind a handle) and return the frontend-ready
+    instance. The token's age starts here, so drafts can be built ahead of
+    time (instance_pool) without eating into the token expiry.
+
+    durable=True is for test and daily-test instances, graded at finish
+    time: in handle mode their payload is also written to the DB.
+    """
+    payload = dict(draft["payload"])
+    if handle_mode():
+        # Grading data stays server-side; the token is a short random handle.
+        instance_token = store_payload(payload, durable=durable)
+    else:
+        # Sign the grading data so it cannot be tampered with.
+        payload["nonce"] = random.randint(0, 999999)
+        instance_token = signing.dumps(payload, salt=_TOKEN_SALT)
+    return {**draft["instance"], "instance_token": instance_token}
+
+
+def generate_instance(exercise, durable: bool = False) -> dict:
+    """
+    Generate a concrete, randomized exercise instance from an Exercise model.
+
+    Returns a dict safe to send to the frontend. The `instance_token` field
+    is a signed blob containing everything needed to grade the submission
+    later — the frontend must echo it back in the attempt request. See
+    seal_instance for `durable`.
+
+    Raises ValueError if the template is malformed.
+    """
+    plan = get_template_plan(exercise)
+    draft = _draft_instance(exercise, plan, _run_params(plan.params))
+    return seal_instance(draft, durable=durable)
+
+
+def generate_instances(exercise, n: int) -> list[dict]:
+    """Generate n signed instances of one exercise (see draft_instances)."""
+    return [seal_instance(draft) for draft in draft_instances(exercise, n)]
+
+
+def draft_instances(exercise, n: int) -> list[dict]:
+    """
+    Build n unsigned drafts of one exercise, drawing all params in one pass.
+
+    Random params for all n instances are drawn as NumPy arrays and computed
+    params are evaluated column-wise (row by row for expressions with
+    branches, calls or powers). If the column pass fails for any reason,
+    params are drawn row by row.
+    Per-instance work that can't be batched — the builders — is unchanged,
+    so drafts are identical in shape to generate_instance's. Pass each one
+    through seal_instance before serving it.
+    """
+    if n <= 0:
+        return []
+    plan = get_template_plan(exercise)
+    if n == 1:
+        rows = [_run_params(plan.params) for _ in range(n)]
+    else:
+        try:
+            rows = _run_params_columns(plan.params, n)
+        except Exception:
+            logger.debug("Column param pass failed for exercise %s", exercise.id, exc_info=True)
+            rows = [_run_params(plan.params) for _ in range(n)]
+    return [_draft_instance(exercise, plan, params) for params in rows]
 
 
 def decode_instance_token(token: str, max_age: int | None = 3600) -> dict:
     """
-    Decode and verify a signed instance token.
+    Decode and verify an instance token (signed blob or server-side handle).
 
     Returns the payload dict with keys: exercise_id, exercise_type, grading_data.
     Raises signing.BadSignature if tampered. Raises signing.SignatureExpired
-    if older than max_age seconds; pass max_age=None to skip expiry enforcement
-    (used by long-running test attempts that may outlive the 1-hour default).
+    if older than max_age seconds or if a handle is no longer stored; pass max_age=None
+    to skip expiry enforcement (used by long-running test attempts that may
+    outlive the 1-hour default). Handles also expire after INSTANCE_HANDLE_TTL.
     """
+    if is_handle(token):
+        return load_payload(token, max_age)
     if max_age is None:
         return signing.loads(token, salt=_TOKEN_SALT)
     return signing.loads(token, salt=_TOKEN_SALT, max_age=max_age)
@@ -0,0 +1,237 @@
+"""
+Restricted arithmetic evaluator for exercise templates.
+
+Template expressions ("{a} ** {n} + 1", "pow({a}, {n}, 10)",
+"2 if {base} == 4 else 3") used to go through eval(). Here they are parsed
+once, checked against a whitelist and turned into a tree of closures, so
+each evaluation is a handful of Python calls and no code path can reach
+builtins, attributes or subscripts.
+
+Supported:
+  - integer / float constants and {param} placeholders
+  - + - * / // % ** and unary - + not
+  - comparisons (chained too), and / or, x if cond else y
+  - calls to pow, factorial and range only
+
+Expressions made only of constants, params and arithmetic other than ** are
+also marked `vectorizable`: their closures work unchanged when each param
+is a NumPy object array instead of a number (see generate_instances).
+Powers are left out because the MAX_POWER_BITS check only sees scalars.
+
+Public API:
+    compile_expression(source) -> Expression
+"""
+import ast
+import operator
+import re
+from collections.abc import Callable
+from dataclasses import dataclass
+from functools import lru_cache
+from math import factorial
+from typing import Any
+
+# Distinct expression strings kept compiled (shared across all templates).
+EXPRESSION_CACHE_SIZE = 4096
+
+# Largest power the evaluator will compute, in bits of the result.
+MAX_POWER_BITS = 100_000
+
+# {name} placeholders, shared with exercise_engine's format strings.
+PLACEHOLDER_RE = re.compile(r"\{([^{}]+)\}")
+
+_PARAM_PREFIX = "_p_"
+
+
+class ExpressionError(ValueError):
+    """The expression uses syntax or names outside the template language."""
+
+
+def _checked_pow(base, exponent, modulus=None):
+    if modulus is not None:
+        return pow(base, exponent, modulus)
+    if (
+        isinstance(base, int) and isinstance(exponent, int) and abs(base) > 1
+        and base.bit_length() * exponent > MAX_POWER_BITS
+    ):
+        raise ValueError(f"Power too large: {base} ** {exponent}")
+    return pow(base, exponent)
+
+
+_BIN_OPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: _checked_pow,
+}
+
+_UNARY_OPS = {
+    ast.USub: operator.neg,
+    ast.UAdd: operator.pos,
+    ast.Not: operator.not_,
+}
+
+_COMPARE_OPS = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+}
+
+_FUNCTIONS = {
+    "pow": _checked_pow,
+    "factorial": factorial,
+    "range": range,
+}
+
+# Evaluator signature: fn(values) -> result, where values maps param name → value.
+Evaluator = Callable[[dict], Any]
+
+
+def _compile_node(node: ast.AST, params: set) -> Evaluator:
+    if isinstance(node, ast.Constant):
+        value = node.value
+        if type(value) not in (int, float):
+            raise ExpressionError(f"Unsupported constant: {value!r}")
+        return lambda v: value
+
+    if isinstance(node, ast.Name):
+        if not node.id.startswith(_PARAM_PREFIX):
+            raise ExpressionError(f"Unknown name '{node.id}' (use {{param}} placeholders)")
+        name = node.id[len(_PARAM_PREFIX):]
+        params.add(name)
+        return lambda v: v[name]
+
+    if isinstance(node, ast.BinOp):
+        op = _BIN_OPS.get(type(node.op))
+        if op is None:
+            raise ExpressionError(f"Unsupported operator: {type(node.op).__name__}")
+        left = _compile_node(node.left, params)
+        right = _compile_node(node.right, params)
+        return lambda v: op(left(v), right(v))
+
+    if isinstance(node, ast.UnaryOp):
+        op = _UNARY_OPS.get(type(node.op))
+        if op is None:
+            raise ExpressionError(f"Unsupported operator: {type(node.op).__name__}")
+        operand = _compile_node(node.operand, params)
+        return lambda v: op(operand(v))
+
+    if isinstance(node, ast.Compare):
+        ops = []
+        for op_node in node.ops:
+            op = _COMPARE_OPS.get(type(op_node))
+            if op is None:
+                raise ExpressionError(f"Unsupported comparison: {type(op_node).__name__}")
+            ops.append(op)
+        first = _compile_node(node.left, params)
+        rest = [_compile_node(c, params) for c in node.comparators]
+        if len(ops) == 1:
+            op, right = ops[0], rest[0]
+            return lambda v: op(first(v), right(v))
+
+        pairs = list(zip(ops, rest, strict=True))
+
+        def _chain(v):
+            left = first(v)
+            for op, comparator in pairs:
+                right = comparator(v)
+                if not op(left, right):
+                    return False
+                left = right
+            return True
+        return _chain
+
+    if isinstance(node, ast.BoolOp):
+        operands = [_compile_node(o, params) for o in node.values]
+        if isinstance(node.op, ast.And):
+            def _and(v):
+                result = True
+                for operand in operands:
+                    result = operand(v)
+                    if not result:
+                        return result
+                return result
+            return _and
+
+        def _or(v):
+            result = False
+            for operand in operands:
+                result = operand(v)
+                if result:
+                    return result
+            return result
+        return _or
+
+    if isinstance(node, ast.IfExp):
+        test = _compile_node(node.test, params)
+        body = _compile_node(node.body, params)
+        orelse = _compile_node(node.orelse, params)
+        return lambda v: body(v) if test(v) else orelse(v)
+
+    if isinstance(node, ast.Call):
+        if not isinstance(node.func, ast.Name) or node.func.id not in _FUNCTIONS:
+            raise ExpressionError("Only pow(), factorial() and range() may be called")
+        if node.keywords:
+            raise ExpressionError("Keyword arguments are not supported")
+        fn = _FUNCTIONS[node.func.id]
+        args = [_compile_node(a, params) for a in node.args]
+        return lambda v: fn(*[arg(v) for arg in args])
+
+    raise ExpressionError(f"Unsupported syntax: {type(node).__name__}")
+
+
+@dataclass(frozen=True)
+class Expression:
+    """A compiled template expression; call it with {param: value}."""
+    source: str
+    params: tuple[str, ...]
+    evaluate: Evaluator
+    vectorizable: bool = False
+
+    def __call__(self, values: dict):
+        # KeyError when a referenced param hasn't been resolved
+        return self.evaluate(values)
+
+
+@lru_cache(maxsize=EXPRESSION_CACHE_SIZE)
+def compile_expression(source: str) -> Expression:
+    """
+    Compile a template expression. `{name}` placeholders become params;
+    bare names are rejected. Raises ExpressionError on anything outside the
+    supported subset.
+    """
+    for name in PLACEHOLDER_RE.findall(source):
+        if not name.isidentifier():
+            raise ExpressionError(f"Invalid placeholder {{{name}}} in expression: {source}")
+    text = PLACEHOLDER_RE.sub(lambda m: _PARAM_PREFIX + m.group(1), source)
+    try:
+        tree = ast.parse(text.strip(), mode="eval")
+    except SyntaxError as exc:
+        raise ExpressionError(f"Invalid expression: {source}") from exc
+
+    params: set = set()
+    evaluate = _compile_node(tree.body, params)
+    return Expression(
+        source=source,
+        params=tuple(sorted(params)),
+        evaluate=evaluate,
+        vectorizable=_is_elementwise(tree),
+    )
+
+
+# ast.Pow is left out: on arrays, _checked_pow would skip its size check.
+_ELEMENTWISE_NODES = (
+    ast.Expression, ast.Constant, ast.Name, ast.Load,
+    ast.BinOp, ast.UnaryOp, ast.USub, ast.UAdd,
+    *(op for op in _BIN_OPS if op is not ast.Pow),
+)
+
+
+def _is_elementwise(tree: ast.AST) -> bool:
+    """True when every node maps element-by-element over arrays (no branching or calls)."""
+    return all(isinstance(node, _ELEMENTWISE_NODES) for node in ast.walk(tree))
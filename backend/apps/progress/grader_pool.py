@@ -0,0 +1,222 @@
+"""
+Pool of pre-forked grader processes for MathEd Romania.
+
+SymPy work on student input (parse + simplify) runs here instead of in the
+request thread. Every call gets a hard deadline; a worker that overruns it
+is killed and replaced, so a pathological input like 9^9^9^9 costs one
+worker restart instead of a pinned gunicorn/uvicorn thread. Unlike the old
+SIGALRM guard this works from any thread.
+
+Public API:
+    get_pool() -> GraderPool
+    pool_stats() -> dict
+
+The pool is created lazily, per process, on first use — after gunicorn has
+forked its workers, never in the master. GRADER_POOL_SIZE = 0 disables it
+and runs the function inline with no deadline (handy for shells/tests).
+
+Workers are started through a "forkserver": a single-threaded server
+process, with the grading module preloaded, forks them on request. Forking
+the web process itself from a request thread could copy a lock another
+thread was holding and deadlock the child. Functions sent to a worker must
+therefore be importable module-level functions, and a standalone script
+that grades needs the usual `if __name__ == "__main__":` guard (manage.py
+and the WSGI/ASGI servers already have one).
+"""
+import contextlib
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = 2
+DEFAULT_TIMEOUT_SECONDS = 5
+DEFAULT_MAX_TASKS_PER_WORKER = 1000
+
+
+class GradingTimeout(Exception):
+    pass
+
+
+class GraderError(Exception):
+    """The grading function raised inside the worker; message mirrors the original."""
+
+
+def _worker_main(conn) -> None:
+    """Worker loop: receive (fn, args), send back ("ok", result) or ("error", message)."""
+    while True:
+        try:
+            task = conn.recv()
+        except (EOFError, OSError):
+            return
+        if task is None:
+            return
+        fn, args = task
+        try:
+            conn.send(("ok", fn(*args)))
+        except Exception as exc:  # noqa: BLE001
+            conn.send(("error", str(exc)))
+
+
+class _Worker:
+    def __init__(self, ctx):
+        parent_conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_main,
+            args=(child_conn,),
+            name="mathed-grader",
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        self.conn = parent_conn
+        self.tasks = 0
+
+    def stop(self) -> None:
+        with contextlib.suppress(OSError):
+            self.conn.close()
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=1)
+
+
+class GraderPool:
+    """Fixed-size set of grader processes handed out one call at a time."""
+
+    def __init__(self, size: int, timeout: float, max_tasks_per_worker: int):
+        self.size = size
+        self.timeout = timeout
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self.pid = os.getpid()
+
+        methods = multiprocessing.get_all_start_methods()
+        if "forkserver" in methods:
+            self._ctx = multiprocessing.get_context("forkserver")
+            # Forked workers start with SymPy imported and the parser set up.
+            self._ctx.set_forkserver_preload(["apps.progress.grading"])
+        else:
+            self._ctx = multiprocessing.get_context("spawn")
+        # LIFO so the most recently used (warmest SymPy caches) worker is reused first.
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._counts: Counter = Counter()
+
+        for _ in range(size):
+            self._idle.put(_Worker(self._ctx))
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._counts[key] += 1
+
+    def _replace(self, worker: _Worker) -> None:
+        worker.stop()
+        self._idle.put(_Worker(self._ctx))
+        self._count("recycled")
+
+    def run(self, fn, *args, timeout: float | None = None):
+        """
+        Run `fn(*args)` in a grader process and return its result.
+
+        The deadline covers both waiting for a free worker and the call
+        itself. Raises GradingTimeout when it passes, GraderError when `fn`
+        raised in the worker.
+        """
+        if self.size <= 0:
+            return fn(*args)
+
+        deadline = time.monotonic() + (timeout if timeout is not None else self.timeout)
+        self._count("calls")
+
+        with self._lock:
+            self._waiting += 1
+        try:
+            worker = self._idle.get(timeout=max(0.0, deadline - time.monotonic()))
+        except queue.Empty:
+            self._count("queue_timeouts")
+            raise GradingTimeout("No grader process available") from None
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+        try:
+            worker.conn.send((fn, args))
+            if not worker.conn.poll(max(0.0, deadline - time.monotonic())):
+                self._count("timeouts")
+                logger.warning("Grader exceeded %ss deadline; recycling worker", self.timeout)
+                self._replace(worker)
+                raise GradingTimeout("Grading timed out")
+            status, value = worker.conn.recv()
+        except (EOFError, OSError) as exc:
+            self._replace(worker)
+            raise GraderError(f"grader process died: {exc}") from exc
+
+        worker.tasks += 1
+        if worker.tasks >= self.max_tasks_per_worker:
+            self._replace(worker)  # bounds per-worker SymPy cache growth
+        else:
+            self._idle.put(worker)
+
+        if status == "error":
+            self._count("errors")
+            raise GraderError(value)
+        return value
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": self.size,
+                "idle": self._idle.qsize(),
+                "queue_depth": self._waiting,
+                "calls": self._counts["calls"],
+                "timeouts": self._counts["timeouts"],
+                "queue_timeouts": self._counts["queue_timeouts"],
+                "errors": self._counts["errors"],
+                "recycled": self._counts["recycled"],
+            }
+
+    def shutdown(self) -> None:
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            worker.stop()
+
+
+_pool: GraderPool | None = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> GraderPool:
+    """Return this process's pool, creating it (and forking its workers) on first use."""
+    global _pool
+    pool = _pool
+    if pool is not None and pool.pid == os.getpid():
+        return pool
+
+    with _pool_lock:
+        if _pool is None or _pool.pid != os.getpid():
+            from django.conf import settings
+
+            _pool = GraderPool(
+                size=getattr(settings, "GRADER_POOL_SIZE", DEFAULT_POOL_SIZE),
+                timeout=getattr(settings, "GRADER_TIMEOUT_SECONDS", DEFAULT_TIMEOUT_SECONDS),
+                max_tasks_per_worker=getattr(
+                    settings, "GRADER_MAX_TASKS_PER_WORKER", DEFAULT_MAX_TASKS_PER_WORKER,
+                ),
+            )
+        return _pool
+
+
+def pool_stats() -> dict:
+    """Stats for the metrics endpoint. Does not start the pool if it isn't running."""
+    pool = _pool
+    if pool is None or pool.pid != os.getpid():
+        return {"started": False}
+    return {"started": True, **pool.stats()}
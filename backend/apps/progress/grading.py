@@ -8,10 +8,22 @@ is accepted as correct — student can write 2^40, 2^(19+21), or
 Romanian math notation supported:
   - ^ for exponentiation  (converted to **)
   - : for division        (converted to /)
+
+Grading is tiered: answers made only of integers and + - * / ^ ( ) are
+decided with exact rational arithmetic on a restricted AST, and SymPy is
+only invoked when the input contains symbols or the exact tier cannot
+decide. Both tiers produce identical verdicts for the inputs they share.
+
+SymPy work on student input runs in the grader process pool (see
+grader_pool.py), which enforces the per-call deadline from any thread.
 """
+import ast
 import re
-import signal
-from contextlib import contextmanager
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from fractions import Fraction
+from functools import lru_cache
 from typing import Optional
 
 import sympy
@@ -22,6 +34,8 @@ from sympy.parsing.sympy_parser import (
     standard_transformations,
 )
 
+from apps.progress.grader_pool import GradingTimeout, get_pool, pool_stats
+
 # ─── SymPy parser config ──────────────────────────────────────────────────────
 
 TRANSFORMATIONS = standard_transformations + (
@@ -29,47 +43,246 @@ TRANSFORMATIONS = standard_transformations + (
     convert_xor,  # ^ → **
 )
 
-# Maximum time (seconds) allowed for a single SymPy simplification.
-GRADE_TIMEOUT_SECONDS = 5
+# Process-wide LRU bounds. Keys are normalized input strings, so the same
+# "2^40" resubmitted by a whole classroom is parsed and simplified once.
+EXACT_CACHE_SIZE = 8192
+PARSE_CACHE_SIZE = 4096
+SIMPLIFY_CACHE_SIZE = 4096
 
 
-# ─── Timeout helper ───────────────────────────────────────────────────────────
+# ─── Input normalization ──────────────────────────────────────────────────────
 
-class GradingTimeout(Exception):
-    pass
+def normalize(raw: str) -> str:
+    """
+    Normalize student input to a form SymPy can parse.
+    """
+    s = raw.strip()
+    s = s.replace(":", "/")
+    return s
 
 
-@contextmanager
-def time_limit(seconds: int):
-    """Context manager that raises GradingTimeout after `seconds`.
-    No-op on Windows where SIGALRM is unavailable.
+# ─── Exact arithmetic tier ────────────────────────────────────────────────────
+
+# Inputs built only from these characters can be decided without SymPy.
+# Decimal points are deliberately excluded: SymPy turns them into Floats,
+# whose equality semantics differ from exact rationals.
+_EXACT_INPUT_RE = re.compile(r"[0-9\s+\-*/()^]+")
+
+# Upper bound on the size of a power computed by the exact tier. Anything
+# larger (e.g. 9^9^9^9) is handed to SymPy, which runs under the pool deadline.
+MAX_EXACT_POWER_BITS = 100_000
+
+
+class _Undecidable(Exception):
+    """The exact tier cannot evaluate this expression — defer to SymPy."""
+
+
+def _eval_exact(node: ast.AST) -> Fraction:
+    if isinstance(node, ast.Constant) and type(node.value) is int:
+        return Fraction(node.value)
+
+    if isinstance(node, ast.UnaryOp):
+        operand = _eval_exact(node.operand)
+        if isinstance(node.op, ast.USub):
+            return -operand
+        if isinstance(node.op, ast.UAdd):
+            return operand
+        raise _Undecidable
+
+    if isinstance(node, ast.BinOp):
+        left = _eval_exact(node.left)
+        right = _eval_exact(node.right)
+        if isinstance(node.op, ast.Add):
+            return left + right
+        if isinstance(node.op, ast.Sub):
+            return left - right
+        if isinstance(node.op, ast.Mult):
+            return left * right
+        if isinstance(node.op, ast.Div):
+            return left / right
+        if isinstance(node.op, ast.Pow):
+            if right.denominator != 1:
+                raise _Undecidable  # roots are irrational in general
+            exponent = right.numerator
+            if abs(left) not in (0, 1):
+                size = max(left.numerator.bit_length(), left.denominator.bit_length())
+                if size * abs(exponent) > MAX_EXACT_POWER_BITS:
+                    raise _Undecidable
+            return left ** exponent
+        raise _Undecidable
+
+    raise _Undecidable
+
+
+@lru_cache(maxsize=EXACT_CACHE_SIZE)
+def exact_value(norm: str) -> Fraction | None:
     """
-    if not hasattr(signal, "SIGALRM"):
-        # Windows — no SIGALRM support, skip timeout
-        yield
-        return
+    Evaluate a normalized expression with exact rational arithmetic.
+
+    Returns None when the expression is outside the exact tier (symbols,
+    decimals, implicit multiplication, division by zero, huge powers...).
+    """
+    if not _EXACT_INPUT_RE.fullmatch(norm):
+        return None
+    try:
+        tree = ast.parse(norm.replace("^", "**"), mode="eval")
+        return _eval_exact(tree.body)
+    except (SyntaxError, ArithmeticError, RecursionError, _Undecidable):
+        return None
+
+
+def _relation(left: Fraction, right: Fraction) -> str:
+    if left == right:
+        return "="
+    return ">" if left > right else "<"
+
+
+def canonical_value(expr: str) -> str | None:
+    """
+    Canonical string of an expression's exact value ("1099511627776", "-3/2"),
+    matching str() of the SymPy result. None when the exact tier can't decide.
+    """
+    value = exact_value(normalize(expr))
+    return None if value is None else str(value)
+
+
+def comparison_relation(left_expr: str, right_expr: str) -> str | None:
+    """Return "<", "=" or ">" for two exact expressions, or None if undecidable."""
+    left_val = exact_value(normalize(left_expr))
+    right_val = exact_value(normalize(right_expr))
+    if left_val is None or right_val is None:
+        return None
+    return _relation(left_val, right_val)
+
 
-    def _handler(signum, frame):
-        raise GradingTimeout("Grading timed out")
+# ─── Symbolic tier (cached) ───────────────────────────────────────────────────
 
-    old = signal.signal(signal.SIGALRM, _handler)
-    signal.alarm(seconds)
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_normalized(norm: str) -> sympy.Expr:
+    """parse_expr with the Romanian-notation transformations, memoized."""
+    return parse_expr(norm, transformations=TRANSFORMATIONS)
+
+
+def _compare_in_worker(left_norm: str, right_norm: str) -> str:
+    """
+    Runs inside a grader process. Returns "<", "=" or ">", or "?" when the
+    difference is non-zero but has no definite sign (contains symbols).
+    """
+    diff = sympy.simplify(parse_normalized(left_norm) - parse_normalized(right_norm))
+    if diff == sympy.Integer(0):
+        return "="
     try:
-        yield
-    finally:
-        signal.alarm(0)
-        signal.signal(signal.SIGALRM, old)
+        return ">" if diff > 0 else "<"
+    except TypeError:
+        return "?"
 
 
-# ─── Input normalization ──────────────────────────────────────────────────────
+@lru_cache(maxsize=SIMPLIFY_CACHE_SIZE)
+def _symbolic_outcome(left_norm: str, right_norm: str) -> str:
+    """
+    Dispatch to the grader pool, memoized in the request process.
+    Timeouts and worker errors raise, so they are never cached.
+    """
+    return get_pool().run(_compare_in_worker, left_norm, right_norm)
 
-def normalize(raw: str) -> str:
+
+def symbolic_relation(left_norm: str, right_norm: str) -> str:
     """
-    Normalize student input to a form SymPy can parse.
+    "<", "=" or ">" via SymPy. Raises GradingTimeout, GraderError on parse
+    failures, or TypeError when the difference has no definite sign.
     """
-    s = raw.strip()
-    s = s.replace(":", "/")
-    return s
+    return _as_relation(_symbolic_outcome(left_norm, right_norm))
+
+
+def _as_relation(outcome: str) -> str:
+    if outcome == "?":
+        raise TypeError("cannot determine the sign of a symbolic difference")
+    return outcome
+
+
+# Inside grade_batch, symbolic lookups are answered from a batch-local table
+# that is filled in parallel between grading rounds.
+_batch_state = threading.local()
+
+
+class _SymbolicRequired(Exception):
+    """Raised during a grade_batch round when a pair has not been resolved yet."""
+
+    def __init__(self, pair: tuple[str, str]):
+        super().__init__(pair)
+        self.pair = pair
+
+
+def _symbolic(left_norm: str, right_norm: str) -> str:
+    """_symbolic_outcome for the graders, deferring to grade_batch when one is running."""
+    resolved = getattr(_batch_state, "resolved", None)
+    if resolved is None:
+        _count_tier("symbolic")
+        return _symbolic_outcome(left_norm, right_norm)
+
+    pair = (left_norm, right_norm)
+    if pair not in resolved:
+        raise _SymbolicRequired(pair)
+    _count_tier("symbolic")
+    outcome = resolved[pair]
+    if isinstance(outcome, Exception):
+        raise outcome
+    return outcome
+
+
+# ─── Tier statistics ──────────────────────────────────────────────────────────
+
+_tier_counts: Counter = Counter()
+_tier_lock = threading.Lock()
+
+
+def _count_tier(tier: str) -> None:
+    # Within grade_batch an item may be graded over several rounds; its
+    # counts are held back until it produces its result (see grade_batch).
+    held = getattr(_batch_state, "counts", None)
+    if held is not None:
+        held[tier] += 1
+        return
+    with _tier_lock:
+        _tier_counts[tier] += 1
+
+
+def _add_tier_counts(counts: Counter) -> None:
+    with _tier_lock:
+        _tier_counts.update(counts)
+
+
+def _count_precomputed(precomputed) -> None:
+    """Count an expression grade whose correct side shipped with the instance."""
+    if precomputed:
+        _count_tier("precomputed")
+
+
+def grading_stats() -> dict:
+    """
+    Per-process grading counters, exposed through the metrics endpoint.
+
+    "precomputed" counts graded answers whose correct side came with the
+    instance. A comparison needs nothing else; an expression answer is also
+    counted under the tier ("exact" or "symbolic") that compared the
+    student's side.
+
+    The parse cache is not reported: grading parses in the grader processes,
+    so this process's copy only sees the correct-answer display parses.
+    """
+    with _tier_lock:
+        tiers = {
+            tier: _tier_counts[tier]
+            for tier in ("precomputed", "exact", "symbolic")
+        }
+    caches = {
+        name: fn.cache_info()._asdict()
+        for name, fn in (
+            ("exact", exact_value),
+            ("simplify", _symbolic_outcome),
+        )
+    }
+    return {"tiers": tiers, "caches": caches, "pool": pool_stats()}
 
 
 # ─── Core graders ─────────────────────────────────────────────────────────────
@@ -77,25 +290,35 @@ def normalize(raw: str) -> str:
 def grade_expression(
     student_raw: str,
     correct_expr: str,
-) -> tuple[bool, Optional[str]]:
+    correct_value: str | None = None,
+) -> tuple[bool, str | None]:
     """
     Compare student answer to a correct expression symbolically.
+
+    `correct_value` is the canonical value precomputed at generation time
+    (see canonical_value); when present the correct side is never re-parsed.
     """
     if not student_raw or not student_raw.strip():
         return False, "empty_input"
 
-    try:
-        student_norm = normalize(student_raw)
-        correct_norm = normalize(correct_expr)
+    student_norm = normalize(student_raw)
+    correct_norm = correct_value if correct_value is not None else normalize(correct_expr)
 
-        student_sym = parse_expr(student_norm, transformations=TRANSFORMATIONS)
-        correct_sym = parse_expr(correct_norm, transformations=TRANSFORMATIONS)
+    student_val = exact_value(student_norm)
+    if student_val is not None:
+        if correct_value is not None:
+            correct_val = Fraction(correct_value)
+        else:
+            correct_val = exact_value(correct_norm)
+        if correct_val is not None:
+            _count_tier("exact")
+            return student_val == correct_val, None
 
-        with time_limit(GRADE_TIMEOUT_SECONDS):
-            diff = sympy.simplify(student_sym - correct_sym)
-            is_correct = diff == sympy.Integer(0)
+    try:
+        return _symbolic(student_norm, correct_norm) == "=", None
 
-        return is_correct, None
+    except _SymbolicRequired:
+        raise
 
     except GradingTimeout:
         return False, "timeout"
@@ -111,22 +334,18 @@ def grade_comparison(
     """
     Grade a comparison exercise where the student selects <, =, or >.
     """
-    try:
-        left_sym = parse_expr(normalize(left_expr), transformations=TRANSFORMATIONS)
-        right_sym = parse_expr(normalize(right_expr), transformations=TRANSFORMATIONS)
-
-        with time_limit(GRADE_TIMEOUT_SECONDS):
-            diff = sympy.simplify(left_sym - right_sym)
-
-        if diff == sympy.Integer(0):
-            correct = "="
-        elif diff > 0:
-            correct = ">"
-        else:
-            correct = "<"
+    correct = comparison_relation(left_expr, right_expr)
+    if correct is not None:
+        _count_tier("exact")
+        return student_answer.strip() == correct, None
 
+    try:
+        correct = _as_relation(_symbolic(normalize(left_expr), normalize(right_expr)))
         return student_answer.strip() == correct, None
 
+    except _SymbolicRequired:
+        raise
+
     except GradingTimeout:
         return False, "timeout"
     except Exception as exc:  # noqa: BLE001
@@ -152,7 +371,8 @@ def grade_drag_order(
 def grade_multi_fill_blank(
     student_answers: dict,
     correct_map: dict,
-) -> tuple[bool, Optional[str]]:
+    correct_value_map: dict | None = None,
+) -> tuple[bool, str | None]:
     """
     Grade multi-field fill-in-the-blank.
 
@@ -165,9 +385,12 @@ def grade_multi_fill_blank(
     if not isinstance(student_answers, dict):
         return False, "invalid_format"
 
+    correct_value_map = correct_value_map or {}
     for key, correct_expr in correct_map.items():
         student_val = str(student_answers.get(key, "")).strip()
-        is_correct, error = grade_expression(student_val, correct_expr)
+        is_correct, error = grade_expression(
+            student_val, correct_expr, correct_value_map.get(key),
+        )
         if not is_correct:
             return False, error
 
@@ -193,11 +416,15 @@ def grade_attempt(
     if exercise_type == "fill_blank":
         # Multi-answer follow-up grading
         if "correct_exprs" in grading_data:
+            values = grading_data.get("correct_values") or [None] * len(grading_data["correct_exprs"])
+            matched = None
             for i, expr in enumerate(grading_data["correct_exprs"]):
-                ok, err = grade_expression(str(student_answer), expr)
+                ok, err = grade_expression(str(student_answer), expr, values[i])
                 if ok:
-                    return True, str(i)  # matched index
-            return False, None
+                    matched = str(i)  # matched index
+                    break
+            _count_precomputed(grading_data.get("correct_values"))
+            return matched is not None, matched
 
         # Set-membership grading
         if "valid_set" in grading_data:
@@ -208,15 +435,28 @@ def grade_attempt(
                 return False, "invalid_format"
 
         # Standard symbolic grading
-        return grade_expression(str(student_answer), grading_data["correct_expr"])
+        result = grade_expression(
+            str(student_answer),
+            grading_data["correct_expr"],
+            grading_data.get("correct_value"),
+        )
+        _count_precomputed(grading_data.get("correct_value"))
+        return result
 
     elif exercise_type == "multi_fill_blank":
-        return grade_multi_fill_blank(
+        result = grade_multi_fill_blank(
             student_answer,
             grading_data["correct_map"],
+            grading_data.get("correct_value_map"),
         )
+        _count_precomputed(grading_data.get("correct_value_map"))
+        return result
 
     elif exercise_type == "comparison":
+        # Relation precomputed when the instance was generated
+        if "correct_relation" in grading_data:
+            _count_tier("precomputed")
+            return str(student_answer).strip() == grading_data["correct_relation"], None
         return grade_comparison(
             str(student_answer),
             grading_data["left_expr"],
@@ -236,3 +476,68 @@ def grade_attempt(
         )
 
     return False, f"unknown_exercise_type: {exercise_type}"
+
+
+
+# ─── Batch grading ────────────────────────────────────────────────────────────
+
+def _resolve_pairs(pairs: list[tuple[str, str]]) -> dict:
+    """Run symbolic pairs across the grader pool; failures are kept as exceptions."""
+    def _run(pair):
+        try:
+            return _symbolic_outcome(*pair)
+        except Exception as exc:
+            return exc
+
+    workers = min(len(pairs), max(get_pool().size, 1))
+    if workers <= 1:
+        return {pair: _run(pair) for pair in pairs}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return dict(zip(pairs, executor.map(_run, pairs), strict=True))
+
+
+def grade_batch(items: list[tuple]) -> list[tuple[bool, str | None]]:
+    """
+    Grade many (exercise_type, student_answer, grading_data) items at once.
+
+    Returns (is_correct, error) per item, in input order — the same verdicts
+    grade_attempt would give one by one. Each round grades every pending item
+    inline; cheap items (choice, order, precomputed values, exact arithmetic)
+    finish in the first round, and the SymPy comparisons the rest are waiting
+    on are sent to the grader pool in parallel. Items needing several
+    comparisons (alternate answers, multi-field blanks) take one extra round
+    per comparison actually reached.
+
+    An item whose grading_data is malformed yields (False, "grading_error: ...")
+    instead of failing the whole batch.
+    """
+    results: list = [None] * len(items)
+    pending = list(range(len(items)))
+    resolved: dict = {}
+
+    _batch_state.resolved = resolved
+    try:
+        while pending:
+            needed: dict = {}
+            waiting = []
+            for i in pending:
+                # Tier counts of a round that ends in _SymbolicRequired are
+                # dropped; the item is counted once, in its final round.
+                _batch_state.counts = Counter()
+                try:
+                    results[i] = grade_attempt(*items[i])
+                except _SymbolicRequired as req:
+                    needed[req.pair] = None
+                    waiting.append(i)
+                    continue
+                except Exception as exc:
+                    results[i] = (False, f"grading_error: {exc}")
+                _add_tier_counts(_batch_state.counts)
+            if needed:
+                resolved.update(_resolve_pairs(list(needed)))
+            pending = waiting
+    finally:
+        _batch_state.resolved = None
+        _batch_state.counts = None
+
+    return results
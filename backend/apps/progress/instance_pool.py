@@ -0,0 +1,218 @@
+"""
+Pre-generated exercise instance reservoirs for MathEd Romania.
+
+generate_instance is cheap but not free (param resolution, grading
+precomputation), and practice, daily tests and test starts need 5-20 of
+them per request. The fill_instance_pools command keeps a Redis list of
+ready drafts per exercise; request paths pop from it, sign what they pop
+(seal_instance), and only generate inline when the list is empty or Redis
+is unavailable.
+
+Keys: mathed:ipool:<exercise_id>:<template version>
+    Saving the exercise changes the version (Exercise.updated_at), so
+    instances built from the old template are never served; the old list
+    simply expires.
+
+Entries are JSON {"created": <unix ts>, "instance": {...}, "payload": {...}}
+— a draft from exercise_engine.draft_instances. Signing happens on pop, so
+a served token gets its full expiry however long the draft sat in the pool.
+Entries older than INSTANCE_POOL_MAX_AGE are dropped on pop.
+
+Public API:
+    take_instances(exercise, n, durable=False) -> list[dict]   (at most n)
+    refill(exercise, target) -> int
+    pool_stats(exercises=None) -> dict
+"""
+import json
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+
+from apps.progress.exercise_engine import (
+    draft_instances,
+    generate_instance,
+    seal_instance,
+    template_version,
+)
+from apps.progress.redis_conn import get_redis
+
+logger = logging.getLogger(__name__)
+
+_KEY_PREFIX = "mathed:ipool"
+_STATS_KEY = f"{_KEY_PREFIX}:stats"
+
+
+def _enabled() -> bool:
+    return getattr(settings, "INSTANCE_POOL_ENABLED", True)
+
+
+def _max_age() -> int:
+    return getattr(settings, "INSTANCE_POOL_MAX_AGE", 1800)
+
+
+def pool_key(exercise) -> str:
+    return f"{_KEY_PREFIX}:{exercise.id}:{template_version(exercise)}"
+
+
+# ─── Per-process pop latency ──────────────────────────────────────────────────
+
+_pop_counts: Counter = Counter()
+_pop_lock = threading.Lock()
+
+
+def _record_pop(hits: int, misses: int, stale: int, elapsed_ms: float) -> None:
+    with _pop_lock:
+        _pop_counts["pops"] += 1
+        _pop_counts["hits"] += hits
+        _pop_counts["misses"] += misses
+        _pop_counts["stale"] += stale
+        _pop_counts["total_ms"] += elapsed_ms
+        _pop_counts["max_ms"] = max(_pop_counts["max_ms"], elapsed_ms)
+
+
+# ─── Request path ─────────────────────────────────────────────────────────────
+
+def _pop_ready(r, exercise, n: int) -> tuple[list[dict], int]:
+    """Pop up to n fresh drafts; returns (drafts, stale_dropped)."""
+    raw = r.lpop(pool_key(exercise), n) or []
+    cutoff = time.time() - _max_age()
+    ready, stale = [], 0
+    for item in raw:
+        entry = json.loads(item)
+        # Entries without a payload predate sign-on-pop; treat them as stale.
+        if entry["created"] < cutoff or "payload" not in entry:
+            stale += 1
+            continue
+        ready.append(entry)
+    return ready, stale
+
+
+def take_instances(exercise, n: int = 1, durable: bool = False) -> list[dict]:
+    """
+    Return up to n instances for `exercise`, pooled where possible.
+    `durable` is passed to seal_instance (test and daily-test instances).
+
+    Popped drafts are signed here. Never raises on Redis errors: they are
+    logged and the missing instances are generated inline, and a slot whose inline generation fails (malformed
+    template) is logged and left out. Popped instances are always returned,
+    so a bad template never costs the ones already taken from the pool.
+    """
+    instances: list[dict] = []
+    r = get_redis() if _enabled() else None
+    if r is not None:
+        started = time.perf_counter()
+        stale = 0
+        drafts = []
+        try:
+            drafts, stale = _pop_ready(r, exercise, n)
+        except Exception:
+            logger.warning("Instance pool pop failed", exc_info=True)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        _record_pop(len(drafts), n - len(drafts), stale, elapsed_ms)
+        instances = [seal_instance(draft, durable=durable) for draft in drafts]
+
+    for _ in range(n - len(instances)):
+        try:
+            instances.append(generate_instance(exercise, durable=durable))
+        except Exception:
+            logger.warning("Generating an instance of exercise %s failed", exercise.id, exc_info=True)
+    return instances
+
+
+# ─── Filler ───────────────────────────────────────────────────────────────────
+
+def refill(exercise, target: int) -> int:
+    """
+    Top the exercise's pool up to `target` fresh instances.
+    Returns the number of instances generated. Requires Redis.
+    """
+    r = get_redis()
+    if r is None:
+        return 0
+
+    key = pool_key(exercise)
+    cutoff = time.time() - _max_age()
+
+    # Oldest entries sit at the head; drop the stale ones first.
+    while True:
+        head = r.lindex(key, 0)
+        if head is None or json.loads(head)["created"] >= cutoff:
+            break
+        r.lpop(key)
+
+    missing = target - r.llen(key)
+    if missing <= 0:
+        return 0
+
+    now = time.time()
+    entries = [
+        json.dumps({"created": now, **draft})
+        for draft in draft_instances(exercise, missing)
+    ]
+    pipe = r.pipeline()
+    pipe.rpush(key, *entries)
+    pipe.expire(key, _max_age())
+    pipe.execute()
+    return missing
+
+
+def record_refill_run(generated: int, elapsed_s: float) -> None:
+    """Store filler throughput so every web process can report it."""
+    r = get_redis()
+    if r is None:
+        return
+    pipe = r.pipeline()
+    pipe.hincrby(_STATS_KEY, "generated_total", generated)
+    pipe.hset(_STATS_KEY, mapping={
+        "last_run_at": int(time.time()),
+        "last_run_generated": generated,
+        "last_run_seconds": round(elapsed_s, 3),
+        "last_run_per_second": round(generated / elapsed_s, 1) if elapsed_s > 0 else 0,
+    })
+    pipe.execute()
+
+
+# ─── Metrics ──────────────────────────────────────────────────────────────────
+
+def pool_stats(exercises=None) -> dict:
+    """
+    Pop latency for this process, filler throughput, and — when `exercises`
+    is given — the current fill level of each of their pools.
+    """
+    with _pop_lock:
+        pops = _pop_counts["pops"]
+        process = {
+            "pops": pops,
+            "hits": _pop_counts["hits"],
+            "misses": _pop_counts["misses"],
+            "stale": _pop_counts["stale"],
+            "avg_pop_ms": round(_pop_counts["total_ms"] / pops, 3) if pops else 0,
+            "max_pop_ms": round(_pop_counts["max_ms"], 3),
+        }
+
+    stats = {"enabled": _enabled(), "process": process}
+    r = get_redis()
+    if r is None:
+        stats["redis"] = False
+        return stats
+
+    stats["redis"] = True
+    try:
+        stats["refill"] = {
+            k.decode(): v.decode() for k, v in r.hgetall(_STATS_KEY).items()
+        }
+        if exercises is not None:
+            exercises = list(exercises)
+            pipe = r.pipeline()
+            for exercise in exercises:
+                pipe.llen(pool_key(exercise))
+            levels = pipe.execute()
+            stats["fill_levels"] = {
+                exercise.id: level for exercise, level in zip(exercises, levels, strict=True)
+            }
+    except Exception:
+        logger.warning("Instance pool stats unavailable", exc_info=True)
+    return stats
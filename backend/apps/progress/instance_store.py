@@ -0,0 +1,103 @@
+"""
+Server-side storage for instance grading data.
+
+In the default "signed" mode the whole grading payload travels inside the
+instance_token. With INSTANCE_STORE_MODE = "handle" the payload stays on
+the server and the token is a short random handle ("h:" + 22 chars):
+
+    Redis   mathed:ih:<handle> → JSON payload, expiring after INSTANCE_HANDLE_TTL
+    DB      InstanceHandle rows, written when Redis is unavailable and, for
+            durable payloads, always; purged by `manage.py purge_instance_handles`
+
+Test and daily-test instances are stored durably: their answers are graded
+only at finish time, possibly days later, and a Redis restart or eviction
+must not lose them. Practice instances live in Redis only.
+
+A handle is unguessable, so looking it up is the verification — there is
+no signature to check. decode raises the same signing exceptions as the
+signed path so callers handle both modes identically; a handle that is no
+longer stored anywhere counts as expired.
+
+Public API:
+    handle_mode() -> bool
+    is_handle(token) -> bool
+    store_payload(payload, durable=False) -> str
+    load_payload(token, max_age) -> dict
+"""
+import json
+import logging
+import secrets
+import time
+
+from django.conf import settings
+from django.core import signing
+
+from apps.progress.models import InstanceHandle
+from apps.progress.redis_conn import get_redis
+
+logger = logging.getLogger(__name__)
+
+HANDLE_PREFIX = "h:"
+_KEY_PREFIX = "mathed:ih"
+
+
+def handle_mode() -> bool:
+    return getattr(settings, "INSTANCE_STORE_MODE", "signed") == "handle"
+
+
+def handle_ttl() -> int:
+    return getattr(settings, "INSTANCE_HANDLE_TTL", 2 * 24 * 3600)
+
+
+def is_handle(token: str) -> bool:
+    return isinstance(token, str) and token.startswith(HANDLE_PREFIX)
+
+
+def store_payload(payload: dict, durable: bool = False) -> str:
+    """
+    Persist a grading payload and return its handle token.
+    durable=True writes the DB row as well, so the payload survives Redis.
+    """
+    handle = secrets.token_urlsafe(16)
+    record = {**payload, "created": int(time.time())}
+
+    r = get_redis()
+    if r is not None:
+        try:
+            r.set(f"{_KEY_PREFIX}:{handle}", json.dumps(record), ex=handle_ttl())
+            if not durable:
+                return HANDLE_PREFIX + handle
+        except Exception:
+            logger.warning("Instance store write to Redis failed; using DB", exc_info=True)
+
+    InstanceHandle.objects.create(handle=handle, payload=record)
+    return HANDLE_PREFIX + handle
+
+
+def load_payload(token: str, max_age: int | None = None) -> dict:
+    """
+    Fetch the payload for a handle token. Raises signing.SignatureExpired if
+    the handle is too old or no longer stored (expired or evicted).
+    """
+    handle = token[len(HANDLE_PREFIX):]
+    record = None
+
+    r = get_redis()
+    if r is not None:
+        try:
+            raw = r.get(f"{_KEY_PREFIX}:{handle}")
+            if raw is not None:
+                record = json.loads(raw)
+        except Exception:
+            logger.warning("Instance store read from Redis failed", exc_info=True)
+
+    if record is None:
+        row = InstanceHandle.objects.filter(handle=handle).values_list("payload", flat=True).first()
+        if row is None:
+            raise signing.SignatureExpired("Instance handle not found")
+        record = row
+
+    age = time.time() - record["created"]
+    if age > handle_ttl() or (max_age is not None and age > max_age):
+        raise signing.SignatureExpired(f"Instance handle age {age:.0f}s > {max_age}s")
+    return record
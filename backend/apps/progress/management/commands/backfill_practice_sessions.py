@@ -0,0 +1,37 @@
+"""
+Rebuild PracticeSession summary rows from ExerciseAttempt history.
+
+Usage:
+    python manage.py backfill_practice_sessions
+    python manage.py backfill_practice_sessions --student 42 --student 43
+
+Run once after deploying the practice_sessions table; new attempts keep
+the rows up to date on their own. Safe to re-run: rows for the covered
+sessions are overwritten with freshly computed values.
+"""
+from django.core.management.base import BaseCommand
+
+from apps.progress.practice_sessions import backfill_sessions
+
+
+class Command(BaseCommand):
+    help = "Rebuild per-batch PracticeSession rows from logged exercise attempts"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--student",
+            type=int,
+            action="append",
+            dest="student_ids",
+            help="Only rebuild this student's sessions (repeatable)",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="Rows written per bulk upsert (default 2000)",
+        )
+
+    def handle(self, *args, **options):
+        written = backfill_sessions(options["student_ids"], options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"  Wrote {written} practice sessions"))
@@ -0,0 +1,77 @@
+"""
+Build StreakYearBitmap rows from the StreakActivity log.
+
+Usage:
+    python manage.py backfill_streak_bitmaps
+    python manage.py backfill_streak_bitmaps --student 42 --student 43
+
+Migration 0021 builds the bitmaps when it creates their table, and
+record_activity keeps them current from then on. Run this for activity
+logged by older code between migrating and deploying, or after editing
+StreakActivity rows by hand. Bits already set are kept. Safe to run while
+students are active: each student's Streak row is locked while their
+bitmaps are written, which is the lock record_activity takes first.
+"""
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.progress.models import Streak, StreakActivity, StreakYearBitmap
+
+
+def _backfill_student(student_id: int) -> int:
+    """Merge the student's logged days into their bitmaps. Returns bitmaps written."""
+    with transaction.atomic():
+        # Held until commit, so record_activity can't set a bit in between.
+        list(Streak.objects.select_for_update().filter(student_id=student_id).values_list("id"))
+
+        days_by_year: dict[int, list] = defaultdict(list)
+        for day in StreakActivity.objects.filter(student_id=student_id).values_list("date", flat=True):
+            days_by_year[day.year].append(day)
+        if not days_by_year:
+            return 0
+
+        existing = dict(
+            StreakYearBitmap.objects
+            .filter(student_id=student_id, year__in=list(days_by_year))
+            .values_list("year", "days")
+        )
+        bitmaps = []
+        for year, days in days_by_year.items():
+            bits = StreakYearBitmap.encode(days)
+            if year in existing:
+                bits = bytes(a | b for a, b in zip(bits, bytes(existing[year]), strict=True))
+            bitmaps.append(StreakYearBitmap(student_id=student_id, year=year, days=bits))
+        StreakYearBitmap.objects.bulk_create(
+            bitmaps,
+            update_conflicts=True,
+            unique_fields=["student", "year"],
+            update_fields=["days"],
+        )
+        return len(bitmaps)
+
+
+class Command(BaseCommand):
+    help = "Build per-student, per-year streak bitmaps from StreakActivity rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--student",
+            type=int,
+            action="append",
+            dest="student_ids",
+            help="Only backfill this student's bitmaps (repeatable)",
+        )
+
+    def handle(self, *args, **options):
+        student_ids = options["student_ids"]
+        if not student_ids:
+            student_ids = sorted(set(
+                StreakActivity.objects.order_by().values_list("student_id", flat=True).distinct()
+            ))
+
+        written = sum(_backfill_student(student_id) for student_id in student_ids)
+        self.stdout.write(self.style.SUCCESS(
+            f"  Wrote {written} bitmaps for {len(student_ids)} students"
+        ))
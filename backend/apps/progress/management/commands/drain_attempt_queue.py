@@ -0,0 +1,75 @@
+"""
+Write queued practice attempts to the database in batches.
+
+Usage:
+    python manage.py drain_attempt_queue
+    python manage.py drain_attempt_queue --loop
+    python manage.py drain_attempt_queue --loop --batch-size 1000 --consumer web-2
+    python manage.py drain_attempt_queue --requeue-dead
+
+Only needed with ATTEMPT_INGEST_MODE = "queue". Without --loop it drains
+whatever is queued and exits; with --loop it keeps blocking on the stream.
+Give each concurrently running drainer its own --consumer name.
+--requeue-dead moves dead-lettered events back onto the queue (after
+fixing whatever made them fail) and exits.
+"""
+import socket
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.progress.attempt_queue import drain, requeue_dead
+from apps.progress.redis_conn import get_redis
+
+
+class Command(BaseCommand):
+    help = "Bulk-insert queued exercise attempts and apply their CategoryProgress stats"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Attempts written per transaction (default 500)",
+        )
+        parser.add_argument(
+            "--consumer",
+            default=socket.gethostname(),
+            help="Consumer name within the stream group (default: hostname)",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep draining until interrupted",
+        )
+        parser.add_argument(
+            "--block-ms",
+            type=int,
+            default=5000,
+            help="How long to wait for new attempts with --loop (default 5000)",
+        )
+        parser.add_argument(
+            "--requeue-dead",
+            action="store_true",
+            help="Move dead-lettered attempts back onto the queue and exit",
+        )
+
+    def handle(self, *args, **options):
+        if get_redis() is None:
+            raise CommandError("The default cache is not Redis-backed; there is no queue.")
+
+        if options["requeue_dead"]:
+            moved = requeue_dead()
+            self.stdout.write(self.style.SUCCESS(f"  Requeued {moved} dead-lettered attempts"))
+            return
+
+        block_ms = options["block_ms"] if options["loop"] else None
+        total = 0
+        while True:
+            written = drain(options["consumer"], options["batch_size"], block_ms)
+            total += written
+            if written:
+                self.stdout.write(f"  Wrote {written} attempts")
+            elif not options["loop"]:
+                break
+
+        self.stdout.write(self.style.SUCCESS(f"  Drained {total} attempts"))
@@ -0,0 +1,87 @@
+"""
+Top up the Redis reservoirs of pre-generated exercise instances.
+
+Usage:
+    python manage.py fill_instance_pools
+    python manage.py fill_instance_pools --target 40
+    python manage.py fill_instance_pools --loop --interval 30
+    python manage.py fill_instance_pools --exercise 12 --exercise 15
+
+Run it once from cron, or keep it running with --loop next to the web
+workers. Without Redis it exits with an error — request paths already fall
+back to inline generation.
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.content.models import Exercise
+from apps.progress.instance_pool import record_refill_run, refill
+from apps.progress.redis_conn import get_redis
+
+
+class Command(BaseCommand):
+    help = "Keep per-exercise pools of ready-made instances topped up in Redis"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--target",
+            type=int,
+            default=None,
+            help="Instances to keep per exercise (default: INSTANCE_POOL_TARGET)",
+        )
+        parser.add_argument(
+            "--exercise",
+            type=int,
+            action="append",
+            dest="exercise_ids",
+            help="Only refill this exercise id (repeatable)",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep refilling until interrupted",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=15.0,
+            help="Seconds between refill passes with --loop (default 15)",
+        )
+
+    def handle(self, *args, **options):
+        if get_redis() is None:
+            raise CommandError("The default cache is not Redis-backed; nothing to fill.")
+
+        target = options["target"] or getattr(settings, "INSTANCE_POOL_TARGET", 20)
+
+        while True:
+            self._refill_pass(target, options["exercise_ids"])
+            if not options["loop"]:
+                return
+            time.sleep(options["interval"])
+
+    def _refill_pass(self, target: int, exercise_ids) -> None:
+        exercises = Exercise.objects.filter(is_active=True)
+        if exercise_ids:
+            exercises = exercises.filter(id__in=exercise_ids)
+
+        started = time.perf_counter()
+        generated = 0
+        failed = 0
+        for exercise in exercises.iterator():
+            try:
+                generated += refill(exercise, target)
+            except Exception as exc:
+                failed += 1
+                self.stderr.write(self.style.ERROR(f"  ✗ Exercise {exercise.id}: {exc}"))
+        elapsed = time.perf_counter() - started
+
+        record_refill_run(generated, elapsed)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"  Generated {generated} instances in {elapsed:.2f}s"
+                f" ({failed} exercises failed)"
+            )
+        )
@@ -0,0 +1,184 @@
+"""
+Monthly range partitioning of exercise_attempts on attempted_at (PostgreSQL).
+
+Usage:
+    python manage.py partition_exercise_attempts --convert     # one-time
+    python manage.py partition_exercise_attempts               # next 3 months
+    python manage.py partition_exercise_attempts --months 6
+
+Partitioning is optional; the table works unpartitioned. --convert rebuilds
+it as a partitioned table in one transaction, holding an exclusive lock
+while it copies the rows, so run it in a maintenance window. After that,
+run the command from cron (monthly is enough) so partitions always exist
+ahead of time. Rows outside every partition land in
+exercise_attempts_default.
+
+PostgreSQL requires the partition key in every unique constraint, so the
+primary key becomes (id, attempted_at); Django keeps addressing rows by id.
+The other unique constraints already include attempted_at.
+Indexes and foreign keys are recreated with their original names, so later
+migrations can still find them.
+"""
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from apps.progress.models import ExerciseAttempt
+
+TABLE = ExerciseAttempt._meta.db_table
+OLD_TABLE = f"{TABLE}_unpartitioned"
+
+
+def _add_months(month: date, n: int) -> date:
+    index = month.year * 12 + month.month - 1 + n
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _partition_name(month: date) -> str:
+    return f"{TABLE}_p{month:%Y%m}"
+
+
+def _create_partition(cursor, month: date) -> bool:
+    """Create the partition for `month` unless it exists. Returns True if created."""
+    name = _partition_name(month)
+    cursor.execute("SELECT to_regclass(%s)", [name])
+    if cursor.fetchone()[0] is not None:
+        return False
+    cursor.execute(
+        f"CREATE TABLE {name} PARTITION OF {TABLE} "
+        f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') "
+        f"TO ('{_add_months(month, 1).isoformat()} 00:00:00+00')"
+    )
+    return True
+
+
+def _relkind(cursor, table: str):
+    cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [table])
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+class Command(BaseCommand):
+    help = "Partition exercise_attempts by month and create upcoming partitions"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--convert",
+            action="store_true",
+            help="Rebuild the existing table as a partitioned table (one-time)",
+        )
+        parser.add_argument(
+            "--months",
+            type=int,
+            default=3,
+            help="Months ahead of the current one to create partitions for (default 3)",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("Partitioning needs PostgreSQL.")
+
+        this_month = timezone.now().date().replace(day=1)
+        last_month = _add_months(this_month, options["months"])
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            if options["convert"]:
+                self._convert(cursor, this_month, last_month)
+                return
+
+            if _relkind(cursor, TABLE) != "p":
+                raise CommandError(f"{TABLE} is not partitioned yet; run with --convert first.")
+            created = 0
+            month = this_month
+            while month <= last_month:
+                created += _create_partition(cursor, month)
+                month = _add_months(month, 1)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"  Created {created} partitions (through {last_month:%Y-%m})"
+        ))
+
+    def _convert(self, cursor, this_month: date, last_month: date) -> None:
+        if _relkind(cursor, TABLE) == "p":
+            raise CommandError(f"{TABLE} is already partitioned.")
+
+        cursor.execute(
+            "SELECT conrelid::regclass::text FROM pg_constraint "
+            "WHERE confrelid = %s::regclass AND contype = 'f'",
+            [TABLE],
+        )
+        referencing = [row[0] for row in cursor.fetchall()]
+        if referencing:
+            raise CommandError(
+                f"Tables reference {TABLE} by foreign key ({', '.join(referencing)}); "
+                "partitioning would break those constraints."
+            )
+
+        # Recorded before the rename so the definitions still name TABLE.
+        cursor.execute(
+            "SELECT indexdef FROM pg_indexes WHERE schemaname = current_schema() "
+            "AND tablename = %s AND indexdef NOT LIKE 'CREATE UNIQUE INDEX%%'",
+            [TABLE],
+        )
+        index_defs = [row[0] for row in cursor.fetchall()]
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype IN ('f', 'c', 'u')",
+            [TABLE],
+        )
+        constraints = cursor.fetchall()
+        cursor.execute(
+            "SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'p'",
+            [TABLE],
+        )
+        pk_name = cursor.fetchone()[0]
+
+        cursor.execute(f"LOCK TABLE {TABLE} IN ACCESS EXCLUSIVE MODE")
+        cursor.execute(f"SELECT min(attempted_at), max(attempted_at) FROM {TABLE}")
+        oldest, newest = cursor.fetchone()
+
+        cursor.execute(f"ALTER TABLE {TABLE} RENAME TO {OLD_TABLE}")
+        cursor.execute(
+            f"CREATE TABLE {TABLE} (LIKE {OLD_TABLE} INCLUDING DEFAULTS INCLUDING IDENTITY) "
+            f"PARTITION BY RANGE (attempted_at)"
+        )
+        cursor.execute(f"CREATE TABLE {TABLE}_default PARTITION OF {TABLE} DEFAULT")
+
+        month = oldest.date().replace(day=1) if oldest else this_month
+        end = max(last_month, newest.date().replace(day=1)) if newest else last_month
+        created = 0
+        while month <= end:
+            created += _create_partition(cursor, month)
+            month = _add_months(month, 1)
+
+        cursor.execute(f"INSERT INTO {TABLE} SELECT * FROM {OLD_TABLE}")
+        cursor.execute(
+            "SELECT attidentity FROM pg_attribute WHERE attrelid = %s::regclass AND attname = 'id'",
+            [OLD_TABLE],
+        )
+        if not cursor.fetchone()[0]:
+            # serial column: the copied default still uses the old sequence,
+            # which would be dropped along with the old table.
+            cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [OLD_TABLE])
+            sequence = cursor.fetchone()[0]
+            if sequence:
+                cursor.execute(f"ALTER SEQUENCE {sequence} OWNED BY {TABLE}.id")
+        cursor.execute(f"DROP TABLE {OLD_TABLE}")
+
+        # Names are free again now that the old table is gone.
+        cursor.execute(f"ALTER TABLE {TABLE} ADD CONSTRAINT {pk_name} PRIMARY KEY (id, attempted_at)")
+        for definition in index_defs:
+            cursor.execute(definition)
+        for name, definition in constraints:
+            cursor.execute(f"ALTER TABLE {TABLE} ADD CONSTRAINT {name} {definition}")
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence(%s, 'id'), "
+            f"COALESCE((SELECT max(id) FROM {TABLE}), 0) + 1, false)",
+            [TABLE],
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"  Partitioned {TABLE} into {created} monthly partitions (+ default)"
+        ))
@@ -0,0 +1,39 @@
+"""
+Delete DB-stored instance handles older than INSTANCE_HANDLE_TTL.
+
+Usage:
+    python manage.py purge_instance_handles
+    python manage.py purge_instance_handles --dry-run
+
+Only needed in INSTANCE_STORE_MODE = "handle"; Redis entries expire on
+their own, DB fallback rows do not.
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.progress.instance_store import handle_ttl
+from apps.progress.models import InstanceHandle
+
+
+class Command(BaseCommand):
+    help = "Delete expired DB-stored exercise instance handles"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only count the rows that would be deleted",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(seconds=handle_ttl())
+        expired = InstanceHandle.objects.filter(created_at__lt=cutoff)
+
+        if options["dry_run"]:
+            self.stdout.write(f"  Would delete {expired.count()} expired handles")
+            return
+
+        deleted, _ = expired.delete()
+        self.stdout.write(self.style.SUCCESS(f"  Deleted {deleted} expired handles"))
@@ -0,0 +1,43 @@
+"""
+Rebuild StudentProgressSnapshot rows from the raw progress tables.
+
+Usage:
+    python manage.py rebuild_progress_snapshots
+    python manage.py rebuild_progress_snapshots --student 42 --student 43
+
+Snapshots build themselves on first read and the write paths keep them up
+to date, so this is only needed after changing progress rows by other
+means (admin edits, backfill_practice_sessions) or the snapshot format.
+Safe to run while students are active: each row is locked while rebuilt.
+"""
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from apps.progress.models import StudentProgressSnapshot
+from apps.progress.progress_snapshot import rebuild_snapshot
+
+
+class Command(BaseCommand):
+    help = "Rebuild per-student progress snapshots from lessons, attempts and tests"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--student",
+            type=int,
+            action="append",
+            dest="student_ids",
+            help="Only rebuild this student's snapshot (repeatable)",
+        )
+
+    def handle(self, *args, **options):
+        student_ids = options["student_ids"]
+        if not student_ids:
+            User = get_user_model()
+            student_ids = sorted(
+                set(User.objects.filter(user_type=User.UserType.STUDENT).values_list("id", flat=True))
+                | set(StudentProgressSnapshot.objects.values_list("student_id", flat=True))
+            )
+
+        for student_id in student_ids:
+            rebuild_snapshot(student_id)
+        self.stdout.write(self.style.SUCCESS(f"  Rebuilt {len(student_ids)} progress snapshots"))
@@ -0,0 +1,31 @@
+"""
+Recompute TopicMastery rows from lessons, tests and category progress.
+
+Usage:
+    python manage.py rebuild_topic_mastery
+    python manage.py rebuild_topic_mastery --topic 12 --topic 13
+
+The migration that creates the topic_mastery table fills it, and the write
+paths and content signals keep the rows up to date afterwards. Run this
+after changes that bypass them (fixture loads, raw SQL). Safe to re-run.
+"""
+from django.core.management.base import BaseCommand
+
+from apps.progress.mastery import rebuild_topic_mastery
+
+
+class Command(BaseCommand):
+    help = "Recompute per-student topic mastery tiers"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--topic",
+            type=int,
+            action="append",
+            dest="topic_ids",
+            help="Only recompute this topic (repeatable)",
+        )
+
+    def handle(self, *args, **options):
+        kept = rebuild_topic_mastery(options["topic_ids"])
+        self.stdout.write(self.style.SUCCESS(f"  {kept} topic mastery rows after rebuild"))
@@ -0,0 +1,150 @@
+"""
+Materialized topic mastery tiers for MathEd Romania.
+
+Tier per (student, topic), highest applicable wins:
+  none       — nothing opened
+  deschisa   — at least one published lesson in the topic has progress
+  promovat   — the topic's published test passed
+  stapanit   — promovat AND every active category is medium_cleared
+  perfect    — best score == 100 AND every active category is hard_cleared
+
+TopicMastery rows exist only for tiers above none. A topic's rows are
+recomputed when one of its inputs changes:
+  - a CategoryProgress medium/hard flag flips   (record_attempt)
+  - a topic test attempt completes              (TestFinishView)
+  - a lesson is opened — this can only raise none to deschisa, so it is a
+    single insert                               (note_lesson_opened)
+  - one of the topic's exercises, tests or lessons is created, deleted or
+    has a tier input edited (topic, is_active / is_published, category,
+    scope, pass_threshold)                      (apps.progress.signals)
+
+Migration 0018 fills the table when it is created (with a frozen copy of
+compute_topic_tiers); `manage.py rebuild_topic_mastery` recomputes it after
+bulk edits that bypass the signals (fixture loads, raw SQL).
+
+Public API:
+    compute_topic_tiers(topic_id, student_ids=None) -> dict[int, str]
+    recompute_topic_mastery(topic_id, student_ids=None)
+    note_lesson_opened(student_id, topic_id)
+    get_mastery_map(student, topic_ids) -> dict[int, str]
+    rebuild_topic_mastery(topic_ids=None) -> int
+"""
+from django.db import transaction
+from django.db.models import Count, Max, Q
+
+from apps.content.models import Exercise, Test, Topic
+from apps.progress.models import CategoryProgress, LessonProgress, TestAttempt, TopicMastery
+
+Tier = TopicMastery.Tier
+
+
+def compute_topic_tiers(topic_id: int, student_ids=None) -> dict[int, str]:
+    """Tier above none for every student with progress in the topic."""
+    def _scoped(qs):
+        return qs.filter(student_id__in=student_ids) if student_ids is not None else qs
+
+    tiers: dict[int, str] = {}
+    for student_id in (
+        _scoped(LessonProgress.objects)
+        .filter(lesson__topic_id=topic_id, lesson__is_published=True)
+        .exclude(status=LessonProgress.Status.NOT_STARTED)
+        .order_by()
+        .values_list("student_id", flat=True)
+        .distinct()
+    ):
+        tiers[student_id] = Tier.DESCHISA
+
+    test_id = (
+        Test.objects
+        .filter(topic_id=topic_id, scope=Test.Scope.TOPIC, is_published=True)
+        .values_list("id", flat=True)
+        .first()
+    )
+    if test_id is None:
+        return tiers
+
+    best_scores: dict[int, float | None] = {}
+    for row in (
+        _scoped(TestAttempt.objects)
+        .filter(test_id=test_id, status=TestAttempt.Status.COMPLETED)
+        .order_by()
+        .values("student_id")
+        .annotate(best=Max("score"), passed_count=Count("id", filter=Q(passed=True)))
+    ):
+        if row["passed_count"]:
+            tiers[row["student_id"]] = Tier.PROMOVAT
+            best_scores[row["student_id"]] = float(row["best"]) if row["best"] is not None else None
+    if not best_scores:
+        return tiers
+
+    categories = set(
+        Exercise.objects.filter(topic_id=topic_id, is_active=True).values_list("category", flat=True)
+    )
+    if not categories:
+        return tiers
+
+    medium: dict[int, set[str]] = {}
+    hard: dict[int, set[str]] = {}
+    for student_id, category, medium_cleared, hard_cleared in (
+        CategoryProgress.objects
+        .filter(topic_id=topic_id, student_id__in=list(best_scores))
+        .filter(Q(medium_cleared=True) | Q(hard_cleared=True))
+        .values_list("student_id", "category", "medium_cleared", "hard_cleared")
+    ):
+        if medium_cleared:
+            medium.setdefault(student_id, set()).add(category)
+        if hard_cleared:
+            hard.setdefault(student_id, set()).add(category)
+
+    for student_id, best in best_scores.items():
+        if categories.issubset(medium.get(student_id, set())):
+            tiers[student_id] = Tier.STAPANIT
+            if best is not None and best >= 100 and categories.issubset(hard.get(student_id, set())):
+                tiers[student_id] = Tier.PERFECT
+    return tiers
+
+
+def recompute_topic_mastery(topic_id: int, student_ids=None) -> None:
+    """Rewrite the topic's rows (only those of `student_ids`, if given)."""
+    tiers = compute_topic_tiers(topic_id, student_ids)
+    with transaction.atomic():
+        stale = TopicMastery.objects.filter(topic_id=topic_id).exclude(student_id__in=list(tiers))
+        if student_ids is not None:
+            stale = stale.filter(student_id__in=student_ids)
+        stale.delete()
+        TopicMastery.objects.bulk_create(
+            [
+                TopicMastery(student_id=student_id, topic_id=topic_id, tier=tier)
+                for student_id, tier in tiers.items()
+            ],
+            update_conflicts=True,
+            unique_fields=["student", "topic"],
+            update_fields=["tier", "updated_at"],
+        )
+
+
+def note_lesson_opened(student_id: int, topic_id: int) -> None:
+    """A lesson in the topic got progress: none → deschisa, higher tiers stay."""
+    TopicMastery.objects.bulk_create(
+        [TopicMastery(student_id=student_id, topic_id=topic_id, tier=Tier.DESCHISA)],
+        ignore_conflicts=True,
+    )
+
+
+def get_mastery_map(student, topic_ids) -> dict[int, str]:
+    """{topic_id: tier} for the given topics; topics without a row are "none"."""
+    tiers = dict(
+        TopicMastery.objects
+        .filter(student=student, topic_id__in=topic_ids)
+        .values_list("topic_id", "tier")
+    )
+    return {topic_id: tiers.get(topic_id, Tier.NONE.value) for topic_id in topic_ids}
+
+
+def rebuild_topic_mastery(topic_ids=None) -> int:
+    """Recompute every student's rows for the topics (default: all). Returns rows kept."""
+    if topic_ids is None:
+        topic_ids = list(Topic.objects.values_list("id", flat=True))
+    for topic_id in topic_ids:
+        recompute_topic_mastery(topic_id)
+    return TopicMastery.objects.filter(topic_id__in=topic_ids).count()
@@ -0,0 +1,24 @@
+# Generated by Django 5.1.6 on 2026-10-17 01:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('progress', '0012_achievement'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InstanceHandle',
+            fields=[
+                ('handle', models.CharField(max_length=32, primary_key=True, serialize=False)),
+                ('payload', models.JSONField(help_text='exercise_id, exercise_type and grading_data')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'db_table': 'instance_handles',
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.6 on 2026-10-17 01:15
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('progress', '0013_instancehandle'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='exerciseattempt',
+            name='attempted_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
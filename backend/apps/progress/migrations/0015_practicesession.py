@@ -0,0 +1,36 @@
+# Generated by Django 5.1.6 on 2026-10-17 01:18
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0009_alter_lesson_options_remove_glossaryterm_lesson_and_more'),
+        ('progress', '0014_exerciseattempt_attempted_at_default'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PracticeSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('session_id', models.UUIDField(unique=True)),
+                ('category', models.CharField(blank=True, help_text='Category shared by every attempt in the batch; null if it mixed categories.', max_length=50, null=True)),
+                ('difficulty', models.CharField(blank=True, help_text='Difficulty shared by every attempt in the batch; null if mixed.', max_length=10, null=True)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('correct', models.PositiveIntegerField(default=0)),
+                ('failed_categories', models.JSONField(default=list, help_text='Categories with at least one wrong answer in this batch (hint counter).')),
+                ('completed_at', models.DateTimeField(blank=True, help_text='When the batch reached BATCH_SIZE attempts.', null=True)),
+                ('student', models.ForeignKey(limit_choices_to={'user_type': 'student'}, on_delete=django.db.models.deletion.CASCADE, related_name='practice_sessions', to=settings.AUTH_USER_MODEL)),
+                ('topic', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='practice_sessions', to='content.topic')),
+            ],
+            options={
+                'db_table': 'practice_sessions',
+                'indexes': [models.Index(fields=['student', 'topic', 'category'], name='practice_se_student_b8dbe4_idx')],
+            },
+        ),
+    ]
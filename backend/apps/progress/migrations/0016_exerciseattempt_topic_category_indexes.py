@@ -0,0 +1,93 @@
+# Generated by Django 5.1.6 on 2026-10-17 01:24
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models, transaction
+from django.db.models import OuterRef, Subquery
+
+BACKFILL_BATCH_SIZE = 10000
+
+
+def copy_topic_and_category(apps, schema_editor):
+    # One committed transaction per batch: keeps row locks short and leaves
+    # no pending trigger events for the NOT NULL change that follows.
+    ExerciseAttempt = apps.get_model("progress", "ExerciseAttempt")
+    Exercise = apps.get_model("content", "Exercise")
+    exercise = Exercise.objects.filter(pk=OuterRef("exercise_id"))
+    last_id = 0
+    while True:
+        batch_end = (
+            ExerciseAttempt.objects
+            .filter(pk__gt=last_id)
+            .order_by("pk")
+            .values_list("pk", flat=True)[BACKFILL_BATCH_SIZE - 1:BACKFILL_BATCH_SIZE]
+            .first()
+        )
+        with transaction.atomic():
+            batch = ExerciseAttempt.objects.filter(pk__gt=last_id, topic__isnull=True)
+            if batch_end is not None:
+                batch = batch.filter(pk__lte=batch_end)
+            batch.update(
+                topic_id=Subquery(exercise.values("topic_id")[:1]),
+                category=Subquery(exercise.values("category")[:1]),
+            )
+        if batch_end is None:
+            return
+        last_id = batch_end
+
+
+class Migration(migrations.Migration):
+    # Not atomic: the backfill commits batch by batch, and the ALTERs run
+    # after it rather than in the same transaction as the updated rows.
+    atomic = False
+
+    dependencies = [
+        ('content', '0009_alter_lesson_options_remove_glossaryterm_lesson_and_more'),
+        ('progress', '0015_practicesession'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exerciseattempt',
+            name='topic',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='exercise_attempts', to='content.topic'),
+        ),
+        migrations.AddField(
+            model_name='exerciseattempt',
+            name='category',
+            field=models.CharField(blank=True, default='', max_length=50),
+        ),
+        migrations.RunPython(copy_topic_and_category, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='exerciseattempt',
+            name='topic',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='exercise_attempts', to='content.topic'),
+        ),
+        migrations.AlterField(
+            model_name='exerciseattempt',
+            name='student',
+            field=models.ForeignKey(db_index=False, limit_choices_to={'user_type': 'student'}, on_delete=django.db.models.deletion.CASCADE, related_name='exercise_attempts', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='exerciseattempt',
+            name='session_id',
+            field=models.UUIDField(blank=True, help_text='Groups attempts from a single practice batch', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='exerciseattempt',
+            index=models.Index(fields=['student', 'topic', 'category'], include=['is_correct'], name='attempt_student_topic_cat_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='exerciseattempt',
+            index=models.Index(fields=['student', 'category'], include=['is_correct'], name='attempt_student_cat_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='exerciseattempt',
+            index=models.Index(fields=['student', 'session_id', 'is_correct'], name='attempt_student_session_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='exerciseattempt',
+            index=models.Index(fields=['student', '-attempted_at'], name='attempt_student_recent_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.6 on 2026-10-17 01:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('progress', '0016_exerciseattempt_topic_category_indexes'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentProgressSnapshot',
+            fields=[
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='progress_snapshot', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('lessons', models.JSONField(default=dict, help_text='LessonProgress status per lesson: {"<lesson_id>": status}')),
+                ('topic_attempts', models.JSONField(default=dict, help_text='ExerciseAttempt count per topic: {"<topic_id>": count}')),
+                ('categories', models.JSONField(default=dict, help_text='Cleared tiers per category: {"<topic_id>:<category>": bits}, 1 = medium, 2 = hard')),
+                ('tests', models.JSONField(default=dict, help_text='Completed attempts per test: {"<test_id>": {best_score, attempts_count, passed}}')),
+                ('perfect_batches', models.PositiveIntegerField(default=0)),
+                ('rebuilt_at', models.DateTimeField(blank=True, help_text='Last full rebuild; null means the row must be rebuilt before it is read.', null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'student_progress_snapshots',
+            },
+        ),
+    ]
@@ -0,0 +1,116 @@
+# Generated by Django 5.1.6 on 2026-10-17 01:32
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, Q
+
+
+def _topic_tiers(apps, topic_id):
+    # A frozen copy of apps.progress.mastery.compute_topic_tiers as of this
+    # migration, on historical models.
+    Exercise = apps.get_model("content", "Exercise")
+    Test = apps.get_model("content", "Test")
+    CategoryProgress = apps.get_model("progress", "CategoryProgress")
+    LessonProgress = apps.get_model("progress", "LessonProgress")
+    TestAttempt = apps.get_model("progress", "TestAttempt")
+
+    tiers = {}
+    for student_id in (
+        LessonProgress.objects
+        .filter(lesson__topic_id=topic_id, lesson__is_published=True)
+        .exclude(status="not_started")
+        .order_by()
+        .values_list("student_id", flat=True)
+        .distinct()
+    ):
+        tiers[student_id] = "deschisa"
+
+    test_id = (
+        Test.objects
+        .filter(topic_id=topic_id, scope="topic", is_published=True)
+        .values_list("id", flat=True)
+        .first()
+    )
+    if test_id is None:
+        return tiers
+
+    best_scores = {}
+    for row in (
+        TestAttempt.objects
+        .filter(test_id=test_id, status="completed")
+        .order_by()
+        .values("student_id")
+        .annotate(best=Max("score"), passed_count=Count("id", filter=Q(passed=True)))
+    ):
+        if row["passed_count"]:
+            tiers[row["student_id"]] = "promovat"
+            best_scores[row["student_id"]] = float(row["best"]) if row["best"] is not None else None
+    if not best_scores:
+        return tiers
+
+    categories = set(
+        Exercise.objects.filter(topic_id=topic_id, is_active=True).values_list("category", flat=True)
+    )
+    if not categories:
+        return tiers
+
+    medium, hard = {}, {}
+    for student_id, category, medium_cleared, hard_cleared in (
+        CategoryProgress.objects
+        .filter(topic_id=topic_id, student_id__in=list(best_scores))
+        .filter(Q(medium_cleared=True) | Q(hard_cleared=True))
+        .values_list("student_id", "category", "medium_cleared", "hard_cleared")
+    ):
+        if medium_cleared:
+            medium.setdefault(student_id, set()).add(category)
+        if hard_cleared:
+            hard.setdefault(student_id, set()).add(category)
+
+    for student_id, best in best_scores.items():
+        if categories.issubset(medium.get(student_id, set())):
+            tiers[student_id] = "stapanit"
+            if best is not None and best >= 100 and categories.issubset(hard.get(student_id, set())):
+                tiers[student_id] = "perfect"
+    return tiers
+
+
+def fill_topic_mastery(apps, schema_editor):
+    # The table is new, so plain inserts.
+    Topic = apps.get_model("content", "Topic")
+    TopicMastery = apps.get_model("progress", "TopicMastery")
+    for topic_id in Topic.objects.values_list("id", flat=True):
+        TopicMastery.objects.bulk_create(
+            [
+                TopicMastery(student_id=student_id, topic_id=topic_id, tier=tier)
+                for student_id, tier in _topic_tiers(apps, topic_id).items()
+            ],
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0009_alter_lesson_options_remove_glossaryterm_lesson_and_more'),
+        ('progress', '0017_studentprogresssnapshot'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TopicMastery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tier', models.CharField(choices=[('none', 'None'), ('deschisa', 'Opened'), ('promovat', 'Passed'), ('stapanit', 'Mastered'), ('perfect', 'Perfect')], max_length=10)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('student', models.ForeignKey(limit_choices_to={'user_type': 'student'}, on_delete=django.db.models.deletion.CASCADE, related_name='topic_mastery', to=settings.AUTH_USER_MODEL)),
+                ('topic', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mastery', to='content.topic')),
+            ],
+            options={
+                'db_table': 'topic_mastery',
+                'unique_together': {('student', 'topic')},
+            },
+        ),
+        migrations.RunPython(fill_topic_mastery, migrations.RunPython.noop),
+    ]
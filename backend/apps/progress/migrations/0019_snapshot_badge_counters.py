@@ -0,0 +1,34 @@
+# Generated by Django 5.1.6 on 2026-10-17 01:34
+
+from django.db import migrations, models
+
+
+def fill_badge_counters(apps, schema_editor):
+    # Counted from the category bits (CLEARED_MEDIUM = 1, CLEARED_HARD = 2).
+    StudentProgressSnapshot = apps.get_model("progress", "StudentProgressSnapshot")
+    for snapshot in StudentProgressSnapshot.objects.exclude(categories={}).iterator():
+        bits = snapshot.categories.values()
+        snapshot.medium_cleared_count = sum(1 for b in bits if b & 1)
+        snapshot.hard_cleared_count = sum(1 for b in bits if b & 2)
+        snapshot.save(update_fields=["medium_cleared_count", "hard_cleared_count"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('progress', '0018_topicmastery'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studentprogresssnapshot',
+            name='hard_cleared_count',
+            field=models.PositiveIntegerField(default=0, help_text='Categories with hard cleared (badge counter)'),
+        ),
+        migrations.AddField(
+            model_name='studentprogresssnapshot',
+            name='medium_cleared_count',
+            field=models.PositiveIntegerField(default=0, help_text='Categories with medium cleared (badge counter)'),
+        ),
+        migrations.RunPython(fill_badge_counters, migrations.RunPython.noop),
+    ]
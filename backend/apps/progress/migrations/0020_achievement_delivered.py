@@ -0,0 +1,24 @@
+# Generated by Django 5.1.6 on 2026-10-17 02:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('progress', '0019_snapshot_badge_counters'),
+    ]
+
+    operations = [
+        # Existing achievements were already returned by the request that earned them.
+        migrations.AddField(
+            model_name='achievement',
+            name='delivered',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AlterField(
+            model_name='achievement',
+            name='delivered',
+            field=models.BooleanField(default=False, help_text='Shown to the student (returned by an API response)'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.1.6 on 2026-10-17 01:44
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def _encode(days) -> bytes:
+    # StreakYearBitmap.encode as of this migration: 366 bits, day-of-year
+    # index, least significant bit first within each byte.
+    bits = bytearray(46)
+    for day in days:
+        index = day.timetuple().tm_yday - 1
+        bits[index // 8] |= 1 << (index % 8)
+    return bytes(bits)
+
+
+def fill_streak_bitmaps(apps, schema_editor):
+    # The table is new, so plain inserts.
+    StreakActivity = apps.get_model("progress", "StreakActivity")
+    StreakYearBitmap = apps.get_model("progress", "StreakYearBitmap")
+    days_by_key: dict[tuple, list] = {}
+    for student_id, day in (
+        StreakActivity.objects.order_by().values_list("student_id", "date").iterator()
+    ):
+        days_by_key.setdefault((student_id, day.year), []).append(day)
+    StreakYearBitmap.objects.bulk_create(
+        [
+            StreakYearBitmap(student_id=student_id, year=year, days=_encode(days))
+            for (student_id, year), days in days_by_key.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('progress', '0020_achievement_delivered'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StreakYearBitmap',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField()),
+                ('days', models.BinaryField(help_text='366-bit active-day bitmap')),
+                ('student', models.ForeignKey(limit_choices_to={'user_type': 'student'}, on_delete=django.db.models.deletion.CASCADE, related_name='streak_bitmaps', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'streak_year_bitmaps',
+                'unique_together': {('student', 'year')},
+            },
+        ),
+        migrations.RunPython(fill_streak_bitmaps, migrations.RunPython.noop),
+    ]
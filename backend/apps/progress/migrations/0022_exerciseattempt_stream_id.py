@@ -0,0 +1,25 @@
+# Generated by Django 5.1.6 on 2026-10-17 01:55
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0009_alter_lesson_options_remove_glossaryterm_lesson_and_more'),
+        ('progress', '0021_streakyearbitmap'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exerciseattempt',
+            name='stream_id',
+            field=models.CharField(blank=True, editable=False, max_length=32, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='exerciseattempt',
+            constraint=models.UniqueConstraint(fields=('stream_id', 'attempted_at'), name='attempt_stream_entry_uniq'),
+        ),
+    ]
@@ -4,9 +4,11 @@ Tracks lesson completion, exercise attempts, test results,
 classroom pacing, and engagement streaks.
 """
 import uuid
+from datetime import date, timedelta
 
 from django.conf import settings
 from django.db import models
+from django.utils import timezone
 
 
 class LessonProgress(models.Model):
@@ -52,26 +54,67 @@ class ExerciseAttempt(models.Model):
         on_delete=models.CASCADE,
         related_name="exercise_attempts",
         limit_choices_to={"user_type": "student"},
+        db_index=False,  # every composite index below leads with student
     )
     exercise = models.ForeignKey(
         "content.Exercise",
         on_delete=models.CASCADE,
         related_name="attempts",
     )
+    # Copied from the exercise at insert time so per-topic / per-category
+    # stats don't join exercises; rewritten when the exercise moves
+    # (progress.signals.move_exercise_attempts).
+    topic = models.ForeignKey(
+        "content.Topic",
+        on_delete=models.CASCADE,
+        related_name="exercise_attempts",
+    )
+    category = models.CharField(max_length=50, blank=True, default="")
     answer = models.JSONField(help_text="Student's submitted answer")
     is_correct = models.BooleanField()
     # Groups all attempts from one 5-exercise practice batch together.
+    # Indexed through (student, session_id, is_correct) below.
     session_id = models.UUIDField(
         null=True,
         blank=True,
-        db_index=True,
         help_text="Groups attempts from a single practice batch",
     )
-    attempted_at = models.DateTimeField(auto_now_add=True)
+    # Not auto_now_add: queued attempts are bulk-inserted later and keep
+    # the time they were submitted (see attempt_queue).
+    attempted_at = models.DateTimeField(default=timezone.now, editable=False)
+    # Redis stream entry the row was drained from (queue mode only); makes a
+    # redelivered entry detectable (see attempt_queue).
+    stream_id = models.CharField(max_length=32, null=True, blank=True, editable=False)
 
     class Meta:
         db_table = "exercise_attempts"
         ordering = ["-attempted_at"]
+        constraints = [
+            # attempted_at is part of the key so the constraint survives
+            # partitioning on it (partition_exercise_attempts).
+            models.UniqueConstraint(
+                fields=["stream_id", "attempted_at"],
+                name="attempt_stream_entry_uniq",
+            ),
+        ]
+        indexes = [
+            # Per-topic and per-category counts; is_correct makes them index-only.
+            models.Index(
+                fields=["student", "topic", "category"],
+                include=["is_correct"],
+                name="attempt_student_topic_cat_idx",
+            ),
+            models.Index(
+                fields=["student", "category"],
+                include=["is_correct"],
+                name="attempt_student_cat_idx",
+            ),
+            models.Index(
+                fields=["student", "session_id", "is_correct"],
+                name="attempt_student_session_idx",
+            ),
+            models.Index(fields=["student", "-attempted_at"], name="attempt_student_recent_idx"),
+        ]
 
     def __str__(self):
         result = "✓" if self.is_correct else "✗"
@@ -129,6 +172,61 @@ class CategoryProgress(models.Model):
         return f"{self.student.email} — {self.topic.title} / {self.category}"
 
 
+class PracticeSession(models.Model):
+    """
+    Summary of one practice batch (all attempts sharing a session_id),
+    updated on every attempt so batch stats never scan ExerciseAttempt.
+    """
+    BATCH_SIZE = 5
+
+    session_id = models.UUIDField(unique=True)
+    student = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="practice_sessions",
+        limit_choices_to={"user_type": "student"},
+    )
+    topic = models.ForeignKey(
+        "content.Topic",
+        on_delete=models.CASCADE,
+        related_name="practice_sessions",
+    )
+    category = models.CharField(
+        max_length=50,
+        null=True,
+        blank=True,
+        help_text="Category shared by every attempt in the batch; null if it mixed categories.",
+    )
+    difficulty = models.CharField(
+        max_length=10,
+        null=True,
+        blank=True,
+        help_text="Difficulty shared by every attempt in the batch; null if mixed.",
+    )
+    total = models.PositiveIntegerField(default=0)
+    correct = models.PositiveIntegerField(default=0)
+    failed_categories = models.JSONField(
+        default=list,
+        help_text="Categories with at least one wrong answer in this batch (hint counter).",
+    )
+    completed_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="When the batch reached BATCH_SIZE attempts.",
+    )
+
+    class Meta:
+        db_table = "practice_sessions"
+        indexes = [models.Index(fields=["student", "topic", "category"])]
+
+    def __str__(self):
+        return f"{self.student.email} — {self.topic.title}: {self.correct}/{self.total}"
+
+    @property
+    def is_perfect(self) -> bool:
+        return self.total == self.BATCH_SIZE and self.correct == self.BATCH_SIZE
+
+
 class TestAttempt(models.Model):
     """Records a student's test session. Used for both topic and unit tests."""
     class Status(models.TextChoices):
@@ -180,6 +278,124 @@ class TestAttempt(models.Model):
         return f"{self.student.email} — {self.test} — {result}"
 
 
+class TopicMastery(models.Model):
+    """
+    Materialized mastery tier per (student, topic), maintained by
+    apps.progress.mastery. Topics without a row are at tier "none".
+    """
+    class Tier(models.TextChoices):
+        NONE = "none", "None"
+        DESCHISA = "deschisa", "Opened"
+        PROMOVAT = "promovat", "Passed"
+        STAPANIT = "stapanit", "Mastered"
+        PERFECT = "perfect", "Perfect"
+
+    student = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="topic_mastery",
+        limit_choices_to={"user_type": "student"},
+    )
+    topic = models.ForeignKey(
+        "content.Topic",
+        on_delete=models.CASCADE,
+        related_name="mastery",
+    )
+    tier = models.CharField(max_length=10, choices=Tier.choices)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "topic_mastery"
+        unique_together = [("student", "topic")]
+
+    def __str__(self):
+        return f"{self.student.email} — {self.topic.title}: {self.tier}"
+
+
+class StudentProgressSnapshot(models.Model):
+    """
+    Per-student progress aggregates, kept up to date by the lesson, attempt
+    and test write paths (apps.progress.progress_snapshot) so dashboards
+    and overviews read one row instead of aggregating the raw tables.
+    JSON keys are ids as strings.
+    """
+    CLEARED_MEDIUM = 1
+    CLEARED_HARD = 2
+
+    student = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="progress_snapshot",
+    )
+    lessons = models.JSONField(
+        default=dict,
+        help_text='LessonProgress status per lesson: {"<lesson_id>": status}',
+    )
+    topic_attempts = models.JSONField(
+        default=dict,
+        help_text='ExerciseAttempt count per topic: {"<topic_id>": count}',
+    )
+    categories = models.JSONField(
+        default=dict,
+        help_text='Cleared tiers per category: {"<topic_id>:<category>": bits}, 1 = medium, 2 = hard',
+    )
+    tests = models.JSONField(
+        default=dict,
+        help_text='Completed attempts per test: {"<test_id>": {best_score, attempts_count, passed}}',
+    )
+    perfect_batches = models.PositiveIntegerField(default=0)
+    medium_cleared_count = models.PositiveIntegerField(
+        default=0,
+        help_text="Categories with medium cleared (badge counter)",
+    )
+    hard_cleared_count = models.PositiveIntegerField(
+        default=0,
+        help_text="Categories with hard cleared (badge counter)",
+    )
+    rebuilt_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Last full rebuild; null means the row must be rebuilt before it is read.",
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "student_progress_snapshots"
+
+    def __str__(self):
+        return f"{self.student.email} — progress snapshot"
+
+    @property
+    def lesson_status_map(self) -> dict[int, str]:
+        return {int(k): v for k, v in self.lessons.items()}
+
+    @property
+    def attempts_by_topic(self) -> dict[int, int]:
+        return {int(k): v for k, v in self.topic_attempts.items() if v}
+
+    @property
+    def exercises_attempted(self) -> int:
+        return sum(self.topic_attempts.values())
+
+    @property
+    def test_stats(self) -> dict[int, dict]:
+        return {int(k): v for k, v in self.tests.items()}
+
+    @property
+    def passed_test_ids(self) -> set[int]:
+        return {int(k) for k, v in self.tests.items() if v["passed"]}
+
+    def cleared_categories(self, bits: int) -> dict[int, set[str]]:
+        """topic_id → categories with any of `bits` cleared."""
+        result: dict[int, set[str]] = {}
+        for key, value in self.categories.items():
+            if value & bits:
+                topic_id, _, category = key.partition(":")
+                result.setdefault(int(topic_id), set()).add(category)
+        return result
+
+
 class ClassroomPace(models.Model):
     """Per-teacher, per-unit unlock dates."""
     teacher = models.ForeignKey(
@@ -227,7 +443,10 @@ class Streak(models.Model):
 
 
 class StreakActivity(models.Model):
-    """One row per student per day they were active. Drives streak calculation."""
+    """
+    One row per student per day they were active, with the first activity's
+    type. An audit log (STREAK_ACTIVITY_LOG); the heatmap reads StreakYearBitmap.
+    """
 
     class ActivityType(models.TextChoices):
         EXERCISE = "exercise", "Exercise"
@@ -254,6 +473,56 @@ class StreakActivity(models.Model):
         return f"{self.student.email} — {self.date} ({self.activity_type})"
 
 
+class StreakYearBitmap(models.Model):
+    """
+    A student's active days in one calendar year, one bit per day: bit i
+    (byte i // 8, bit i % 8 from the least significant, as PostgreSQL's
+    set_bit numbers them) is day i of the year, January 1st being 0.
+    Maintained by record_activity; serves the streak heatmap.
+    """
+    BYTES = 46  # 366 bits
+
+    student = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="streak_bitmaps",
+        limit_choices_to={"user_type": "student"},
+    )
+    year = models.PositiveSmallIntegerField()
+    days = models.BinaryField(help_text="366-bit active-day bitmap")
+
+    class Meta:
+        db_table = "streak_year_bitmaps"
+        unique_together = [("student", "year")]
+
+    def __str__(self):
+        return f"{self.student.email} — {self.year}"
+
+    @staticmethod
+    def day_index(day: date) -> int:
+        return day.timetuple().tm_yday - 1
+
+    @classmethod
+    def encode(cls, days) -> bytes:
+        """Bitmap with the bits of `days` (dates within one year) set."""
+        bits = bytearray(cls.BYTES)
+        for day in days:
+            index = cls.day_index(day)
+            bits[index // 8] |= 1 << (index % 8)
+        return bytes(bits)
+
+    def active_dates(self) -> list[date]:
+        """Active days in ascending order."""
+        first = date(self.year, 1, 1)
+        return [
+            first + timedelta(days=byte_index * 8 + bit)
+            for byte_index, byte in enumerate(bytes(self.days))
+            if byte
+            for bit in range(8)
+            if byte >> bit & 1
+        ]
+
+
 class DailyTestSession(models.Model):
     """A 5-exercise daily test for a student, scoped to a Europe/Bucharest local date."""
 
@@ -295,6 +564,10 @@ class Achievement(models.Model):
     )
     badge_key = models.CharField(max_length=64)
     earned_at = models.DateTimeField(auto_now_add=True)
+    delivered = models.BooleanField(
+        default=False,
+        help_text="Shown to the student (returned by an API response)",
+    )
 
     class Meta:
         db_table = "achievement"
@@ -302,3 +575,21 @@ class Achievement(models.Model):
 
     def __str__(self):
         return f"{self.student.email} — {self.badge_key}"
+
+
+class InstanceHandle(models.Model):
+    """
+    Server-side grading data for an exercise instance, addressed by a short
+    random handle (INSTANCE_STORE_MODE = "handle"). Redis is the primary
+    store; rows here are only written when Redis is unavailable.
+    """
+
+    handle = models.CharField(max_length=32, primary_key=True)
+    payload = models.JSONField(help_text="exercise_id, exercise_type and grading_data")
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        db_table = "instance_handles"
+
+    def __str__(self):
+        return self.handle
@@ -0,0 +1,214 @@
+"""
+PracticeSession maintenance for MathEd Romania.
+
+Every practice attempt is folded into its batch's PracticeSession row with
+a single upsert, so "is this batch complete / perfect?" and "how many
+perfect batches?" are row reads instead of GROUP BY session_id scans over
+ExerciseAttempt.
+
+Public API:
+    record_session_attempt(...) -> SessionState | None
+    merge_session_rows(rows) -> dict[int, int]
+    perfect_delta(total, correct, added_total, added_correct) -> int
+    backfill_sessions(student_ids=None) -> int
+"""
+import json
+from dataclasses import dataclass
+
+from django.db import connection
+from django.db.models import Count, Max, Min, Q
+
+from apps.progress.models import ExerciseAttempt, PracticeSession
+
+
+@dataclass
+class SessionState:
+    """A batch right after an attempt was merged into it."""
+    total: int
+    correct: int
+    # Whether the attempt's category already had a wrong answer in this batch.
+    category_failed_before: bool
+
+    @property
+    def is_perfect(self) -> bool:
+        return self.total == PracticeSession.BATCH_SIZE and self.correct == self.total
+
+
+def perfect_delta(total: int, correct: int, added_total: int, added_correct: int) -> int:
+    """
+    +1 if merging (added_total, added_correct) made a batch perfect, -1 if
+    it stopped being perfect (an attempt past BATCH_SIZE), else 0.
+    """
+    def _perfect(t: int, c: int) -> bool:
+        return t == PracticeSession.BATCH_SIZE and c == t
+
+    return int(_perfect(total, correct)) - int(_perfect(total - added_total, correct - added_correct))
+
+
+# Merges a partial aggregate (one attempt, or one drained chunk) into a
+# batch. category/difficulty collapse to NULL once the batch mixes values.
+# `prev` reads the statement snapshot, i.e. the row before the merge.
+_MERGE_SQL = f"""
+WITH prev AS (
+    SELECT failed_categories
+    FROM {PracticeSession._meta.db_table}
+    WHERE session_id = %(session_id)s
+), up AS (
+    INSERT INTO {PracticeSession._meta.db_table} AS ps (
+        session_id, student_id, topic_id, category, difficulty,
+        total, correct, failed_categories, completed_at
+    )
+    VALUES (
+        %(session_id)s, %(student_id)s, %(topic_id)s, %(category)s, %(difficulty)s,
+        %(total)s, %(correct)s, %(failed_categories)s::jsonb,
+        CASE WHEN %(total)s >= {PracticeSession.BATCH_SIZE} THEN %(at)s::timestamptz END
+    )
+    ON CONFLICT (session_id) DO UPDATE SET
+        category = CASE WHEN ps.category IS NOT DISTINCT FROM EXCLUDED.category
+                        THEN ps.category END,
+        difficulty = CASE WHEN ps.difficulty IS NOT DISTINCT FROM EXCLUDED.difficulty
+                          THEN ps.difficulty END,
+        total = ps.total + EXCLUDED.total,
+        correct = ps.correct + EXCLUDED.correct,
+        failed_categories = (
+            SELECT COALESCE(jsonb_agg(DISTINCT c), '[]'::jsonb)
+            FROM jsonb_array_elements(ps.failed_categories || EXCLUDED.failed_categories) AS c
+        ),
+        completed_at = COALESCE(
+            ps.completed_at,
+            CASE WHEN ps.total + EXCLUDED.total >= {PracticeSession.BATCH_SIZE}
+                 THEN %(at)s::timestamptz END
+        )
+    -- session ids come from the client: never merge into another student's batch
+    WHERE ps.student_id = EXCLUDED.student_id
+    RETURNING ps.total, ps.correct
+)
+SELECT up.total, up.correct,
+       COALESCE(prev.failed_categories @> jsonb_build_array(%(category)s::text), FALSE)
+FROM up LEFT JOIN prev ON TRUE
+"""
+
+
+def _params(session_id, student_id, topic_id, category, difficulty,
+            total, correct, failed_categories, at) -> dict:
+    return {
+        "session_id": session_id,
+        "student_id": student_id,
+        "topic_id": topic_id,
+        "category": category,
+        "difficulty": difficulty,
+        "total": total,
+        "correct": correct,
+        "failed_categories": json.dumps(sorted(failed_categories)),
+        "at": at,
+    }
+
+
+def record_session_attempt(user, exercise, is_correct: bool, session_id, at) -> SessionState | None:
+    """
+    Fold one attempt into its batch and return the batch state, or None if
+    the session id belongs to another student.
+    """
+    category = exercise.category or ""
+    params = _params(
+        session_id, user.pk, exercise.topic_id, category, exercise.difficulty,
+        1, 1 if is_correct else 0, [] if is_correct else [category], at,
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(_MERGE_SQL, params)
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    return SessionState(total=row[0], correct=row[1], category_failed_before=row[2])
+
+
+def merge_session_rows(rows) -> dict[int, int]:
+    """
+    Merge pre-aggregated batch chunks. Each row is a dict with session_id,
+    student_id, topic_id, category, difficulty, total, correct,
+    failed_categories (iterable) and at (latest attempt time).
+
+    Returns the change in perfect batches per student (see perfect_delta).
+    """
+    deltas: dict[int, int] = {}
+    with connection.cursor() as cursor:
+        for row in sorted(rows, key=lambda r: str(r["session_id"])):
+            cursor.execute(_MERGE_SQL, _params(**row))
+            merged = cursor.fetchone()
+            if merged is None:
+                continue
+            delta = perfect_delta(merged[0], merged[1], row["total"], row["correct"])
+            if delta:
+                deltas[row["student_id"]] = deltas.get(row["student_id"], 0) + delta
+    return deltas
+
+
+def backfill_sessions(student_ids=None, chunk_size: int = 2000) -> int:
+    """
+    Rebuild PracticeSession rows from ExerciseAttempt. Rows for the covered
+    sessions are replaced, not merged. Returns the number of sessions written.
+    """
+    attempts = ExerciseAttempt.objects.filter(session_id__isnull=False)
+    if student_ids:
+        attempts = attempts.filter(student_id__in=student_ids)
+
+    grouped = (
+        attempts.values("session_id")
+        .annotate(
+            student_id=Min("student_id"),
+            topic_id=Min("topic_id"),
+            category=Min("category"),
+            categories=Count("category", distinct=True),
+            difficulty=Min("exercise__difficulty"),
+            difficulties=Count("exercise__difficulty", distinct=True),
+            total=Count("id"),
+            correct=Count("id", filter=Q(is_correct=True)),
+            last_at=Max("attempted_at"),
+        )
+        .order_by("session_id")
+    )
+    failed: dict = {}
+    for session_id, category in (
+        attempts.filter(is_correct=False)
+        .order_by()  # Meta.ordering would leak into DISTINCT
+        .values_list("session_id", "category")
+        .distinct()
+        .iterator()
+    ):
+        failed.setdefault(session_id, []).append(category)
+
+    written = 0
+    chunk: list[PracticeSession] = []
+
+    def _flush():
+        PracticeSession.objects.bulk_create(
+            chunk,
+            update_conflicts=True,
+            unique_fields=["session_id"],
+            update_fields=[
+                "student", "topic", "category", "difficulty",
+                "total", "correct", "failed_categories", "completed_at",
+            ],
+        )
+
+    for g in grouped.iterator():
+        chunk.append(PracticeSession(
+            session_id=g["session_id"],
+            student_id=g["student_id"],
+            topic_id=g["topic_id"],
+            category=g["category"] if g["categories"] == 1 else None,
+            difficulty=g["difficulty"] if g["difficulties"] == 1 else None,
+            total=g["total"],
+            correct=g["correct"],
+            failed_categories=sorted(failed.get(g["session_id"], [])),
+            # Time of the last attempt; exact for batches of BATCH_SIZE.
+            completed_at=g["last_at"] if g["total"] >= PracticeSession.BATCH_SIZE else None,
+        ))
+        if len(chunk) >= chunk_size:
+            _flush()
+            written += len(chunk)
+            chunk = []
+    if chunk:
+        _flush()
+        written += len(chunk)
+    return written
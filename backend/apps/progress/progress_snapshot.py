@@ -0,0 +1,238 @@
+"""
+StudentProgressSnapshot maintenance for MathEd Romania.
+
+Each write path folds its change into the student's snapshot row with one
+upsert, in the same transaction as the write itself:
+
+  LessonOpenView / LessonCompleteView  → note_lesson_status
+  record_attempt                       → note_attempt
+  attempt queue drain                  → note_attempts
+  TestFinishView                       → note_test_completed
+
+A full rebuild locks the row before reading the raw tables, so a
+concurrent write either commits before the rebuild reads (and is
+included) or waits for the rebuild and is applied on top of it.
+
+An incremental write for a student without a row creates an empty row
+with rebuilt_at = NULL; get_snapshot() rebuilds such rows on first read.
+Changes made outside these paths (admin edits, backfill_practice_sessions)
+are picked up with `manage.py rebuild_progress_snapshots`.
+
+Public API:
+    get_snapshot(user) -> StudentProgressSnapshot
+    rebuild_snapshot(student_id) -> StudentProgressSnapshot
+    note_lesson_status(student_id, lesson_id, status)
+    note_attempts(rows)
+    note_attempt(**row) -> dict | None
+    note_test_completed(attempt)
+"""
+
+from django.db import connection, transaction
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+
+from apps.progress.models import (
+    CategoryProgress,
+    ExerciseAttempt,
+    LessonProgress,
+    PracticeSession,
+    StudentProgressSnapshot,
+    TestAttempt,
+)
+
+_TABLE = StudentProgressSnapshot._meta.db_table
+
+
+def _upsert_sql(assignments: str) -> str:
+    return f"""
+INSERT INTO {_TABLE} AS s (
+    student_id, lessons, topic_attempts, categories, tests, perfect_batches,
+    medium_cleared_count, hard_cleared_count, updated_at
+)
+VALUES (%(student_id)s, '{{}}', '{{}}', '{{}}', '{{}}', 0, 0, 0, %(now)s)
+ON CONFLICT (student_id) DO UPDATE SET
+{assignments},
+    updated_at = EXCLUDED.updated_at
+"""
+
+
+_LESSON_SQL = _upsert_sql(
+    "    lessons = s.lessons || jsonb_build_object(%(lesson_id)s::text, %(status)s::text)"
+)
+
+# The badge counters count bits that this statement turns on; the right-hand
+# sides all see the row as it was before the update.
+_ATTEMPTS_SQL = _upsert_sql(f"""
+    topic_attempts = CASE WHEN %(attempts)s = 0 THEN s.topic_attempts ELSE jsonb_set(
+        s.topic_attempts, ARRAY[%(topic_id)s::text],
+        to_jsonb(COALESCE((s.topic_attempts ->> %(topic_id)s::text)::int, 0) + %(attempts)s)
+    ) END,
+    categories = CASE WHEN %(cleared)s = 0 THEN s.categories ELSE jsonb_set(
+        s.categories, ARRAY[%(category_key)s::text],
+        to_jsonb(COALESCE((s.categories ->> %(category_key)s::text)::int, 0) | %(cleared)s)
+    ) END,
+    medium_cleared_count = s.medium_cleared_count + CASE
+        WHEN %(cleared)s & {StudentProgressSnapshot.CLEARED_MEDIUM} <> 0
+         AND COALESCE((s.categories ->> %(category_key)s::text)::int, 0)
+             & {StudentProgressSnapshot.CLEARED_MEDIUM} = 0
+        THEN 1 ELSE 0 END,
+    hard_cleared_count = s.hard_cleared_count + CASE
+        WHEN %(cleared)s & {StudentProgressSnapshot.CLEARED_HARD} <> 0
+         AND COALESCE((s.categories ->> %(category_key)s::text)::int, 0)
+             & {StudentProgressSnapshot.CLEARED_HARD} = 0
+        THEN 1 ELSE 0 END,
+    -- a rebuild between a batch turning perfect and un-perfect could go below zero
+    perfect_batches = GREATEST(s.perfect_batches + %(perfect_batches)s, 0)""")
+
+_ATTEMPT_RETURNING_SQL = _ATTEMPTS_SQL + """RETURNING s.medium_cleared_count, s.hard_cleared_count,
+          s.rebuilt_at IS NOT NULL
+"""
+
+# The score is read back from the saved row so it carries the column's rounding.
+_TEST_SQL = _upsert_sql(f"""
+    tests = s.tests || jsonb_build_object(%(test_id)s::text, jsonb_build_object(
+        'best_score', (
+            SELECT to_jsonb(GREATEST((s.tests -> %(test_id)s::text ->> 'best_score')::numeric, ta.score))
+            FROM {TestAttempt._meta.db_table} ta
+            WHERE ta.id = %(attempt_id)s
+        ),
+        'attempts_count', COALESCE((s.tests -> %(test_id)s::text ->> 'attempts_count')::int, 0) + 1,
+        'passed', COALESCE((s.tests -> %(test_id)s::text ->> 'passed')::boolean, FALSE) OR %(passed)s
+    ))""")
+
+
+# ─── Incremental updates ─────────────────────────────────────────────────────
+
+def note_lesson_status(student_id: int, lesson_id: int, status: str) -> None:
+    with connection.cursor() as cursor:
+        cursor.execute(_LESSON_SQL, {
+            "student_id": student_id,
+            "lesson_id": lesson_id,
+            "status": status,
+            "now": timezone.now(),
+        })
+
+
+def note_attempts(rows) -> None:
+    """
+    Fold attempt counts and tier clears into snapshots. Each row is a dict
+    with student_id and topic_id plus any of: attempts, perfect_batches
+    (+1 / -1 as a batch turns perfect or stops being perfect), category
+    and cleared (CLEARED_* bits).
+    """
+    now = timezone.now()
+    # Sorted so concurrent writers lock snapshot rows in the same order.
+    params = [_attempt_params(row, now) for row in sorted(rows, key=lambda r: r["student_id"])]
+    if not params:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(_ATTEMPTS_SQL, params)
+
+
+def note_attempt(**row) -> dict | None:
+    """
+    note_attempts() for a single row. Returns the student's badge counters
+    after the update, or None while the snapshot awaits its first rebuild
+    (its counters would be incomplete).
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(_ATTEMPT_RETURNING_SQL, _attempt_params(row, timezone.now()))
+        medium, hard, complete = cursor.fetchone()
+    if not complete:
+        return None
+    return {"medium_cleared_count": medium, "hard_cleared_count": hard}
+
+
+def _attempt_params(row: dict, now) -> dict:
+    return {
+        "student_id": row["student_id"],
+        "topic_id": row["topic_id"],
+        "attempts": row.get("attempts", 0),
+        "perfect_batches": row.get("perfect_batches", 0),
+        "category_key": f"{row['topic_id']}:{row.get('category') or ''}",
+        "cleared": row.get("cleared", 0),
+        "now": now,
+    }
+
+
+def note_test_completed(attempt: TestAttempt) -> None:
+    """Fold a saved, completed TestAttempt into its student's snapshot."""
+    with connection.cursor() as cursor:
+        cursor.execute(_TEST_SQL, {
+            "student_id": attempt.student_id,
+            "test_id": attempt.test_id,
+            "attempt_id": attempt.pk,
+            "passed": bool(attempt.passed),
+            "now": timezone.now(),
+        })
+
+
+# ─── Rebuild / read ──────────────────────────────────────────────────────────
+
+def rebuild_snapshot(student_id: int) -> StudentProgressSnapshot:
+    """Recompute a student's snapshot from the raw tables."""
+    with transaction.atomic():
+        StudentProgressSnapshot.objects.bulk_create(
+            [StudentProgressSnapshot(student_id=student_id)], ignore_conflicts=True,
+        )
+        snapshot = StudentProgressSnapshot.objects.select_for_update().get(student_id=student_id)
+
+        snapshot.lessons = {
+            str(lesson_id): status
+            for lesson_id, status in LessonProgress.objects
+            .filter(student_id=student_id)
+            .values_list("lesson_id", "status")
+        }
+        snapshot.topic_attempts = {
+            str(row["topic_id"]): row["count"]
+            for row in ExerciseAttempt.objects
+            .filter(student_id=student_id)
+            .order_by()
+            .values("topic_id")
+            .annotate(count=Count("id"))
+        }
+        snapshot.categories = {}
+        snapshot.medium_cleared_count = snapshot.hard_cleared_count = 0
+        for topic_id, category, medium, hard in (
+            CategoryProgress.objects
+            .filter(Q(medium_cleared=True) | Q(hard_cleared=True), student_id=student_id)
+            .values_list("topic_id", "category", "medium_cleared", "hard_cleared")
+        ):
+            snapshot.categories[f"{topic_id}:{category}"] = (
+                (StudentProgressSnapshot.CLEARED_MEDIUM if medium else 0)
+                | (StudentProgressSnapshot.CLEARED_HARD if hard else 0)
+            )
+            snapshot.medium_cleared_count += medium
+            snapshot.hard_cleared_count += hard
+        snapshot.tests = {
+            str(row["test_id"]): {
+                "best_score": float(row["best_score"]) if row["best_score"] is not None else None,
+                "attempts_count": row["attempts_count"],
+                "passed": row["passed_count"] > 0,
+            }
+            for row in TestAttempt.objects
+            .filter(student_id=student_id, status=TestAttempt.Status.COMPLETED)
+            .order_by()
+            .values("test_id")
+            .annotate(
+                best_score=Max("score"),
+                attempts_count=Count("id"),
+                passed_count=Count("id", filter=Q(passed=True)),
+            )
+        }
+        snapshot.perfect_batches = PracticeSession.objects.filter(
+            student_id=student_id,
+            total=PracticeSession.BATCH_SIZE,
+            correct=PracticeSession.BATCH_SIZE,
+        ).count()
+        snapshot.rebuilt_at = timezone.now()
+        snapshot.save()
+    return snapshot
+
+
+def get_snapshot(user) -> StudentProgressSnapshot:
+    """The student's snapshot; built from the raw tables if it doesn't exist yet."""
+    snapshot = StudentProgressSnapshot.objects.filter(student_id=user.pk).first()
+    if snapshot is None or snapshot.rebuilt_at is None:
+        snapshot = rebuild_snapshot(user.pk)
+    return snapshot
@@ -0,0 +1,24 @@
+"""
+Raw Redis access for the progress app.
+
+Reuses the connection pool behind the django-redis "default" cache so no
+extra Redis configuration is needed. Returns None when the cache isn't
+Redis-backed (e.g. LocMemCache in local settings); callers then fall back
+to their non-Redis path.
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def get_redis():
+    """Return a redis.Redis client for the default cache, or None."""
+    try:
+        from django_redis import get_redis_connection
+    except ImportError:
+        return None
+    try:
+        return get_redis_connection("default")
+    except NotImplementedError:
+        # Default cache is not a django-redis backend
+        return None
@@ -0,0 +1,140 @@
+"""
+Signal receivers for the progress app.
+
+Keeps per-process caches derived from content models in step with edits
+made through the admin or management commands, recomputes topic mastery
+tiers when a field they depend on changes on one of a topic's exercises,
+tests or lessons, moves an exercise's attempts (ExerciseAttempt.topic /
+category) along with it, and keeps the earned-badge cache (badges.earned)
+in step with Achievement rows.
+
+Mastery recomputes are collected per thread and run once per topic when
+the transaction commits, so a loader saving a topic's exercises inside one
+atomic block recomputes the topic once. Edits to other fields (titles,
+templates, content) recompute nothing. Fixture loads (raw saves) are
+skipped; run `manage.py rebuild_topic_mastery` after them.
+"""
+import threading
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from apps.content.models import Exercise, Lesson, Test
+from apps.progress.badges.earned import forget_earned, note_earned
+from apps.progress.exercise_engine import invalidate_template_plan
+from apps.progress.mastery import recompute_topic_mastery
+from apps.progress.models import Achievement, ExerciseAttempt
+
+
+@receiver(post_save, sender=Exercise)
+@receiver(post_delete, sender=Exercise)
+def drop_template_plan(sender, instance, **kwargs):
+    invalidate_template_plan(instance.pk)
+
+
+# Stored values the post_save receivers compare against: the inputs of
+# mastery.compute_topic_tiers, plus the exercise's category for its attempts.
+_TRACKED_FIELDS = {
+    Exercise: ("topic_id", "category", "is_active"),
+    Lesson: ("topic_id", "is_published"),
+    Test: ("topic_id", "is_published", "scope", "pass_threshold"),
+}
+
+
+@receiver(pre_save, sender=Exercise)
+@receiver(pre_save, sender=Lesson)
+@receiver(pre_save, sender=Test)
+def remember_saved_fields(sender, instance, raw=False, **kwargs):
+    instance._saved_fields = None
+    if not raw and instance.pk is not None:
+        instance._saved_fields = (
+            sender.objects.filter(pk=instance.pk).values(*_TRACKED_FIELDS[sender]).first()
+        )
+
+
+def _changed_fields(sender, instance) -> set[str] | None:
+    """Tracked fields this save changed; None for a new row."""
+    saved = getattr(instance, "_saved_fields", None)
+    if saved is None:
+        return None
+    return {field for field, value in saved.items() if getattr(instance, field) != value}
+
+
+@receiver(post_save, sender=Exercise)
+@receiver(post_save, sender=Test)
+@receiver(post_save, sender=Lesson)
+def recompute_mastery_on_save(sender, instance, raw=False, **kwargs):
+    """Recompute on create, or when a field that feeds the tiers changed."""
+    if raw:
+        return
+    changed = _changed_fields(sender, instance)
+    if changed is not None and not changed:
+        return
+    if changed and "topic_id" in changed:
+        _queue_mastery_recompute(instance._saved_fields["topic_id"])
+    _queue_mastery_recompute(instance.topic_id)
+
+
+@receiver(post_delete, sender=Exercise)
+@receiver(post_delete, sender=Test)
+@receiver(post_delete, sender=Lesson)
+def recompute_mastery_on_delete(sender, instance, **kwargs):
+    _queue_mastery_recompute(instance.topic_id)
+
+
+_local = threading.local()
+
+
+def _queue_mastery_recompute(topic_id: int | None) -> None:
+    if topic_id is None:
+        return
+    _pending_topics().add(topic_id)
+    # One callback per save is cheap; the first to run takes the whole set
+    # and the rest find it empty. Topics left over from a rolled-back
+    # transaction are recomputed with the next commit, which is harmless.
+    transaction.on_commit(_flush_mastery_recomputes)
+
+
+def _pending_topics() -> set:
+    if not hasattr(_local, "topic_ids"):
+        _local.topic_ids = set()
+    return _local.topic_ids
+
+
+def _flush_mastery_recomputes() -> None:
+    pending = _pending_topics()
+    topic_ids = sorted(pending)
+    pending.clear()
+    for topic_id in topic_ids:
+        recompute_topic_mastery(topic_id)
+
+
+@receiver(post_save, sender=Exercise)
+def move_exercise_attempts(sender, instance, raw=False, **kwargs):
+    """
+    Attempts copy the exercise's topic and category (ExerciseAttempt.topic);
+    rewrite them when the exercise moves. Both topics' mastery is queued by
+    recompute_mastery_on_save.
+    """
+    changed = _changed_fields(sender, instance)
+    if raw or not changed or not changed & {"topic_id", "category"}:
+        return
+    ExerciseAttempt.objects.filter(exercise_id=instance.pk).update(
+        topic_id=instance.topic_id, category=instance.category or "",
+    )
+
+
+@receiver(post_save, sender=Achievement)
+def cache_earned_badge(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: note_earned(instance))
+    else:
+        student_id = instance.student_id
+        transaction.on_commit(lambda: forget_earned(student_id))
+
+
+@receiver(post_delete, sender=Achievement)
+def forget_earned_badges(sender, instance, **kwargs):
+    student_id = instance.student_id
+    transaction.on_commit(lambda: forget_earned(student_id))
@@ -4,22 +4,81 @@ Streak service for MathEd Romania.
 Public API:
     record_activity(user, activity_type) -> list[str]
 
-All dates are computed in Europe/Bucharest local time.
+All dates are computed in Europe/Bucharest local time. Streak badges are
+only evaluated when the activity moved the streak; repeat activity on the
+same day returns without touching Streak or the badges.
+
+Only a student's first activity of the day changes anything, so the day
+of the last recorded activity is cached per student and a repeat returns
+after one cache read. The day transition itself is a single statement: a
+Streak upsert that computes gap, freeze use, longest streak and freeze
+award from the row it updates, and only applies when last_active_date is
+before today. When it applies, the same statement sets the day's bit in
+the student's StreakYearBitmap and, with STREAK_ACTIVITY_LOG on (default),
+inserts the StreakActivity audit row. Parallel requests of one student
+serialise on the upsert's row lock; the later ones find today already
+recorded and change nothing.
 """
 import logging
 from zoneinfo import ZoneInfo
 
-from django.db import IntegrityError, transaction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
 from django.utils import timezone
 
 from .badges.service import evaluate_badges_for_event
-from .models import Streak, StreakActivity
+from .models import Streak, StreakActivity, StreakYearBitmap
 
 logger = logging.getLogger(__name__)
 
 BUCHAREST_TZ = ZoneInfo("Europe/Bucharest")
 MAX_FREEZES = 2
 
+_ACTIVE_KEY = "mathed:streak:active:{student_id}"
+# The cached value is compared with today's date, so it only has to outlive one day.
+ACTIVE_KEY_TIMEOUT = 2 * 24 * 3600
+
+# Expressions over the row being updated (s) and today's date.
+_GAP = "(%(today)s - s.last_active_date)"
+_FREEZE_USED = f"({_GAP} = 2 AND s.freeze_count > 0)"
+_CURRENT = f"""(CASE
+        WHEN s.last_active_date IS NOT NULL AND ({_GAP} = 1 OR {_FREEZE_USED})
+        THEN s.current_streak + 1 ELSE 1 END)"""
+_FREEZES_LEFT = f"(s.freeze_count - CASE WHEN {_FREEZE_USED} THEN 1 ELSE 0 END)"
+
+# Returns the updated streak, or no row when today was already recorded.
+_RECORD_SQL = f"""
+WITH streak AS (
+    INSERT INTO {Streak._meta.db_table} AS s (
+        student_id, current_streak, longest_streak, freeze_count, last_active_date
+    )
+    VALUES (%(student_id)s, 1, 1, 0, %(today)s)
+    ON CONFLICT (student_id) DO UPDATE SET
+        current_streak = {_CURRENT},
+        longest_streak = GREATEST(s.longest_streak, {_CURRENT}),
+        freeze_count = {_FREEZES_LEFT} + CASE
+            WHEN {_CURRENT} %% 7 = 0 AND {_FREEZES_LEFT} < {MAX_FREEZES} THEN 1 ELSE 0 END,
+        last_active_date = EXCLUDED.last_active_date
+    WHERE s.last_active_date IS NULL OR s.last_active_date < EXCLUDED.last_active_date
+    RETURNING s.current_streak, s.longest_streak, s.freeze_count, s.last_active_date
+),
+bitmap AS (
+    INSERT INTO {StreakYearBitmap._meta.db_table} AS b (student_id, year, days)
+    SELECT %(student_id)s, %(year)s,
+           set_bit(decode(repeat('00', {StreakYearBitmap.BYTES}), 'hex'), %(day_index)s, 1)
+    WHERE EXISTS (SELECT 1 FROM streak)
+    ON CONFLICT (student_id, year) DO UPDATE SET days = set_bit(b.days, %(day_index)s, 1)
+),
+activity AS (
+    INSERT INTO {StreakActivity._meta.db_table} (student_id, date, activity_type)
+    SELECT %(student_id)s, %(today)s, %(activity_type)s
+    WHERE %(log_activity)s AND EXISTS (SELECT 1 FROM streak)
+    ON CONFLICT (student_id, date) DO NOTHING
+)
+SELECT current_streak, longest_streak, freeze_count, last_active_date FROM streak
+"""
+
 
 def _today_local():
     return timezone.now().astimezone(BUCHAREST_TZ).date()
@@ -27,52 +86,40 @@ def _today_local():
 
 def record_activity(user, activity_type: str) -> list[str]:
     today = _today_local()
+    key = _ACTIVE_KEY.format(student_id=user.pk)
+    if cache.get(key) == today.isoformat():
+        return []
 
-    try:
-        with transaction.atomic():
-            StreakActivity.objects.create(
-                student=user, date=today, activity_type=activity_type,
-            )
-            Streak.objects.get_or_create(student=user)
-            streak = Streak.objects.select_for_update().get(student=user)
-
-            last = streak.last_active_date
-            if last is None:
-                streak.current_streak = 1
-            else:
-                gap = (today - last).days
-                if gap <= 0:
-                    return _evaluate_streak_badges(user, streak)
-                if gap == 1:
-                    streak.current_streak += 1
-                elif gap == 2 and streak.freeze_count > 0:
-                    streak.freeze_count -= 1
-                    streak.current_streak += 1
-                else:
-                    streak.current_streak = 1
-
-            if streak.current_streak > streak.longest_streak:
-                streak.longest_streak = streak.current_streak
-
-            if (
-                streak.current_streak > 0
-                and streak.current_streak % 7 == 0
-                and streak.freeze_count < MAX_FREEZES
-            ):
-                streak.freeze_count += 1
-
-            streak.last_active_date = today
-            streak.save()
-    except IntegrityError:
-        streak, _ = Streak.objects.get_or_create(student=user)
-        return _evaluate_streak_badges(user, streak)
-
+    with connection.cursor() as cursor:
+        cursor.execute(_RECORD_SQL, {
+            "student_id": user.pk,
+            "today": today,
+            "year": today.year,
+            "day_index": StreakYearBitmap.day_index(today),
+            "activity_type": activity_type,
+            "log_activity": getattr(settings, "STREAK_ACTIVITY_LOG", True),
+        })
+        row = cursor.fetchone()
+    transaction.on_commit(lambda: cache.set(key, today.isoformat(), timeout=ACTIVE_KEY_TIMEOUT))
+
+    if row is None:
+        return []
+    current, longest, freezes, last_active = row
+    streak = Streak(
+        student=user,
+        current_streak=current,
+        longest_streak=longest,
+        freeze_count=freezes,
+        last_active_date=last_active,
+    )
     return _evaluate_streak_badges(user, streak)
 
 
 def _evaluate_streak_badges(user, streak) -> list[str]:
     try:
-        return evaluate_badges_for_event(user, "streak_updated", {"streak": streak})
+        return evaluate_badges_for_event(
+            user, "streak_updated", {"streak": streak}, changed={"current_streak"},
+        )
     except Exception:
         logger.warning("Badge evaluation failed", exc_info=True)
         return []
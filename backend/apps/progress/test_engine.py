@@ -72,7 +72,7 @@ def build_test_session(test) -> list[dict]:
 
         for exercise in selected:
             try:
-                instance = generate_instance(exercise)
+                instance = generate_instance(exercise, durable=True)
                 instance["weight"] = weight
                 instances.append(instance)
             except Exception:
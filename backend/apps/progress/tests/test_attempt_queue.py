@@ -0,0 +1,146 @@
+"""
+Delivery guarantees of the attempt queue drain (apps.progress.attempt_queue).
+
+Redelivered entries must not be inserted or counted twice, and an entry
+that keeps failing must be dead-lettered without holding up the rest.
+"""
+import json
+import uuid
+from unittest import mock, skipUnless
+
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.content.models import Exercise, Grade, Topic, Unit
+from apps.progress import attempt_queue
+from apps.progress.models import CategoryProgress, ExerciseAttempt
+from apps.progress.redis_conn import get_redis
+from apps.users.models import User
+
+
+def _redis_available() -> bool:
+    r = get_redis()
+    if r is None:
+        return False
+    try:
+        return r.ping()
+    except Exception:
+        return False
+
+
+class QueueTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        grade = Grade.objects.create(number=5, name="Clasa a V-a")
+        unit = Unit.objects.create(grade=grade, order=1, title="Numere naturale")
+        topic = Topic.objects.create(unit=unit, order=1, title="Adunarea")
+        cls.exercise = Exercise.objects.create(
+            topic=topic,
+            exercise_type="numeric",
+            difficulty="medium",
+            category="adunare",
+            template={"question": "{a} + {b} = ?", "answer": "a + b", "params": {}},
+        )
+        cls.student = User.objects.create_user(
+            email="elev@example.ro", password="parola123", first_name="Ana", last_name="Pop",
+        )
+
+    def _event(self, **overrides) -> dict:
+        return {
+            "student_id": self.student.pk,
+            "exercise_id": self.exercise.pk,
+            "topic_id": self.exercise.topic_id,
+            "category": self.exercise.category,
+            "difficulty": self.exercise.difficulty,
+            "answer": "5",
+            "is_correct": True,
+            "session_id": None,
+            "attempted_at": timezone.now().isoformat(),
+            **overrides,
+        }
+
+    def _totals(self) -> tuple[int, int]:
+        return CategoryProgress.objects.values_list("total_attempts", "correct_attempts").get(
+            student=self.student, category=self.exercise.category,
+        )
+
+
+class ApplyDedupeTests(QueueTestCase):
+
+    def test_redelivered_batch_is_skipped(self):
+        # A drain that committed but died before acknowledging: the same
+        # entries come back on the next pass.
+        events = [("1-0", self._event()), ("1-1", self._event(is_correct=False))]
+        attempt_queue._apply(events)
+        attempt_queue._apply(events)
+        self.assertEqual(ExerciseAttempt.objects.filter(student=self.student).count(), 2)
+        self.assertEqual(self._totals(), (2, 1))
+
+    def test_partly_applied_batch_only_adds_new_entries(self):
+        attempt_queue._apply([("1-0", self._event())])
+        attempt_queue._apply([("1-0", self._event()), ("1-1", self._event())])
+        self.assertEqual(
+            set(ExerciseAttempt.objects.values_list("stream_id", flat=True)), {"1-0", "1-1"},
+        )
+        self.assertEqual(self._totals(), (2, 2))
+
+
+@skipUnless(_redis_available(), "needs a Redis-backed default cache")
+class DrainDeadLetterTests(QueueTestCase):
+
+    def setUp(self):
+        prefix = f"test:{uuid.uuid4().hex}"
+        keys = {
+            "STREAM_KEY": f"{prefix}:attempts",
+            "DEAD_KEY": f"{prefix}:dead",
+            "_FAILURES_KEY": f"{prefix}:failures",
+            "_STATS_KEY": f"{prefix}:stats",
+        }
+        for name, key in keys.items():
+            patcher = mock.patch.object(attempt_queue, name, key)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.r = get_redis()
+        self.addCleanup(self.r.delete, *keys.values())
+        # The all-failed back-off would sleep between passes.
+        patcher = mock.patch.object(attempt_queue.time, "sleep")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _drain(self) -> int:
+        # Every pass in these tests logs the failing entry; keep it off the console.
+        with self.assertLogs(attempt_queue.logger, level="WARNING"):
+            return attempt_queue.drain("test")
+
+    def _push(self, fields: dict) -> str:
+        return self.r.xadd(attempt_queue.STREAM_KEY, fields).decode()
+
+    def _dead_ids(self) -> list[str]:
+        return [f[b"id"].decode() for _, f in self.r.xrange(attempt_queue.DEAD_KEY)]
+
+    def test_malformed_event_is_dead_lettered_at_once(self):
+        junk = self._push({"x": "junk"})
+        good = self._push({"e": json.dumps(self._event())})
+        self.assertEqual(self._drain(), 2)
+        self.assertEqual(self._dead_ids(), [junk])
+        self.assertTrue(ExerciseAttempt.objects.filter(stream_id=good).exists())
+        self.assertEqual(self.r.xlen(attempt_queue.STREAM_KEY), 0)
+
+    def test_failing_event_is_dead_lettered_after_max_failures(self):
+        poison = self._push({"e": json.dumps(self._event(topic_id="nope"))})
+        good = self._push({"e": json.dumps(self._event())})
+
+        # First pass: the batch fails, the good entry goes through on its own.
+        self.assertEqual(self._drain(), 1)
+        self.assertTrue(ExerciseAttempt.objects.filter(stream_id=good).exists())
+
+        for _ in range(attempt_queue.MAX_DELIVERY_FAILURES - 2):
+            self.assertEqual(self._drain(), 0)
+            self.assertEqual(self._dead_ids(), [])
+        self.assertEqual(self._drain(), 1)
+        self.assertEqual(self._dead_ids(), [poison])
+
+        self.assertEqual(self.r.xlen(attempt_queue.STREAM_KEY), 0)
+        self.assertEqual(self.r.hlen(attempt_queue._FAILURES_KEY), 0)
+        self.assertEqual(self._totals(), (1, 1))
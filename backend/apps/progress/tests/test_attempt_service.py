@@ -0,0 +1,103 @@
+"""
+Query budget of record_attempt.
+
+The attempt path is meant to cost a fixed number of statements however many
+attempts the student has logged (see attempt_service). The tests count
+statements per table, so a change that adds a query per attempt shows up
+against the table it touches.
+"""
+import re
+import uuid
+from collections import Counter
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from apps.content.models import Exercise, Grade, Topic, Unit
+from apps.progress.attempt_service import record_attempt
+from apps.progress.models import CategoryProgress, PracticeSession
+from apps.users.models import User
+
+# First table a statement reads or writes; SAVEPOINT statements have none.
+_TABLE_RE = re.compile(r'\b(?:INTO|UPDATE|FROM)\s+"?(\w+)')
+
+
+def _statements_per_table(queries) -> Counter:
+    counts: Counter = Counter()
+    for query in queries:
+        match = _TABLE_RE.search(query["sql"])
+        counts[match.group(1) if match else None] += 1
+    return counts
+
+
+@override_settings(ATTEMPT_INGEST_MODE="sync", EVENT_BUS_MODE="sync")
+class RecordAttemptQueryCountTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        grade = Grade.objects.create(number=5, name="Clasa a V-a")
+        unit = Unit.objects.create(grade=grade, order=1, title="Numere naturale")
+        cls.topic = Topic.objects.create(unit=unit, order=1, title="Adunarea")
+        cls.exercise = Exercise.objects.create(
+            topic=cls.topic,
+            exercise_type="numeric",
+            difficulty="medium",
+            category="adunare",
+            template={"question": "{a} + {b} = ?", "answer": "a + b", "params": {}},
+        )
+        cls.student = User.objects.create_user(
+            email="elev@example.ro", password="parola123", first_name="Ana", last_name="Pop",
+        )
+
+    def _record(self, is_correct=True, session_id=None):
+        return record_attempt(self.student, self.exercise, "5", is_correct, session_id)
+
+    def _capture(self, **kwargs) -> list[dict]:
+        with CaptureQueriesContext(connection) as ctx:
+            self._record(**kwargs)
+        return ctx.captured_queries
+
+    def test_plain_attempt(self):
+        # One INSERT for the attempt, one CategoryProgress upsert.
+        tables = _statements_per_table(self._capture())
+        self.assertEqual(tables["exercise_attempts"], 1)
+        self.assertEqual(tables["category_progress"], 1)
+
+    def test_snapshot_upsert(self):
+        # The student's progress snapshot is bumped with one upsert.
+        tables = _statements_per_table(self._capture())
+        self.assertEqual(tables["student_progress_snapshots"], 1)
+
+    def test_plain_attempt_cost_does_not_grow_with_history(self):
+        first = self._capture(is_correct=False)
+        for _ in range(10):
+            self._record(is_correct=False)
+        self.assertEqual(len(self._capture()), len(first))
+
+    def test_session_attempt(self):
+        # One PracticeSession upsert on top of the plain path.
+        session_id = uuid.uuid4()
+        self._record(session_id=session_id)
+        plain = _statements_per_table(self._capture())
+        tables = _statements_per_table(self._capture(session_id=session_id))
+        self.assertEqual(tables["practice_sessions"], 1)
+        self.assertEqual(tables - plain, Counter({"practice_sessions": 1}))
+
+    def test_tier_clear_recomputes_mastery(self):
+        # Clearing medium recomputes the student's mastery for the topic:
+        # the lesson progress and topic test lookups (no test, so it stops
+        # there), then the stale-row delete in its own savepoint.
+        session_id = uuid.uuid4()
+        for _ in range(PracticeSession.BATCH_SIZE - 2):
+            self._record(session_id=session_id)
+        before = _statements_per_table(self._capture(session_id=session_id))
+        tables = _statements_per_table(self._capture(session_id=session_id))
+        self.assertTrue(
+            CategoryProgress.objects.get(student=self.student, category="adunare").medium_cleared
+        )
+        self.assertEqual(before["topic_mastery"], 0)
+        self.assertEqual(
+            tables - before,
+            Counter({"lesson_progress": 1, "tests": 1, "topic_mastery": 1, None: 2}),
+        )
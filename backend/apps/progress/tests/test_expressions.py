@@ -0,0 +1,80 @@
+"""
+The restricted template evaluator (apps.progress.expressions).
+
+Template expressions used to go through eval(); these tests pin down that
+the replacement still computes what templates rely on and refuses
+everything outside the template language.
+"""
+from django.test import SimpleTestCase
+
+from apps.progress.expressions import (
+    MAX_POWER_BITS,
+    ExpressionError,
+    compile_expression,
+)
+
+
+class EvaluateTests(SimpleTestCase):
+
+    def test_arithmetic_with_params(self):
+        expr = compile_expression("{a} ** {n} + {b} // 2")
+        self.assertEqual(expr.params, ("a", "b", "n"))
+        self.assertEqual(expr({"a": 3, "n": 2, "b": 7}), 12)
+
+    def test_conditional_and_allowed_calls(self):
+        self.assertEqual(compile_expression("2 if {base} == 4 else 3")({"base": 4}), 2)
+        self.assertEqual(compile_expression("pow({a}, {n}, 10)")({"a": 7, "n": 5}), 7)
+        self.assertEqual(compile_expression("factorial({n})")({"n": 5}), 120)
+
+    def test_chained_comparison(self):
+        expr = compile_expression("1 < {a} <= 5")
+        self.assertTrue(expr({"a": 5}))
+        self.assertFalse(expr({"a": 6}))
+
+    def test_missing_param_raises_key_error(self):
+        with self.assertRaises(KeyError):
+            compile_expression("{a} + {b}")({"a": 1})
+
+
+class RejectTests(SimpleTestCase):
+
+    def assertRejected(self, source):
+        with self.assertRaises(ExpressionError, msg=source):
+            compile_expression(source)
+
+    def test_attribute_access(self):
+        self.assertRejected("{a}.__class__")
+        self.assertRejected("(1).real")
+
+    def test_dunder_and_bare_names(self):
+        self.assertRejected("__import__('os')")
+        self.assertRejected("__builtins__")
+        self.assertRejected("a + 1")
+
+    def test_calls_outside_allowlist(self):
+        self.assertRejected("eval('1')")
+        self.assertRejected("abs({a})")
+        self.assertRejected("pow(base={a}, exp=2)")
+        self.assertRejected("({a}).bit_length()")
+
+    def test_other_syntax(self):
+        self.assertRejected("[1, 2][0]")
+        self.assertRejected("'text'")
+        self.assertRejected("lambda: 1")
+        self.assertRejected("{a.b}")
+        self.assertRejected("1 +")
+
+    def test_oversized_power(self):
+        exponent = MAX_POWER_BITS  # 3 is 2 bits wide, so 3 ** n is about 2n bits
+        for source in ("{a} ** {n}", "pow({a}, {n})"):
+            expr = compile_expression(source)
+            with self.assertRaises(ValueError, msg=source):
+                expr({"a": 3, "n": exponent})
+
+    def test_modular_power_is_not_limited(self):
+        self.assertEqual(compile_expression("pow({a}, {n}, 7)")({"a": 3, "n": 10 ** 6}), pow(3, 10 ** 6, 7))
+
+    def test_powers_are_not_vectorized(self):
+        # The column path would apply ** to whole arrays, past the size check.
+        self.assertFalse(compile_expression("{a} ** {n}").vectorizable)
+        self.assertTrue(compile_expression("{a} * {n} + 1").vectorizable)
@@ -0,0 +1,102 @@
+"""
+The streak upsert in streak_service.record_activity.
+
+The day transition used to be Python on a locked Streak row; it is now one
+SQL statement. These tests replay runs of active days through both and
+compare the stored streak after every day.
+"""
+from datetime import date, timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from apps.progress import streak_service
+from apps.progress.models import Streak
+from apps.users.models import User
+
+
+def _reference_day(state: dict, today: date) -> dict:
+    """The Python rules record_activity applied before the upsert."""
+    state = dict(state)
+    last = state["last_active_date"]
+    if last is None:
+        state["current_streak"] = 1
+    else:
+        gap = (today - last).days
+        if gap <= 0:
+            return state
+        if gap == 1:
+            state["current_streak"] += 1
+        elif gap == 2 and state["freeze_count"] > 0:
+            state["freeze_count"] -= 1
+            state["current_streak"] += 1
+        else:
+            state["current_streak"] = 1
+
+    state["longest_streak"] = max(state["longest_streak"], state["current_streak"])
+    if state["current_streak"] % 7 == 0 and state["freeze_count"] < streak_service.MAX_FREEZES:
+        state["freeze_count"] += 1
+    state["last_active_date"] = today
+    return state
+
+
+class RecordActivityTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = User.objects.create_user(
+            email="elev@example.ro", password="parola123", first_name="Ana", last_name="Pop",
+        )
+
+    def setUp(self):
+        key = streak_service._ACTIVE_KEY.format(student_id=self.student.pk)
+        cache.delete(key)
+        self.addCleanup(cache.delete, key)
+
+    def _stored(self) -> dict:
+        return Streak.objects.filter(student=self.student).values(
+            "current_streak", "longest_streak", "freeze_count", "last_active_date",
+        ).get()
+
+    def _replay(self, gaps: list[int], start=date(2026, 3, 2)) -> None:
+        expected = {
+            "current_streak": 0, "longest_streak": 0, "freeze_count": 0, "last_active_date": None,
+        }
+        today = start
+        for step, gap in enumerate(gaps):
+            today += timedelta(days=gap)
+            expected = _reference_day(expected, today)
+            with mock.patch.object(streak_service, "_today_local", return_value=today):
+                streak_service.record_activity(self.student, "practice")
+            self.assertEqual(self._stored(), expected, f"day {step} ({today})")
+
+    def test_consecutive_days_earn_capped_freezes(self):
+        self._replay([0] + [1] * 22)
+
+    def test_one_day_gaps_spend_freezes(self):
+        # Two freezes earned, then three one-day gaps: two bridged, one reset.
+        self._replay([0] + [1] * 13 + [2, 2, 2, 1])
+
+    def test_longer_gap_resets_but_keeps_longest(self):
+        self._replay([0] + [1] * 9 + [3, 1, 1, 5, 1])
+
+    def test_gap_without_freeze_resets(self):
+        self._replay([0, 1, 2, 1, 2])
+
+    def test_repeat_activity_same_day_changes_nothing(self):
+        self._replay([0, 1, 0, 0, 1])
+
+    def test_repeat_after_cache_loss_changes_nothing(self):
+        # The upsert's WHERE guards the day even when the cache misses.
+        self._replay([0, 1])
+        cache.delete(streak_service._ACTIVE_KEY.format(student_id=self.student.pk))
+        before = self._stored()
+        with mock.patch.object(streak_service, "_today_local", return_value=before["last_active_date"]):
+            self.assertEqual(streak_service.record_activity(self.student, "practice"), [])
+        self.assertEqual(self._stored(), before)
+
+    def test_existing_row_without_activity(self):
+        # StreakView creates an empty row for students who never practised.
+        Streak.objects.create(student=self.student)
+        self._replay([0, 1])
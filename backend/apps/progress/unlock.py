@@ -14,10 +14,15 @@ Rules:
         unit must pass
   - A unit test unlocks when the last topic of that unit has a passed test.
     If the unit has no topics with published tests, the unit test is free.
-  - If a topic has no published test, it does not block the next topic
-    (handled by `_topic_test_passed`). Same for unit tests.
+  - If a topic has no published test, it does not block the next topic.
+    Same for unit tests.
+
+The curriculum structure comes from the cached CurriculumGraph
+(apps.content.curriculum), so apart from get_passed_test_ids none of
+these functions query the database.
 """
-from apps.content.models import Lesson, Test, Topic, Unit
+from apps.content.curriculum import CurriculumGraph, get_curriculum_graph
+from apps.content.models import Lesson, Test
 from apps.progress.models import TestAttempt
 
 
@@ -32,27 +37,28 @@ def get_passed_test_ids(student) -> set[int]:
     )
 
 
-def is_lesson_unlocked(lesson: Lesson, passed_test_ids: set[int]) -> bool:
+def is_lesson_unlocked(
+    lesson: Lesson,
+    passed_test_ids: set[int],
+    graph: CurriculumGraph | None = None,
+) -> bool:
     """
     Lessons are always viewable within a unit (theory is free).
     The only gate is cross-unit: to access any lesson in a non-first unit,
     the previous unit's test must be passed.
     """
-    unit = lesson.topic.unit
-
-    prev_unit = Unit.objects.filter(
-        grade=unit.grade,
-        order__lt=unit.order,
-        is_published=True,
-    ).order_by("-order").first()
-
-    if not prev_unit:
+    graph = graph or get_curriculum_graph()
+    unit_id = graph.topic_unit.get(lesson.topic_id)
+    if unit_id is None:
         return True
+    return graph.unit_test_passed(graph.prev_unit.get(unit_id), passed_test_ids)
 
-    return _unit_test_passed(prev_unit, passed_test_ids)
 
-
-def is_test_unlocked(test: Test, passed_test_ids: set[int]) -> bool:
+def is_test_unlocked(
+    test: Test,
+    passed_test_ids: set[int],
+    graph: CurriculumGraph | None = None,
+) -> bool:
     """
     Tests are sequentially gated.
 
@@ -65,82 +71,27 @@ def is_test_unlocked(test: Test, passed_test_ids: set[int]) -> bool:
       - unlocked once the last topic of the unit has a passed test
       - if the unit has no published topics with tests → always unlocked
     """
+    graph = graph or get_curriculum_graph()
+
     if test.scope == Test.Scope.TOPIC:
-        topic = test.topic
-        if topic is None:
+        topic_id = test.topic_id
+        if topic_id is None or topic_id not in graph.topic_unit:
             return False
-        unit = topic.unit
-
-        first_topic = Topic.objects.filter(
-            unit=unit,
-            is_published=True,
-        ).order_by("order").first()
-        is_first_topic = first_topic is not None and first_topic.id == topic.id
-
-        if is_first_topic:
-            prev_unit = Unit.objects.filter(
-                grade=unit.grade,
-                order__lt=unit.order,
-                is_published=True,
-            ).order_by("-order").first()
-
-            if not prev_unit:
-                return True
-
-            return _unit_test_passed(prev_unit, passed_test_ids)
+        unit_id = graph.topic_unit[topic_id]
 
-        prev_topic = Topic.objects.filter(
-            unit=unit,
-            order__lt=topic.order,
-            is_published=True,
-        ).order_by("-order").first()
+        if graph.first_topic.get(unit_id) == topic_id:
+            return graph.unit_test_passed(graph.prev_unit.get(unit_id), passed_test_ids)
 
-        return _topic_test_passed(prev_topic, passed_test_ids)
+        return graph.topic_test_passed(graph.prev_topic.get(topic_id), passed_test_ids)
 
     if test.scope == Test.Scope.UNIT:
-        unit = test.unit
-        if unit is None:
+        if test.unit_id is None:
             return False
-
-        last_topic = Topic.objects.filter(
-            unit=unit,
-            is_published=True,
-        ).order_by("-order").first()
-
-        if last_topic is None:
-            return True
-
-        return _topic_test_passed(last_topic, passed_test_ids)
+        return graph.topic_test_passed(graph.last_topic.get(test.unit_id), passed_test_ids)
 
     return False
 
 
-def _topic_test_passed(topic, passed_test_ids: set[int]) -> bool:
-    """Return True if the topic has no published test, or if its test is passed."""
-    if not topic:
-        return True
-    try:
-        test = topic.test
-        if not test.is_published:
-            return True
-        return test.id in passed_test_ids
-    except Exception:
-        return True  # No test on this topic → unlocked
-
-
-def _unit_test_passed(unit, passed_test_ids: set[int]) -> bool:
-    """Return True if the unit has no published test, or if its test is passed."""
-    if not unit:
-        return True
-    try:
-        test = unit.test
-        if not test.is_published:
-            return True
-        return test.id in passed_test_ids
-    except Exception:
-        return True
-
-
 def get_unlock_map(lessons, student, passed_test_ids: set[int] | None = None) -> dict[int, bool]:
     """
     Given a queryset/list of lessons and a student, return a dict of
@@ -151,8 +102,9 @@ def get_unlock_map(lessons, student, passed_test_ids: set[int] | None = None) ->
     """
     if passed_test_ids is None:
         passed_test_ids = get_passed_test_ids(student)
+    graph = get_curriculum_graph()
     return {
-        lesson.id: is_lesson_unlocked(lesson, passed_test_ids)
+        lesson.id: is_lesson_unlocked(lesson, passed_test_ids, graph)
         for lesson in lessons
     }
 
@@ -167,7 +119,8 @@ def get_test_unlock_map(tests, student, passed_test_ids: set[int] | None = None)
     """
     if passed_test_ids is None:
         passed_test_ids = get_passed_test_ids(student)
+    graph = get_curriculum_graph()
     return {
-        test.id: is_test_unlocked(test, passed_test_ids)
+        test.id: is_test_unlocked(test, passed_test_ids, graph)
         for test in tests
     }
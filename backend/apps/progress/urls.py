@@ -2,6 +2,7 @@ from django.urls import path
 
 from .views import (
     AchievementListView,
+    AchievementNewView,
     DailyTestStartView,
     DailyTestSubmitView,
     DailyTestView,
@@ -12,6 +13,7 @@ from .views import (
     HintUsedView,
     LessonCompleteView,
     LessonOpenView,
+    MetricsView,
     StreakView,
     TestsOverviewView,
     TestHistoryView,
@@ -63,4 +65,8 @@ urlpatterns = [
 
     # Achievements
     path("achievements/", AchievementListView.as_view(), name="achievement_list"),
+    path("achievements/new/", AchievementNewView.as_view(), name="achievement_new"),
+
+    # Monitoring
+    path("metrics/", MetricsView.as_view(), name="metrics"),
 ]
@@ -10,39 +10,62 @@ Endpoints:
   GET  /api/v1/progress/exercises-overview/         — all topics with exercises
   GET  /api/v1/progress/tests-overview/             — all topic tests
   GET  /api/v1/progress/dashboard/                  — student dashboard stats
+  GET  /api/v1/progress/metrics/                    — staff-only runtime counters
 """
+import contextlib
 import logging
 import uuid
 from collections import defaultdict
 from datetime import timedelta
 
-from django.core.signing import SignatureExpired
-from django.db.models import Case, Count, F, IntegerField, When
+from django.core.signing import BadSignature, SignatureExpired
+from django.db import transaction
+from django.db.models import Count
 from django.utils import timezone
 from rest_framework import permissions, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from apps.content.models import Exercise, Lesson, Topic, Test
+from apps.content.tree import get_lesson_outline
+from apps.progress.attempt_queue import queue_stats as attempt_queue_stats
+from apps.progress.attempt_service import record_attempt
 from apps.progress.exercise_engine import decode_instance_token, generate_instance
-from apps.progress.grading import grade_attempt
+from apps.progress.instance_pool import pool_stats as instance_pool_stats, take_instances
+from apps.progress.mastery import note_lesson_opened, recompute_topic_mastery
+from apps.progress.grading import (
+    grade_attempt,
+    grade_batch,
+    grading_stats,
+    normalize,
+    parse_normalized,
+    symbolic_relation,
+)
 from apps.progress.unlock import get_passed_test_ids, get_test_unlock_map, is_test_unlocked
 from apps.progress.models import (
     CategoryProgress,
     DailyTestSession,
     ExerciseAttempt,
     LessonProgress,
+    PracticeSession,
     Streak,
-    StreakActivity,
+    StreakYearBitmap,
+    StudentProgressSnapshot,
     TestAttempt,
 )
+from apps.progress.progress_snapshot import (
+    get_snapshot,
+    note_lesson_status,
+    note_test_completed,
+)
 from apps.progress.serializers import (
     AttemptSubmitSerializer,
     DashboardSerializer,
     StreakSerializer,
 )
-from apps.progress.badges.service import evaluate_badges_for_event, serialize_badges
-from apps.progress.streak_service import _today_local, record_activity
+from apps.progress.badges.service import serialize_badges, take_new_badges
+from apps.progress.events import bus_stats as event_bus_stats, publish
+from apps.progress.streak_service import _today_local
 
 logger = logging.getLogger(__name__)
 
@@ -64,35 +87,26 @@ class LessonOpenView(APIView):
         except Lesson.DoesNotExist:
             return Response({"error": "Lecția nu există."}, status=status.HTTP_404_NOT_FOUND)
 
-        progress, created = LessonProgress.objects.get_or_create(
-            student=request.user,
-            lesson=lesson,
-            defaults={"status": LessonProgress.Status.IN_PROGRESS},
-        )
-
-        streak_badges: list[str] = []
-        if created:
-            try:
-                streak_badges = record_activity(request.user, "lesson")
-            except Exception:
-                logger.warning("Streak update failed", exc_info=True)
-
-        if not created and progress.status == LessonProgress.Status.NOT_STARTED:
-            progress.status = LessonProgress.Status.IN_PROGRESS
-            progress.save(update_fields=["status"])
-
-        own_badges: list[str] = []
-        try:
-            own_badges = evaluate_badges_for_event(
-                request.user, "lesson_opened", {"lesson": lesson},
+        with transaction.atomic():
+            progress, created = LessonProgress.objects.get_or_create(
+                student=request.user,
+                lesson=lesson,
+                defaults={"status": LessonProgress.Status.IN_PROGRESS},
             )
-        except Exception:
-            logger.warning("Badge evaluation failed", exc_info=True)
+            changed = created
+            if not created and progress.status == LessonProgress.Status.NOT_STARTED:
+                progress.status = LessonProgress.Status.IN_PROGRESS
+                progress.save(update_fields=["status"])
+                changed = True
+            if changed:
+                note_lesson_status(request.user.pk, lesson.id, progress.status)
+                note_lesson_opened(request.user.pk, lesson.topic_id)
+            publish("lesson_opened", user=request.user, lesson=lesson, created=created, changed=changed)
 
         return Response({
             "lesson_id": lesson_id,
             "status": progress.status,
-            "newly_earned_badges": serialize_badges(streak_badges + own_badges),
+            "newly_earned_badges": serialize_badges(take_new_badges(request.user)),
         })
 
 
@@ -115,15 +129,18 @@ class LessonCompleteView(APIView):
 
         time_spent = request.data.get("time_spent_seconds", 0)
 
-        progress, _ = LessonProgress.objects.get_or_create(
-            student=request.user,
-            lesson=lesson,
-        )
-        if progress.status != LessonProgress.Status.COMPLETED:
-            progress.status = LessonProgress.Status.COMPLETED
-            progress.completed_at = timezone.now()
-            progress.time_spent_seconds = time_spent
-            progress.save(update_fields=["status", "completed_at", "time_spent_seconds"])
+        with transaction.atomic():
+            progress, _ = LessonProgress.objects.get_or_create(
+                student=request.user,
+                lesson=lesson,
+            )
+            if progress.status != LessonProgress.Status.COMPLETED:
+                progress.status = LessonProgress.Status.COMPLETED
+                progress.completed_at = timezone.now()
+                progress.time_spent_seconds = time_spent
+                progress.save(update_fields=["status", "completed_at", "time_spent_seconds"])
+                note_lesson_status(request.user.pk, lesson.id, progress.status)
+                note_lesson_opened(request.user.pk, lesson.topic_id)
 
         return Response({
             "lesson_id": lesson_id,
@@ -180,14 +197,18 @@ class TopicPracticeView(APIView):
 
         session_id = str(uuid.uuid4())
 
+        # One pool pop per distinct exercise, then restore the selected order.
+        pooled: dict[int, list[dict]] = {}
+        for ex in selected:
+            if ex.id not in pooled:
+                pooled[ex.id] = take_instances(ex, selected.count(ex))
+
         instances = []
         for ex in selected:
-            try:
-                instance = generate_instance(ex)
+            if pooled[ex.id]:
+                instance = pooled[ex.id].pop()
                 instance["exercise_id"] = ex.id
                 instances.append(instance)
-            except Exception as e:
-                continue
 
         hint_active_categories = list(
             CategoryProgress.objects.filter(
@@ -213,6 +234,7 @@ class TopicCategoriesView(APIView):
     GET /api/v1/progress/topics/<topic_id>/categories/
 
     Returns all exercise categories for a topic with tier states.
+    Query count is fixed, independent of how many categories the topic has.
     """
     permission_classes = [permissions.IsAuthenticated]
 
@@ -222,13 +244,12 @@ class TopicCategoriesView(APIView):
         except Topic.DoesNotExist:
             return Response({"error": "Tema nu există."}, status=status.HTTP_404_NOT_FOUND)
 
-        exercises = Exercise.objects.filter(topic=topic, is_active=True)
-
         # Group exercise IDs by category
         category_map: dict[str, list[int]] = {}
-        for ex in exercises:
-            cat = ex.category or ""
-            category_map.setdefault(cat, []).append(ex.id)
+        for ex_id, cat in (
+            Exercise.objects.filter(topic=topic, is_active=True).values_list("id", "category")
+        ):
+            category_map.setdefault(cat or "", []).append(ex_id)
 
         if not category_map:
             return Response({
@@ -237,28 +258,32 @@ class TopicCategoriesView(APIView):
                 "categories": [],
             })
 
-        # Attempt counts per category
+        # Attempt counts per category — one grouped query for the whole topic
         cat_total: dict[str, int] = defaultdict(int)
-        for attempt in ExerciseAttempt.objects.filter(
-            student=request.user,
-            exercise__topic=topic,
-        ).values("exercise__category"):
-            cat_total[attempt["exercise__category"] or ""] += 1
+        for cat, n in (
+            ExerciseAttempt.objects
+            .filter(student=request.user, topic=topic)
+            .order_by()
+            .values("category")
+            .annotate(n=Count("id"))
+            .values_list("category", "n")
+        ):
+            cat_total[cat or ""] += n
 
         # Perfect batch counts per category
-        cat_perfect: dict[str, int] = defaultdict(int)
-        for cat, ex_ids in category_map.items():
-            cat_perfect[cat] = (
-                ExerciseAttempt.objects
-                .filter(student=request.user, exercise_id__in=ex_ids, session_id__isnull=False)
-                .values("session_id")
-                .annotate(
-                    total=Count("id"),
-                    correct=Count(Case(When(is_correct=True, then=1), output_field=IntegerField())),
-                )
-                .filter(total=5, correct=5)
-                .count()
+        cat_perfect: dict[str, int] = dict(
+            PracticeSession.objects
+            .filter(
+                student=request.user,
+                topic=topic,
+                category__in=category_map.keys(),
+                total=PracticeSession.BATCH_SIZE,
+                correct=PracticeSession.BATCH_SIZE,
             )
+            .values("category")
+            .annotate(n=Count("id"))
+            .values_list("category", "n")
+        )
 
         # CategoryProgress tier states
         cp_map: dict[str, CategoryProgress] = {
@@ -280,7 +305,7 @@ class TopicCategoriesView(APIView):
                 "label": label,
                 "exercise_count": len(ex_ids),
                 "exercises_attempted": cat_total[cat],
-                "perfect_batches": cat_perfect[cat],
+                "perfect_batches": cat_perfect.get(cat, 0),
                 "tiers": {
                     "easy":   {"available": True,          "cleared": easy_cleared},
                     "medium": {"available": easy_cleared,  "cleared": medium_cleared},
@@ -350,13 +375,10 @@ class ExerciseAttemptView(APIView):
             try:
                 matched_idx = int(error)
                 other_idx = 1 - matched_idx
-                other_expr = grading_data["correct_exprs"][other_idx]
-                try:
-                    from apps.progress.grading import TRANSFORMATIONS, normalize
-                    from sympy.parsing.sympy_parser import parse_expr
-                    other_value = str(parse_expr(normalize(other_expr), transformations=TRANSFORMATIONS))
-                except Exception:
-                    other_value = other_expr
+                other_value = _display_value(
+                    grading_data["correct_exprs"][other_idx],
+                    (grading_data.get("correct_values") or [None, None])[other_idx],
+                )
                 follow_up = {
                     "question": grading_data.get("follow_up_question", ""),
                     "expected": other_value,
@@ -374,132 +396,18 @@ class ExerciseAttemptView(APIView):
                 "error": error if not is_correct else None,
             })
 
-        ExerciseAttempt.objects.create(
-            student=request.user,
-            exercise=exercise,
-            answer=answer,
-            is_correct=is_correct,
-            session_id=session_id,
-        )
-
-        streak_badges: list[str] = []
-        try:
-            streak_badges = record_activity(request.user, "exercise")
-        except Exception:
-            logger.warning("Streak update failed", exc_info=True)
-
-        # ── Category stats update (atomic, F-expressions) ────────────
-        if exercise.category:
-            cp_stats, _ = CategoryProgress.objects.get_or_create(
-                student=request.user,
-                topic=exercise.topic,
-                category=exercise.category,
-            )
-            stats_update = {
-                "total_attempts": F("total_attempts") + 1,
-                "last_attempted_at": timezone.now(),
-            }
-            if is_correct:
-                stats_update["correct_attempts"] = F("correct_attempts") + 1
-            CategoryProgress.objects.filter(pk=cp_stats.pk).update(**stats_update)
-
-        # ── Hint counter update ──────────────────────────────────────
-        if not is_correct and session_id and exercise.category:
-            prior_wrong = ExerciseAttempt.objects.filter(
-                student=request.user,
-                session_id=session_id,
-                exercise__category=exercise.category,
-                is_correct=False,
-            ).count()
-            # prior_wrong includes the attempt we just created; "first wrong"
-            # means exactly 1 wrong attempt exists for this batch+category.
-            if prior_wrong == 1:
-                now = timezone.now()
-                cp, _ = CategoryProgress.objects.get_or_create(
-                    student=request.user,
-                    topic=exercise.topic,
-                    category=exercise.category,
-                )
-                if cp.last_failure_at is None or now - cp.last_failure_at > timedelta(days=7):
-                    cp.category_failure_count = 1
-                else:
-                    cp.category_failure_count += 1
-                cp.last_failure_at = now
-                cp.save(update_fields=["category_failure_count", "last_failure_at"])
-
-        # ── Determine hint_active_for_category ───────────────────────
-        hint_active_for_category = None
-        if exercise.category:
-            cp = CategoryProgress.objects.filter(
-                student=request.user,
-                topic=exercise.topic,
-                category=exercise.category,
-            ).first()
-            if cp and cp.category_failure_count >= 2:
-                hint_active_for_category = exercise.category
-
-        tier_cleared = None
-        if session_id:
-            tier_cleared = self._check_tier_cleared(request.user, session_id, exercise)
-
-        correct_display = _correct_answer_display(exercise.exercise_type, grading_data) if not is_correct else None
-
-        own_badges: list[str] = []
-        try:
-            own_badges = evaluate_badges_for_event(
-                request.user, "exercise_attempted", None,
-            )
-        except Exception:
-            logger.warning("Badge evaluation failed", exc_info=True)
+        outcome = record_attempt(request.user, exercise, answer, is_correct, session_id)
 
         return Response({
             "is_correct": is_correct,
             "correct_answer": correct_display,
             "follow_up": follow_up,
-            "tier_cleared": tier_cleared,
-            "hint_active_for_category": hint_active_for_category,
+            "tier_cleared": outcome.tier_cleared,
+            "hint_active_for_category": outcome.hint_active_for_category,
             "error": error if not is_correct else None,
-            "newly_earned_badges": serialize_badges(streak_badges + own_badges),
+            "newly_earned_badges": serialize_badges(take_new_badges(request.user)),
         })
 
-    def _check_tier_cleared(self, user, session_id, exercise):
-        batch = ExerciseAttempt.objects.filter(student=user, session_id=session_id)
-        if batch.count() != 5:
-            return None
-        if batch.filter(is_correct=False).exists():
-            return None
-
-        difficulty = exercise.difficulty
-        category = exercise.category
-        topic = exercise.topic
-
-        cp, _ = CategoryProgress.objects.get_or_create(
-            student=user,
-            topic=topic,
-            category=category,
-        )
-
-        if difficulty == "easy" and not cp.easy_cleared:
-            cp.easy_cleared = True
-            cp.save(update_fields=["easy_cleared"])
-            return {"tier": "easy", "also_cleared": []}
-        elif difficulty == "medium" and not cp.medium_cleared:
-            cp.medium_cleared = True
-            cp.save(update_fields=["medium_cleared"])
-            return {"tier": "medium", "also_cleared": []}
-        elif difficulty == "hard" and not cp.hard_cleared:
-            cp.hard_cleared = True
-            also_cleared = []
-            if not cp.medium_cleared:
-                cp.medium_cleared = True
-                also_cleared.append("medium")
-                cp.save(update_fields=["hard_cleared", "medium_cleared"])
-            else:
-                cp.save(update_fields=["hard_cleared"])
-            return {"tier": "hard", "also_cleared": also_cleared}
-
-        return None
-
 
 # ─── Hint used ───────────────────────────────────────────────────────────────
 
@@ -635,21 +543,18 @@ class ExercisesOverviewView(APIView):
         )
         cat_count_map = {row["topic_id"]: row["total"] for row in cat_counts}
 
+        snapshot = get_snapshot(user)
+
         # Completed categories (medium or hard cleared)
-        completed_by_topic: dict[int, int] = defaultdict(int)
-        for cp in CategoryProgress.objects.filter(student=user, topic_id__in=topic_ids):
-            if cp.medium_cleared or cp.hard_cleared:
-                completed_by_topic[cp.topic_id] += 1
+        completed_by_topic = {
+            topic_id: len(categories)
+            for topic_id, categories in snapshot.cleared_categories(
+                StudentProgressSnapshot.CLEARED_MEDIUM | StudentProgressSnapshot.CLEARED_HARD
+            ).items()
+        }
 
         # Exercises attempted per topic
-        attempt_count_map: dict[int, int] = {}
-        for row in (
-            ExerciseAttempt.objects
-            .filter(student=user, exercise__topic_id__in=topic_ids)
-            .values("exercise__topic_id")
-            .annotate(count=Count("id"))
-        ):
-            attempt_count_map[row["exercise__topic_id"]] = row["count"]
+        attempt_count_map = snapshot.attempts_by_topic
 
         results = [
             {
@@ -681,8 +586,6 @@ class TestsOverviewView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        from django.db import models as django_models
-
         user = request.user
 
         topic_tests = list(
@@ -698,35 +601,19 @@ class TestsOverviewView(APIView):
             .order_by("unit__grade__number", "unit__order")
         )
         all_tests = topic_tests + unit_tests
-        all_test_ids = [t.id for t in all_tests]
 
-        attempt_stats = (
-            TestAttempt.objects
-            .filter(
-                student=user,
-                test_id__in=all_test_ids,
-                status=TestAttempt.Status.COMPLETED,
-            )
-            .values("test_id")
-            .annotate(
-                attempts_count=Count("id"),
-                passed_count=Count("id", filter=django_models.Q(passed=True)),
-                best_score=django_models.Max("score"),
-            )
+        snapshot = get_snapshot(user)
+        attempt_map = snapshot.test_stats
+        test_unlock_map = get_test_unlock_map(
+            all_tests, user, passed_test_ids=snapshot.passed_test_ids,
         )
-        attempt_map = {row["test_id"]: row for row in attempt_stats}
-
-        passed_test_ids = get_passed_test_ids(user)
-        test_unlock_map = get_test_unlock_map(all_tests, user, passed_test_ids=passed_test_ids)
 
         def _attempt_fields(test_id: int) -> dict:
             a = attempt_map.get(test_id)
             return {
                 "attempts_count": a["attempts_count"] if a else 0,
-                "passed": bool(a["passed_count"]) if a else None,
-                "best_score": (
-                    float(a["best_score"]) if a and a["best_score"] is not None else None
-                ),
+                "passed": a["passed"] if a else None,
+                "best_score": a["best_score"] if a else None,
                 "is_locked": not test_unlock_map.get(test_id, True),
             }
 
@@ -808,62 +695,37 @@ class DashboardView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        from apps.content.models import Unit
-        from django.db import models as django_models
-
         user = request.user
 
-        all_lessons = Lesson.objects.filter(is_published=True).select_related("topic__unit__grade")
-        progress_map = {
-            p.lesson_id: p.status
-            for p in LessonProgress.objects.filter(student=user)
-        }
+        # Content side from the cached outline, student side from the snapshot
+        outline = get_lesson_outline()
+        snapshot = get_snapshot(user)
 
-        total_lessons = all_lessons.count()
-        completed = sum(
-            1 for l in all_lessons
-            if progress_map.get(l.id) == LessonProgress.Status.COMPLETED
-        )
-        in_progress = sum(
-            1 for l in all_lessons
-            if progress_map.get(l.id) == LessonProgress.Status.IN_PROGRESS
-        )
+        completed_ids = set()
+        in_progress_ids = set()
+        for lesson_id, lesson_status in snapshot.lesson_status_map.items():
+            if lesson_status == LessonProgress.Status.COMPLETED:
+                completed_ids.add(lesson_id)
+            elif lesson_status == LessonProgress.Status.IN_PROGRESS:
+                in_progress_ids.add(lesson_id)
 
-        exercises_attempted = ExerciseAttempt.objects.filter(student=user).count()
+        total_lessons = len(outline["lesson_ids"])
+        completed = len(completed_ids.intersection(outline["lesson_ids"]))
+        in_progress = len(in_progress_ids.intersection(outline["lesson_ids"]))
 
-        perfect_batches = (
-            ExerciseAttempt.objects
-            .filter(student=user, session_id__isnull=False)
-            .values("session_id")
-            .annotate(
-                total=Count("id"),
-                correct=Count(Case(When(is_correct=True, then=1), output_field=IntegerField())),
-            )
-            .filter(total=5, correct=5)
-            .count()
-        )
+        exercises_attempted = snapshot.exercises_attempted
+        perfect_batches = snapshot.perfect_batches
 
-        units = Unit.objects.filter(is_published=True).prefetch_related(
-            "topics__lessons"
-        ).select_related("grade").order_by("grade", "order")
-
-        unit_data = []
-        for unit in units:
-            unit_lessons = [
-                l for topic in unit.topics.filter(is_published=True)
-                for l in topic.lessons.filter(is_published=True)
-            ]
-            unit_completed = sum(
-                1 for l in unit_lessons
-                if progress_map.get(l.id) == LessonProgress.Status.COMPLETED
-            )
-            unit_data.append({
-                "unit_id": unit.id,
-                "unit_title": unit.title,
-                "grade_number": unit.grade.number,
-                "total_lessons": len(unit_lessons),
-                "completed_lessons": unit_completed,
-            })
+        unit_data = [
+            {
+                "unit_id": unit["unit_id"],
+                "unit_title": unit["unit_title"],
+                "grade_number": unit["grade_number"],
+                "total_lessons": len(unit["lesson_ids"]),
+                "completed_lessons": len(completed_ids.intersection(unit["lesson_ids"])),
+            }
+            for unit in outline["units"]
+        ]
 
         return Response({
             "total_lessons": total_lessons,
@@ -890,12 +752,14 @@ class StreakView(APIView):
         streak, _ = Streak.objects.get_or_create(student=request.user)
 
         cutoff = _today_local() - timedelta(days=365)
-        active_dates = list(
-            StreakActivity.objects
-            .filter(student=request.user, date__gte=cutoff)
-            .order_by("date")
-            .values_list("date", flat=True)
-        )
+        active_dates = [
+            day
+            for bitmap in StreakYearBitmap.objects
+            .filter(student=request.user, year__gte=cutoff.year)
+            .order_by("year")
+            for day in bitmap.active_dates()
+            if day >= cutoff
+        ]
 
         data = {
             "current_streak": streak.current_streak,
@@ -1072,12 +936,9 @@ class DailyTestStartView(APIView):
                 )
             if ex is None:
                 continue
-            try:
-                instance = generate_instance(ex)
+            for instance in take_instances(ex, durable=True):
                 instance["exercise_id"] = ex.id
                 instances.append(instance)
-            except Exception:
-                continue
 
         if not instances:
             return Response({
@@ -1143,6 +1004,7 @@ class DailyTestSubmitView(APIView):
         results: dict[str, dict] = {}
         regenerated_pending: list[dict] = []
 
+        submitted: dict[int, object] = {}
         for key, student_answer in raw_answers.items():
             try:
                 idx = int(key)
@@ -1150,31 +1012,48 @@ class DailyTestSubmitView(APIView):
                 continue
             if idx < 0 or idx >= len(instances) or idx in completed_set:
                 continue
+            submitted[idx] = student_answer
 
-            instance = instances[idx]
-            exercise_id = instance.get("exercise_id")
-            instance_token = instance.get("instance_token")
+        exercises = Exercise.objects.select_related("topic").in_bulk(
+            {instances[idx].get("exercise_id") for idx in submitted}
+        )
 
+        # Decode every submitted slot first, then grade them in one batch.
+        to_grade: dict[int, tuple] = {}
+        for idx, student_answer in submitted.items():
+            exercise = exercises.get(instances[idx].get("exercise_id"))
+            if exercise is None:
+                continue
             try:
-                exercise = Exercise.objects.select_related("topic").get(id=exercise_id)
-            except Exercise.DoesNotExist:
+                payload = decode_instance_token(
+                    instances[idx].get("instance_token"), max_age=None,
+                )
+            except BadSignature:
+                logger.warning(
+                    "Daily test %s slot %s has an invalid or expired token",
+                    session.id, idx, exc_info=True,
+                )
+                continue
+            grading_data = payload.get("grading_data", payload)
+            to_grade[idx] = (exercise.exercise_type, student_answer, grading_data)
+
+        verdicts = dict(zip(to_grade, grade_batch(list(to_grade.values())), strict=True))
+
+        for idx, student_answer in submitted.items():
+            instance = instances[idx]
+            exercise = exercises.get(instance.get("exercise_id"))
+            if exercise is None:
                 continue
 
             is_correct = False
             correct_display = None
-
-            try:
-                payload = decode_instance_token(instance_token, max_age=None)
-                grading_data = payload.get("grading_data", payload)
-                is_correct, _ = grade_attempt(
-                    exercise.exercise_type, student_answer, grading_data,
-                )
+            if idx in verdicts:
+                is_correct = verdicts[idx][0]
                 if not is_correct:
-                    correct_display = _correct_answer_display(
-                        exercise.exercise_type, grading_data,
-                    )
-            except Exception:
-                pass
+                    with contextlib.suppress(Exception):
+                        correct_display = _correct_answer_display(
+                            exercise.exercise_type, to_grade[idx][2],
+                        )
 
             if is_correct:
                 completed_set.add(idx)
@@ -1183,7 +1062,7 @@ class DailyTestSubmitView(APIView):
                 continue
 
             try:
-                new_instance = generate_instance(exercise)
+                new_instance = generate_instance(exercise, durable=True)
                 new_instance["exercise_id"] = exercise.id
             except Exception:
                 new_instance = instance
@@ -1199,15 +1078,11 @@ class DailyTestSubmitView(APIView):
         session.completed_indices = sorted(completed_set)
 
         total = len(instances)
-        streak_badges: list[str] = []
         if total > 0 and len(completed_set) == total:
             session.is_completed = True
             session.completed_at = timezone.now()
             session.save()
-            try:
-                streak_badges = record_activity(request.user, "daily_test")
-            except Exception:
-                logger.warning("Streak update failed", exc_info=True)
+            publish("daily_test_completed", user=request.user)
         else:
             session.save(update_fields=["exercise_instances", "completed_indices", "answers"])
 
@@ -1217,7 +1092,7 @@ class DailyTestSubmitView(APIView):
             "completed_count": len(session.completed_indices),
             "total_count": total,
             "pending_exercises": regenerated_pending,
-            "newly_earned_badges": serialize_badges(streak_badges),
+            "newly_earned_badges": serialize_badges(take_new_badges(request.user)),
         })
 
 
@@ -1320,6 +1195,31 @@ class TestFinishView(APIView):
         instances = attempt.exercise_instances
         answers = dict(attempt.answers)
 
+        exercises = Exercise.objects.in_bulk(
+            {inst.get("exercise_id") for inst in instances}
+        )
+
+        # Decode every answered slot first, then grade them in one batch.
+        to_grade: dict[int, tuple] = {}
+        for idx, instance in enumerate(instances):
+            student_answer = answers.get(str(idx), {}).get("answer")
+            instance_token = instance.get("instance_token")
+            exercise = exercises.get(instance.get("exercise_id"))
+            if student_answer is None or instance_token is None or exercise is None:
+                continue
+            try:
+                payload = decode_instance_token(instance_token, max_age=None)
+            except BadSignature:
+                logger.warning(
+                    "Test attempt %s slot %s has an invalid or expired token",
+                    attempt.id, idx, exc_info=True,
+                )
+                continue
+            grading_data = payload.get("grading_data", payload)
+            to_grade[idx] = (exercise.exercise_type, student_answer, grading_data)
+
+        verdicts = dict(zip(to_grade, grade_batch(list(to_grade.values())), strict=True))
+
         total_weight = 0
         earned_weight = 0
         graded_answers = {}
@@ -1327,13 +1227,12 @@ class TestFinishView(APIView):
         for idx, instance in enumerate(instances):
             str_idx = str(idx)
             exercise_id = instance.get("exercise_id")
-            instance_token = instance.get("instance_token")
             weight = instance.get("weight", 1)
             student_answer = answers.get(str_idx, {}).get("answer")
 
             total_weight += weight
 
-            if student_answer is None or instance_token is None:
+            if student_answer is None or instance.get("instance_token") is None:
                 graded_answers[str_idx] = {
                     "answer": None,
                     "is_correct": False,
@@ -1341,20 +1240,16 @@ class TestFinishView(APIView):
                 }
                 continue
 
+            is_correct = False
             correct_display = None
-            try:
-                exercise = Exercise.objects.get(id=exercise_id)
-                payload = decode_instance_token(instance_token, max_age=None)
-                grading_data = payload.get("grading_data", payload)
-                is_correct, _ = grade_attempt(
-                    exercise.exercise_type, student_answer, grading_data
-                )
+            if idx in verdicts:
+                is_correct = verdicts[idx][0]
                 if not is_correct:
-                    correct_display = _correct_answer_display(
-                        exercise.exercise_type, grading_data,
-                    )
-            except Exception:
-                is_correct = False
+                    exercise_type, _, grading_data = to_grade[idx]
+                    try:
+                        correct_display = _correct_answer_display(exercise_type, grading_data)
+                    except Exception:
+                        correct_display = None
 
             if is_correct:
                 earned_weight += weight
@@ -1376,20 +1271,17 @@ class TestFinishView(APIView):
         attempt.finished_at = timezone.now()
         attempt.save()
 
-        streak_badges: list[str] = []
+        # Read models follow the saved attempt. A failure here must not lose
+        # the result; rebuild_progress_snapshots / rebuild_topic_mastery
+        # repair them.
         try:
-            act_type = "topic_test" if test.scope == "topic" else "unit_test"
-            streak_badges = record_activity(request.user, act_type)
+            with transaction.atomic():
+                note_test_completed(attempt)
+                if test.scope == Test.Scope.TOPIC and test.topic_id is not None:
+                    recompute_topic_mastery(test.topic_id, [request.user.pk])
         except Exception:
-            logger.warning("Streak update failed", exc_info=True)
-
-        own_badges: list[str] = []
-        try:
-            own_badges = evaluate_badges_for_event(
-                request.user, "test_finished", {"test_attempt": attempt},
-            )
-        except Exception:
-            logger.warning("Badge evaluation failed", exc_info=True)
+            logger.warning("Progress read-model update after test finish failed", exc_info=True)
+        publish("test_finished", user=request.user, attempt=attempt)
 
         return Response({
             "attempt_id": attempt.id,
@@ -1397,7 +1289,7 @@ class TestFinishView(APIView):
             "passed": passed,
             "pass_threshold": test.pass_threshold,
             "answers": graded_answers,
-            "newly_earned_badges": serialize_badges(streak_badges + own_badges),
+            "newly_earned_badges": serialize_badges(take_new_badges(request.user)),
         })
 
 
@@ -1493,21 +1385,34 @@ def _build_test_instances(composition: list, exercises_pool) -> list:
             continue
 
         selected = random.choices(pool, k=count)
+        pooled: dict[int, list[dict]] = {}
         for ex in selected:
-            try:
-                instance = generate_instance(ex)
-                instance["exercise_id"] = ex.id
-                instance["weight"] = weight
-                instance["topic_id"] = ex.topic_id
-                template = ex.template if isinstance(ex.template, dict) else {}
-                instance["category_label"] = template.get("category_label", ex.category)
-                instances.append(instance)
-            except Exception:
+            if ex.id not in pooled:
+                pooled[ex.id] = take_instances(ex, selected.count(ex), durable=True)
+            # take_instances logs and leaves out slots it could not generate.
+            if not pooled[ex.id]:
                 continue
+            instance = pooled[ex.id].pop()
+            instance["exercise_id"] = ex.id
+            instance["weight"] = weight
+            instance["topic_id"] = ex.topic_id
+            template = ex.template if isinstance(ex.template, dict) else {}
+            instance["category_label"] = template.get("category_label", ex.category)
+            instances.append(instance)
 
     return instances
 
 
+def _display_value(expr: str, correct_value: str | None = None) -> str:
+    """Evaluated form of a correct expression; uses the precomputed value when present."""
+    if correct_value is not None:
+        return correct_value
+    try:
+        return str(parse_normalized(normalize(expr)))
+    except Exception:
+        return expr
+
+
 def _correct_answer_display(exercise_type: str, grading_data: dict) -> str:
     """Return a human-readable correct answer string."""
     if exercise_type == "multi_fill_blank":
@@ -1515,45 +1420,27 @@ def _correct_answer_display(exercise_type: str, grading_data: dict) -> str:
         return ", ".join(parts)
     elif exercise_type == "fill_blank":
         if "correct_exprs" in grading_data:
-            displays = []
-            for expr in grading_data["correct_exprs"]:
-                try:
-                    from apps.progress.grading import TRANSFORMATIONS, normalize
-                    from sympy.parsing.sympy_parser import parse_expr
-                    displays.append(str(parse_expr(normalize(expr), transformations=TRANSFORMATIONS)))
-                except Exception:
-                    displays.append(expr)
-            return " sau ".join(displays)
+            exprs = grading_data["correct_exprs"]
+            values = grading_data.get("correct_values") or [None] * len(exprs)
+            return " sau ".join(
+                _display_value(expr, value) for expr, value in zip(exprs, values, strict=True)
+            )
         if "valid_set" in grading_data:
             if grading_data.get("answer_display"):
                 return grading_data["answer_display"]
             valid = grading_data["valid_set"]
             return f"orice număr din intervalul [{min(valid)}, {max(valid)}]"
-        expr = grading_data.get("correct_expr", "")
-        try:
-            from apps.progress.grading import TRANSFORMATIONS, normalize
-            from sympy.parsing.sympy_parser import parse_expr
-            return str(parse_expr(normalize(expr), transformations=TRANSFORMATIONS))
-        except Exception:
-            return expr
+        return _display_value(
+            grading_data.get("correct_expr", ""),
+            grading_data.get("correct_value"),
+        )
     elif exercise_type == "comparison":
-        left = grading_data.get("left_expr", "")
-        right = grading_data.get("right_expr", "")
+        if "correct_relation" in grading_data:
+            return grading_data["correct_relation"]
+        left = normalize(grading_data.get("left_expr", ""))
+        right = normalize(grading_data.get("right_expr", ""))
         try:
-            import sympy
-            from sympy.parsing.sympy_parser import (
-                convert_xor, implicit_multiplication_application,
-                parse_expr, standard_transformations,
-            )
-            transforms = standard_transformations + (
-                implicit_multiplication_application, convert_xor,
-            )
-            l_val = parse_expr(left.replace(":", "/"), transformations=transforms)
-            r_val = parse_expr(right.replace(":", "/"), transformations=transforms)
-            diff = sympy.simplify(l_val - r_val)
-            if diff == sympy.Integer(0):
-                return "="
-            return ">" if diff > 0 else "<"
+            return symbolic_relation(left, right)
         except Exception:
             return "?"
     elif exercise_type == "multiple_choice":
@@ -1578,7 +1465,7 @@ class AchievementListView(APIView):
 
     def get(self, request):
         from apps.progress.badges.catalog import CATALOG
-        from apps.progress.models import Achievement
+        from apps.progress.badges.earned import get_earned
 
         user = request.user
         if not getattr(user, "is_student", False):
@@ -1587,11 +1474,7 @@ class AchievementListView(APIView):
                 status=status.HTTP_403_FORBIDDEN,
             )
 
-        earned_at_by_key = dict(
-            Achievement.objects
-            .filter(student=user)
-            .values_list("badge_key", "earned_at")
-        )
+        earned_at_by_key = get_earned(user.pk)
 
         achievements = []
         for badge in CATALOG.values():
@@ -1603,10 +1486,47 @@ class AchievementListView(APIView):
                 "family": badge.family,
                 "secret": badge.secret,
                 "earned": earned,
-                "earned_at": earned_at.isoformat() if earned_at else None,
+                "earned_at": earned_at,
                 "name": None if hidden else badge.name,
                 "description": None if hidden else badge.description,
                 "icon_name": None if hidden else badge.icon_name,
             })
 
         return Response({"achievements": achievements})
+
+
+class AchievementNewView(APIView):
+    """
+    GET /api/v1/progress/achievements/new/
+
+    Badges earned since the last response that carried them, each returned
+    once. With EVENT_BUS_MODE = "async" the frontend polls this after
+    actions whose badges may be awarded after the response.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        return Response({
+            "newly_earned_badges": serialize_badges(take_new_badges(request.user, check_db=True)),
+        })
+
+
+# ─── Metrics ──────────────────────────────────────────────────────────────────
+
+class MetricsView(APIView):
+    """
+    GET /api/v1/progress/metrics/
+
+    Staff-only runtime counters for monitoring. Values are per worker
+    process, so scrape every process (or sum them) for a full picture.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        active = Exercise.objects.filter(is_active=True).only("id", "updated_at")
+        return Response({
+            "grading": grading_stats(),
+            "instance_pool": instance_pool_stats(active),
+            "attempt_queue": attempt_queue_stats(),
+            "events": event_bus_stats(),
+        })
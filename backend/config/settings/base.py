@@ -164,3 +164,47 @@ FRONTEND_URL = config("FRONTEND_URL", default="http://localhost:5173")
 # Email
 # =============================================================================
 DEFAULT_FROM_EMAIL = config("DEFAULT_FROM_EMAIL", default="noreply@mathed.ro")
+
+
+# =============================================================================
+# Grading
+# =============================================================================
+# Pre-forked processes that run SymPy on student input. 0 = grade inline in the
+# request thread with no deadline (shells, local debugging).
+GRADER_POOL_SIZE = config("GRADER_POOL_SIZE", default=2, cast=int)
+# Hard per-call deadline (seconds), including time spent waiting for a worker.
+GRADER_TIMEOUT_SECONDS = config("GRADER_TIMEOUT_SECONDS", default=5, cast=float)
+# Workers are recycled after this many calls to bound SymPy cache growth.
+GRADER_MAX_TASKS_PER_WORKER = config("GRADER_MAX_TASKS_PER_WORKER", default=1000, cast=int)
+
+# Pre-generated instance reservoirs in Redis (see fill_instance_pools). Request
+# paths generate inline when a pool is empty or Redis is unavailable.
+INSTANCE_POOL_ENABLED = config("INSTANCE_POOL_ENABLED", default=True, cast=bool)
+INSTANCE_POOL_TARGET = config("INSTANCE_POOL_TARGET", default=20, cast=int)
+# Drafts older than this are dropped on pop. Tokens are signed when popped, so
+# this does not eat into the token expiry.
+INSTANCE_POOL_MAX_AGE = config("INSTANCE_POOL_MAX_AGE", default=1800, cast=int)
+
+# "signed": grading data travels inside each instance_token (default).
+# "handle": grading data is stored server-side (Redis, DB fallback; test and
+# daily-test instances always in the DB too) and the token is a ~24-byte
+# random handle.
+INSTANCE_STORE_MODE = config("INSTANCE_STORE_MODE", default="signed")
+# Handles must outlive the longest test attempt / daily session.
+INSTANCE_HANDLE_TTL = config("INSTANCE_HANDLE_TTL", default=2 * 24 * 3600, cast=int)
+
+# "sync": the attempt endpoint inserts ExerciseAttempt rows itself (default).
+# "queue": attempts go to a Redis stream and `drain_attempt_queue` writes them
+# in batches; falls back to sync writes whenever Redis is unavailable.
+ATTEMPT_INGEST_MODE = config("ATTEMPT_INGEST_MODE", default="sync")
+
+# "sync": streak and badge side effects run before the request responds (default).
+# "async": they run on a per-process worker thread after the response; new
+# badges reach the client on its next response or via achievements/new/.
+EVENT_BUS_MODE = config("EVENT_BUS_MODE", default="sync")
+# Events beyond this many waiting run inline instead.
+EVENT_QUEUE_SIZE = config("EVENT_QUEUE_SIZE", default=10000, cast=int)
+
+# Streak history is served from StreakYearBitmap; the one-row-per-day
+# StreakActivity table is only an audit log and can be switched off.
+STREAK_ACTIVITY_LOG = config("STREAK_ACTIVITY_LOG", default=True, cast=bool)